@@ -0,0 +1,75 @@
+"""check that starting commands stays cheap
+
+Every command is started through the rnsutils dispatcher with --version under ``python -X importtime``. The import
+time of the modules it loads on top of the bare interpreter is compared to a budget, and heavy dependencies, which
+only real work needs, must not be loaded at all.
+
+usage: python benchmarks/bench_startup.py [--budget MS] [--repeat N]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import subprocess
+import sys
+
+from rnsutils.cli import COMMANDS
+
+# modules only needed to actually process files
+HEAVY_MODULES = ['lxml', 'sf2utils.sf2parse', 'zipfile', 'concurrent.futures', 'subprocess', 'hashlib', 'json']
+
+
+def imports(args):
+    """:return {module name: cumulative import time in µs} for top level imports done when running python with
+    :arg args"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    process = subprocess.run([sys.executable, '-X', 'importtime'] + args, stdout=subprocess.DEVNULL,
+                             stderr=subprocess.PIPE, env=env, universal_newlines=True)
+    modules = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented, keep their names to spot heavy modules but only count top level times
+        modules[name.strip()] = int(cumulative) if not name.startswith('  ') else 0
+    return modules
+
+
+def command_import_time(command, interpreter_modules, repeat):
+    """:return (best import time in ms, modules loaded) for starting :arg command"""
+    best_time = None
+    for _ in range(repeat):
+        modules = imports(['-m', 'rnsutils', command, '--version'])
+        import_time = sum(cumulative for name, cumulative in modules.items() if name not in interpreter_modules)
+        best_time = import_time if best_time is None else min(best_time, import_time)
+    return best_time / 1000., modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark command startup")
+    parser.add_argument("--budget", type=float, default=60, help="import time budget in ms [default: %(default)s]")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per command, best is kept [default: %(default)s]")
+    opts = parser.parse_args()
+
+    interpreter_modules = imports(['-c', 'pass'])
+
+    failed = False
+    for command in sorted(COMMANDS):
+        import_time, modules = command_import_time(command, interpreter_modules, opts.repeat)
+        heavy_modules = [name for name in HEAVY_MODULES if name in modules]
+        print("{:<14} {:7.1f} ms{}".format(command, import_time,
+                                           " loads {}".format(", ".join(heavy_modules)) if heavy_modules else ""))
+        if import_time > opts.budget or heavy_modules:
+            failed = True
+
+    if failed:
+        print("FAILED: budget of {} ms exceeded or heavy module loaded".format(opts.budget))
+        return 1
+
+    print("all commands within {} ms import time budget".format(opts.budget))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
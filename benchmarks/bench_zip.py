@@ -0,0 +1,53 @@
+"""compare serial and threaded instrument saving and loading on a large uncompressed instrument
+
+usage: python benchmarks/bench_zip.py [--size MB] [--samples N] [--threads N]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from rnsutils import corpus
+from rnsutils.instrument import RenoiseInstrument
+from rnsutils.ziputils import default_thread_count
+
+
+def timed(func, *args, **kwargs):
+    start = time.time()
+    func(*args, **kwargs)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark threaded zip (de)compression of instruments")
+    parser.add_argument("--size", type=int, default=500, help="uncompressed audio size in MB [default: %(default)s]")
+    parser.add_argument("--samples", type=int, default=50, help="number of samples [default: %(default)s]")
+    parser.add_argument("--threads", type=int, default=default_thread_count(),
+                        help="threads of the parallel run [default: %(default)s]")
+    opts = parser.parse_args()
+
+    instrument = corpus.synthetic_instrument(opts.samples, frames=opts.size * 1024 * 1024 // opts.samples // 2,
+                                               modulation_sets=1)
+    output_dir = tempfile.mkdtemp()
+    try:
+        results = {}
+        for threads in (1, opts.threads):
+            filename = os.path.join(output_dir, 'bench-{}.xrni'.format(threads))
+            results[threads] = (timed(instrument.save, filename, threads=threads),
+                                timed(RenoiseInstrument, filename, threads=threads))
+            print("{:>2} thread(s): save {:6.2f}s ({:6.1f} MB/s), load {:6.2f}s ({:6.1f} MB/s)".format(
+                threads, results[threads][0], opts.size / results[threads][0], results[threads][1],
+                opts.size / results[threads][1]))
+
+        print("speedup: save x{:.2f}, load x{:.2f}".format(results[1][0] / results[opts.threads][0],
+                                                            results[1][1] / results[opts.threads][1]))
+    finally:
+        shutil.rmtree(output_dir)
+
+
+if __name__ == "__main__":
+    main()
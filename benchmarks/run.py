@@ -0,0 +1,194 @@
+"""benchmark suite for instrument loading, saving, cleaning, keymap expansion and conversions
+
+Every benchmark runs for each size (number of samples) and reports the best wall time over a few runs, the sample
+and audio throughput derived from it and the peak python heap use (as traced by tracemalloc, which includes sample
+buffers but not the libxml2 tree).
+
+usage:
+    python benchmarks/run.py                                   # run everything and print results
+    python benchmarks/run.py -o benchmarks/baseline.json       # store a new baseline
+    python benchmarks/run.py -c benchmarks/baseline.json       # fail if slower or hungrier than the baseline
+"""
+
+from __future__ import print_function
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from copy import deepcopy
+
+from rnsutils import corpus
+from rnsutils.instrument import RenoiseInstrument
+from rnsutils.sf2toxrni import Sf2ToXrni
+from rnsutils.sfztoxrni import SfzToXrni
+from rnsutils.utils import expand_keymap
+from sf2utils.sf2parse import Sf2File
+
+DEFAULT_SIZES = [10, 100, 1000]
+TRACKED_METRICS = ['time', 'peak_memory']
+
+# timings below this many seconds are too noisy to be compared
+TIME_NOISE_FLOOR = 0.001
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    """register a benchmark. :arg func is given the size and a working directory and returns a (setup, run,
+    audio bytes) tuple, where setup() prepares the state given to the timed run(state)"""
+    BENCHMARKS.append(func)
+    return func
+
+
+@benchmark
+def load(size, work_dir):
+    filename = os.path.join(work_dir, 'load.xrni')
+    instrument = corpus.synthetic_instrument(size)
+    instrument.save(filename, cleanup=False)
+    return lambda: filename, RenoiseInstrument, sum(len(sample) for sample in instrument.sample_data)
+
+
+@benchmark
+def save(size, work_dir):
+    filename = os.path.join(work_dir, 'save.xrni')
+    instrument = corpus.synthetic_instrument(size)
+    return lambda: instrument, lambda state: state.save(filename, overwrite=True, cleanup=False), \
+        sum(len(sample) for sample in instrument.sample_data)
+
+
+@benchmark
+def cleanup(size, work_dir):
+    instrument = corpus.synthetic_instrument(size, frames=0, modulation_sets=8)
+    return lambda: deepcopy(instrument), RenoiseInstrument.cleanup, 0
+
+
+@benchmark
+def expand_keymap_(size, work_dir):
+    instrument = corpus.synthetic_instrument(size, frames=0)
+    return lambda: deepcopy(instrument), expand_keymap, 0
+
+
+@benchmark
+def sf2_convert_instrument(size, work_dir):
+    filename = os.path.join(work_dir, 'convert.sf2')
+    corpus.write_sf2(filename, size)
+    with open(filename, 'rb') as sf2_file:
+        sf2 = Sf2File(io.BytesIO(sf2_file.read()))
+
+    def run(renoise_instrument):
+        Sf2ToXrni().convert_instrument(sf2.instruments[0], renoise_instrument)
+
+    return RenoiseInstrument, run, os.path.getsize(filename)
+
+
+@benchmark
+def sfz_parse_sfz(size, work_dir):
+    lines = corpus.sfz_lines(size)
+    return lambda: lines, SfzToXrni(sfz_path=work_dir).parse_sfz, 0
+
+
+def measure(setup, run, repeat):
+    """:return best wall time of :arg repeat runs and peak traced memory of one more run"""
+    best_time = None
+    for _ in range(repeat):
+        state = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(state)
+        elapsed = time.perf_counter() - start
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+
+    state = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(state)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return best_time, peak_memory
+
+
+def run_benchmarks(sizes, names, repeat):
+    results = {}
+    for bench in BENCHMARKS:
+        name = bench.__name__.rstrip('_')
+        if names and not any(selected in name for selected in names):
+            continue
+
+        for size in sizes:
+            work_dir = tempfile.mkdtemp()
+            try:
+                setup, run, audio_bytes = bench(size, work_dir)
+                elapsed, peak_memory = measure(setup, run, repeat)
+            finally:
+                shutil.rmtree(work_dir)
+
+            key = '{}[{}]'.format(name, size)
+            results[key] = {'time': elapsed, 'samples_per_second': size / elapsed,
+                            'mb_per_second': audio_bytes / elapsed / 1024 / 1024, 'peak_memory': peak_memory}
+            print("{:<32} {:9.4f}s {:10.0f} samples/s {:8.1f} MB/s {:9.0f} KB peak".format(
+                key, elapsed, size / elapsed, audio_bytes / elapsed / 1024 / 1024, peak_memory / 1024.))
+            sys.stdout.flush()
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """:return list of (benchmark, metric, baseline value, current value) regressing beyond :arg threshold"""
+    regressions = []
+    for key, metrics in sorted(results.items()):
+        if key not in baseline:
+            continue
+        for metric in TRACKED_METRICS:
+            if metric == 'time' and baseline[key][metric] < TIME_NOISE_FLOOR:
+                continue
+            if metrics[metric] > baseline[key][metric] * (1 + threshold):
+                regressions.append((key, metric, baseline[key][metric], metrics[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="rnsutils benchmark suite")
+    parser.add_argument("-c", "--compare", dest="baseline", help="baseline results to compare to")
+    parser.add_argument("-k", dest="names", action="append", help="only run benchmarks matching name")
+    parser.add_argument("-o", "--output", dest="output", help="write results into file (eg a new baseline)")
+    parser.add_argument("-r", "--repeat", dest="repeat", type=int, default=3,
+                        help="runs per benchmark, best time is kept [default: %(default)s]")
+    parser.add_argument("-s", "--size", dest="sizes", action="append", type=int,
+                        help="number of samples [default: {}]".format(DEFAULT_SIZES))
+    parser.add_argument("-t", "--threshold", dest="threshold", type=float, default=0.25,
+                        help="tolerated relative regression [default: %(default)s]")
+    opts = parser.parse_args(argv)
+
+    results = run_benchmarks(opts.sizes or DEFAULT_SIZES, opts.names, opts.repeat)
+
+    if opts.output:
+        with io.open(opts.output, 'w') as output:
+            output.write(json.dumps({'machine': platform.platform(), 'python': platform.python_version(),
+                                     'results': results}, indent=2, sort_keys=True))
+
+    if opts.baseline:
+        with io.open(opts.baseline) as baseline:
+            regressions = compare(results, json.load(baseline)['results'], opts.threshold)
+        for key, metric, baseline_value, value in regressions:
+            print("REGRESSION {} {}: {:.4g} -> {:.4g} (+{:.0%})".format(key, metric, baseline_value, value,
+                                                                      value / baseline_value - 1))
+        if regressions:
+            return 1
+        print("no regression beyond {:.0%}".format(opts.threshold))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
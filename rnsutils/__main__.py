@@ -0,0 +1,5 @@
+import sys
+
+from rnsutils.cli import main
+
+sys.exit(main())
@@ -0,0 +1,163 @@
+"""asyncio API for converting, encoding and saving instruments without blocking the event loop.
+
+External encoders run as asyncio subprocesses while in process ones (see :mod rnsutils.encoders), xml conversion,
+sample export, zip reading and writing, which are blocking and CPU bound, run on the loop default executor (or the
+one given). All of them acquire a limiter, an asyncio.Semaphore allowing as many concurrent operations as cores by
+default (see :func default_limiter), so that many conversions may be in flight at once without overloading the
+machine::
+
+    sf2 = Sf2File(open('piano.sf2', 'rb'))
+    instruments = await asyncio.gather(*(convert_sf2_instrument(sf2_instrument, encoding=ENCODING_FLAC)
+                                         for sf2_instrument in sf2.instruments if not sf2_instrument.is_sentinel()))
+    await asyncio.gather(*(save_instrument(instrument, '{}.xrni'.format(instrument.name))
+                           for instrument in instruments))
+"""
+
+import asyncio
+import functools
+import os
+import tempfile
+import threading
+import weakref
+
+from .utils import ENCODING_NONE, ENCODING_FLAC, ENCODER_COMMANDS
+from .ziputils import default_thread_count
+
+_limiters = weakref.WeakKeyDictionary()
+
+# SoundFont 2 files read their samples through a single file handle, conversions of their instruments can't overlap
+_sf2_locks = weakref.WeakKeyDictionary()
+_sf2_locks_lock = threading.Lock()
+
+
+def default_limiter():
+    """:return limiter shared by operations of the running event loop not given one, allowing as many concurrent
+    operations as cores"""
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = _limiters[loop] = asyncio.Semaphore(default_thread_count())
+    return limiter
+
+
+async def run_blocking(func, *args, limiter=None, executor=None, **kwargs):
+    """:return result of blocking :arg func(*args, **kwargs), run on :arg executor [default: event loop default]
+    once :arg limiter [default: see :func default_limiter] allows it"""
+    async with limiter or default_limiter():
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+def _write_file(filename, content):
+    with open(filename, 'wb') as output_file:
+        output_file.write(content)
+
+
+def _read_file(filename):
+    with open(filename, 'rb') as input_file:
+        return input_file.read()
+
+
+async def encode_audio_file_async(sample_content, encoding, limiter=None):
+    """coroutine encoding :arg sample_content as audio file content into :arg encoding format, like
+    :func rnsutils.utils.encode_audio_file
+    :raise RuntimeError when the encoder fails"""
+    if encoding == ENCODING_NONE:
+        return sample_content
+
+    from .encoders import backend
+    encoder = backend(encoding)
+    if encoder.in_process:
+        return await run_blocking(encoder.encode, sample_content, limiter=limiter)
+
+    in_fd, in_filename = tempfile.mkstemp(suffix='.wav')
+    out_fd, out_filename = tempfile.mkstemp(suffix='.{}'.format(encoding))
+    os.close(in_fd)
+    os.close(out_fd)
+    try:
+        async with limiter or default_limiter():
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, _write_file, in_filename, sample_content)
+
+            process = await asyncio.create_subprocess_exec(*ENCODER_COMMANDS[encoding](in_filename, out_filename),
+                                                           stdout=asyncio.subprocess.PIPE,
+                                                           stderr=asyncio.subprocess.STDOUT)
+            output, _ = await process.communicate()
+            if process.returncode:
+                raise encoder.failure(process.returncode, output)
+
+            return await loop.run_in_executor(None, _read_file, out_filename)
+    finally:
+        os.remove(in_filename)
+        os.remove(out_filename)
+
+
+async def encode_instrument_samples(renoise_instrument, encoding, limiter=None):
+    """coroutine encoding all samples of :arg renoise_instrument into :arg encoding format, concurrently"""
+    renoise_instrument.sample_data = list(await asyncio.gather(
+        *(encode_audio_file_async(sample, encoding, limiter) for sample in renoise_instrument.sample_data)))
+
+
+def _sf2_lock(sf2_file):
+    with _sf2_locks_lock:
+        lock = _sf2_locks.get(sf2_file)
+        if lock is None:
+            lock = _sf2_locks[sf2_file] = threading.Lock()
+        return lock
+
+
+def _convert_sf2_instrument(sf2_instrument, template_filename, expand_keymap, converter_options):
+    from .instrument import RenoiseInstrument
+    from .sf2toxrni import Sf2ToXrni
+    from .utils import expand_keymap as expand
+
+    renoise_instrument = RenoiseInstrument(template_filename=template_filename)
+    with _sf2_lock(sf2_instrument.parent):
+        Sf2ToXrni(encoding=ENCODING_NONE, **converter_options).convert_instrument(sf2_instrument, renoise_instrument)
+    if expand_keymap:
+        expand(renoise_instrument)
+    return renoise_instrument
+
+
+async def convert_sf2_instrument(sf2_instrument, encoding=ENCODING_FLAC, template_filename="empty-31.xrni",
+                                 expand_keymap=True, limiter=None, executor=None, **converter_options):
+    """coroutine converting :arg sf2_instrument into a renoise instrument, like sf2toxrni
+    :arg converter_options Sf2ToXrni options, eg force_center
+    :return converted RenoiseInstrument, not saved yet"""
+    renoise_instrument = await run_blocking(_convert_sf2_instrument, sf2_instrument, template_filename,
+                                            expand_keymap, converter_options, limiter=limiter, executor=executor)
+    await encode_instrument_samples(renoise_instrument, encoding, limiter)
+    return renoise_instrument
+
+
+def _convert_sfz(sfz_filename, template_filename, converter_options):
+    from .instrument import RenoiseInstrument
+    from .sfztoxrni import SfzToXrni
+
+    renoise_instrument = RenoiseInstrument(template_filename=template_filename)
+    SfzToXrni(sfz_path=os.path.dirname(sfz_filename), encoding=ENCODING_NONE,
+              **converter_options).convert_instrument(sfz_filename, renoise_instrument)
+    return renoise_instrument
+
+
+async def convert_sfz(sfz_filename, encoding=ENCODING_FLAC, template_filename="empty-31.xrni", limiter=None,
+                      executor=None, **converter_options):
+    """coroutine converting SFZ :arg sfz_filename into a renoise instrument, like sfztoxrni
+    :return converted RenoiseInstrument, not saved yet"""
+    renoise_instrument = await run_blocking(_convert_sfz, sfz_filename, template_filename, converter_options,
+                                            limiter=limiter, executor=executor)
+    await encode_instrument_samples(renoise_instrument, encoding, limiter)
+    return renoise_instrument
+
+
+async def load_instrument(filename, threads=None, limiter=None, executor=None):
+    """coroutine loading the renoise instrument :arg filename"""
+    from .instrument import RenoiseInstrument
+    return await run_blocking(RenoiseInstrument, filename, threads=threads, limiter=limiter, executor=executor)
+
+
+async def save_instrument(renoise_instrument, filename, overwrite=False, cleanup=True, threads=None, limiter=None,
+                          executor=None):
+    """coroutine saving :arg renoise_instrument into :arg filename, like
+    :meth rnsutils.instrument.RenoiseInstrument.save"""
+    return await run_blocking(renoise_instrument.save, filename, overwrite=overwrite, cleanup=cleanup, threads=threads,
+                              limiter=limiter, executor=executor)
@@ -0,0 +1,150 @@
+"""sample level analysis (peak and RMS levels) and silence trimming of WAV samples, vectorized with numpy, along
+with the PCM conversions they rely on.
+
+numpy is an optional dependency (``pip install rnsutils[analysis]``), only imported when analysing samples. 8, 16, 24
+and 32 bits PCM WAV files with any number of channels are supported, other formats are left alone."""
+
+import io
+import logging
+import math
+from collections import namedtuple
+
+from . import stats
+
+DEFAULT_SILENCE_THRESHOLD = -60.0
+
+# :arg frames and :arg channels of the sample, :arg peak and :arg rms levels in dBFS (None when silent), frames
+# before :arg start and from :arg end on being below the silence threshold
+SampleAnalysis = namedtuple('SampleAnalysis', ['frames', 'channels', 'peak', 'rms', 'start', 'end'])
+
+
+def available():
+    """:return whether numpy, needed to analyse samples, is installed"""
+    import importlib.util
+    return importlib.util.find_spec('numpy') is not None
+
+
+def _to_db(level):
+    return round(20 * math.log10(level), 2) if level > 0 else None
+
+
+def pcm_to_array(frames, sample_width, channels):
+    """:return (frames, channels) float array of PCM :arg frames, :arg sample_width bytes wide, scaled to [-1, 1)"""
+    import numpy
+
+    frames = frames[:len(frames) - len(frames) % (sample_width * channels)]
+    if sample_width == 1:
+        # 8 bits samples are unsigned
+        data = numpy.frombuffer(frames, numpy.uint8).astype(numpy.int32) - 128
+    elif sample_width == 3:
+        data = numpy.frombuffer(frames, numpy.uint8).reshape(-1, 3).astype(numpy.int32)
+        data = data[:, 0] | data[:, 1] << 8 | data[:, 2] << 16
+        data -= (data & 0x800000) << 1
+    else:
+        data = numpy.frombuffer(frames, '<i{}'.format(sample_width))
+
+    return data.reshape(-1, channels).astype(numpy.float64) / float(1 << (8 * sample_width - 1))
+
+
+def array_to_pcm(samples, sample_width):
+    """:return PCM frames, :arg sample_width bytes wide, of :arg samples float array scaled to [-1, 1), rounded and
+    clipped"""
+    import numpy
+
+    full_scale = float(1 << (8 * sample_width - 1))
+    data = numpy.clip(numpy.rint(samples * full_scale), -full_scale, full_scale - 1).astype('<i4')
+    if sample_width == 1:
+        return (data + 128).astype(numpy.uint8).tobytes()
+    if sample_width == 3:
+        return data.reshape(-1).view(numpy.uint8).reshape(-1, 4)[:, :3].tobytes()
+    return data.astype('<i{}'.format(sample_width)).tobytes()
+
+
+def write_wav(frames, channels, sample_width, sample_rate):
+    """:return WAV file content of PCM :arg frames"""
+    import wave
+
+    wav_content = io.BytesIO()
+    with wave.open(wav_content, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(frames)
+    return wav_content.getvalue()
+
+
+def read_wav(wav_content):
+    """:return (wave params, frames) of :arg wav_content, None if not a PCM WAV file"""
+    import wave
+
+    if wav_content[:4] != b'RIFF' or wav_content[8:12] != b'WAVE':
+        return None
+    try:
+        with wave.open(io.BytesIO(wav_content)) as wav_file:
+            return wav_file.getparams(), wav_file.readframes(wav_file.getnframes())
+    except (wave.Error, EOFError) as e:
+        logging.debug("Not analysing sample: %s", e)
+        return None
+
+
+def analyse(wav_content, threshold=DEFAULT_SILENCE_THRESHOLD):
+    """:return SampleAnalysis of :arg wav_content, frames below :arg threshold dBFS on all channels being silent,
+    None if not a PCM WAV file"""
+    wav = read_wav(wav_content)
+    return None if wav is None else _analyse(*wav, threshold=threshold)
+
+
+def _analyse(params, frames, threshold):
+    import numpy
+
+    levels = numpy.abs(pcm_to_array(frames, params.sampwidth, params.nchannels))
+    audible = numpy.flatnonzero(levels.max(axis=1, initial=0) > 10 ** (threshold / 20.))
+
+    return SampleAnalysis(frames=len(levels), channels=params.nchannels,
+                          peak=_to_db(float(levels.max(initial=0))),
+                          rms=_to_db(math.sqrt(float(numpy.square(levels).mean()))) if len(levels) else None,
+                          start=int(audible[0]) if len(audible) else 0,
+                          end=int(audible[-1]) + 1 if len(audible) else len(levels))
+
+
+@stats.timed('analysis.trim')
+def trim_silence(wav_content, renoise_sample, threshold=DEFAULT_SILENCE_THRESHOLD):
+    """trim leading and trailing silence below :arg threshold dBFS from :arg wav_content, shifting loop points of
+    :arg renoise_sample to match. Looped parts are never trimmed and samples silent throughout are kept whole.
+    :return trimmed WAV content"""
+    wav = read_wav(wav_content)
+    if wav is None:
+        return wav_content
+    params, frames = wav
+    analysis = _analyse(params, frames, threshold)
+
+    start, end = analysis.start, analysis.end
+    if renoise_sample.LoopMode != "Off":
+        start = min(start, int(renoise_sample.LoopStart))
+        end = max(end, int(renoise_sample.LoopEnd))
+    end = min(end, analysis.frames)
+
+    stats.record('sample_analysis', {'name': renoise_sample.Name.text, 'frames': analysis.frames,
+                                     'channels': analysis.channels, 'peak': analysis.peak, 'rms': analysis.rms,
+                                     'trimmed_start': start, 'trimmed_end': analysis.frames - end})
+
+    if start == 0 and end == analysis.frames:
+        return wav_content
+    stats.count('trimmed_frames', analysis.frames - end + start)
+
+    frame_size = params.sampwidth * params.nchannels
+    trimmed_content = write_wav(frames[start * frame_size:end * frame_size], params.nchannels, params.sampwidth,
+                                params.framerate)
+
+    renoise_sample.LoopStart = min(max(int(renoise_sample.LoopStart) - start, 0), end - start)
+    renoise_sample.LoopEnd = min(max(int(renoise_sample.LoopEnd) - start, 0), end - start)
+
+    return trimmed_content
+
+
+def add_arguments(parser):
+    """add --trim-silence option to argparse :arg parser"""
+    parser.add_argument("--trim-silence", dest="trim_silence", metavar="DB", type=float,
+                        help="trim leading and trailing silence below DB dBFS (eg {}) from samples, recording their "
+                             "peak and RMS levels in stats, needs numpy [default: no trimming]".format(
+                            DEFAULT_SILENCE_THRESHOLD))
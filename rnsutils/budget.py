@@ -0,0 +1,134 @@
+"""memory budget shared by concurrent sample encodings.
+
+Encoding a sample holds several copies of it at once (the sample, the encoded result, decoded frames or encoder
+buffers), so a few huge samples encoded together may exhaust memory while many small ones leave it unused. When a
+budget is set (see :func session), every encoding first reserves memory proportional to its sample size and blocks
+until the reservation fits, concurrency adapting to sample sizes: threads encoding samples (see
+:func rnsutils.utils.encode_samples) and jobs of the shared memory pool (see :mod rnsutils.sharedmem) only start when
+their samples fit. A sample larger than the whole budget is encoded alone.
+
+The peak memory reserved is reported among the run statistics (see :mod rnsutils.stats), along with the peak resident
+memory of the process and its children."""
+
+import threading
+from contextlib import contextmanager
+
+from . import stats
+
+# bytes reserved per byte of sample while encoding it
+ENCODE_OVERHEAD = 3
+
+_SIZE_SUFFIXES = {'k': 1 << 10, 'm': 1 << 20, 'g': 1 << 30, 't': 1 << 40}
+
+_budget = None
+
+
+class MemoryBudget(object):
+    """:arg limit bytes that may be reserved at once"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.reserved = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def _fits(self, size):
+        # what exceeds the whole budget is admitted alone rather than never
+        return self.reserved + size <= self.limit or not self.reserved
+
+    def _add(self, size):
+        self.reserved += size
+        if self.reserved > self.peak:
+            self.peak = self.reserved
+            stats.peak('memory.peak_reserved', self.peak)
+
+    def try_acquire(self, size):
+        """reserve :arg size bytes if they fit right away
+        :return whether they were reserved"""
+        with self._condition:
+            if not self._fits(size):
+                return False
+            self._add(size)
+            return True
+
+    def acquire(self, size):
+        """reserve :arg size bytes, waiting for them to fit"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._fits(size))
+            self._add(size)
+
+    def release(self, size):
+        """give back :arg size bytes reserved by :meth acquire or :meth try_acquire"""
+        with self._condition:
+            self.reserved -= size
+            self._condition.notify_all()
+
+    @contextmanager
+    def reserve(self, size):
+        """reserve :arg size bytes for the enclosed block"""
+        self.acquire(size)
+        try:
+            yield
+        finally:
+            self.release(size)
+
+
+def current():
+    """:return budget of the session, None when memory is not limited"""
+    return _budget
+
+
+def encode_cost(size):
+    """:return bytes to reserve to encode a sample of :arg size bytes"""
+    return ENCODE_OVERHEAD * size
+
+
+@contextmanager
+def reserve(size):
+    """reserve :arg size bytes of the session budget, if any, for the enclosed block"""
+    budget = _budget
+    if budget is None:
+        yield
+        return
+    with budget.reserve(size):
+        yield
+
+
+def memory_size(value):
+    """argparse type of memory sizes in bytes, with an optional K, M, G or T suffix (eg 512M)
+    :return size in bytes"""
+    import argparse
+
+    multiplier = _SIZE_SUFFIXES.get(value[-1:].lower(), 1)
+    try:
+        size = int(float(value[:-1] if multiplier > 1 else value) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid memory size '{}'".format(value))
+    if size <= 0:
+        raise argparse.ArgumentTypeError("memory size must be positive")
+    return size
+
+
+def add_arguments(parser):
+    """add --max-memory option to argparse :arg parser"""
+    parser.add_argument("--max-memory", dest="max_memory", metavar="SIZE", type=memory_size,
+                        help="limit memory held by samples being encoded at once to SIZE bytes, with an optional K, "
+                             "M or G suffix, encodings waiting for memory to be available [default: unlimited]")
+
+
+@contextmanager
+def session(opts):
+    """limit memory of encodings during the enclosed block, as requested by :arg opts command line options (see
+    :func add_arguments)
+    :return the budget, None if unlimited"""
+    global _budget
+
+    if not opts.max_memory:
+        yield None
+        return
+
+    budget = _budget = MemoryBudget(opts.max_memory)
+    try:
+        yield budget
+    finally:
+        _budget = None
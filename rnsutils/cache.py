@@ -0,0 +1,96 @@
+"""in memory caches of parsed templates, SoundFont 2 files and encoded samples, kept warm across jobs by the
+conversion server. Caching is disabled unless :func enable is called, in which case cached objects must not be
+altered by callers: either they are read only or the cache hands out copies (see :func file_cached)."""
+
+import os
+import threading
+from collections import OrderedDict
+
+from .fingerprint import file_signature
+
+_caches = None
+_lock = threading.Lock()
+
+
+class LruCache(object):
+    """least recently used cache holding up to :arg capacity worth of values, each value weighing :arg weigh(value)
+    [default: 1]"""
+
+    def __init__(self, capacity, weigh=None):
+        self.capacity = capacity
+        self.weigh = weigh or (lambda value: 1)
+        self.entries = OrderedDict()
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """:return value cached for :arg key, None if missing"""
+        try:
+            self.entries.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.entries[key]
+
+    def put(self, key, value):
+        weight = self.weigh(value)
+        if weight > self.capacity:
+            return
+
+        if key in self.entries:
+            self.weight -= self.weigh(self.entries.pop(key))
+        self.entries[key] = value
+        self.weight += weight
+
+        while self.weight > self.capacity:
+            _, evicted = self.entries.popitem(last=False)
+            self.weight -= self.weigh(evicted)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def enable(caches):
+    """enable caching, :arg caches being a {kind: LruCache} dict"""
+    global _caches
+    _caches = caches
+
+
+def disable():
+    global _caches
+    _caches = None
+
+
+def enabled(kind):
+    return _caches is not None and kind in _caches
+
+
+def cached(kind, key, loader, copy=None):
+    """:return value cached as :arg key in the :arg kind cache, computed by :arg loader() if missing. When given,
+    :arg copy is applied to values before handing them out."""
+    if not enabled(kind):
+        return loader()
+
+    with _lock:
+        value = _caches[kind].get(key)
+    if value is None:
+        value = loader()
+        if value is None:
+            return None
+        with _lock:
+            _caches[kind].put(key, value)
+
+    return copy(value) if copy else value
+
+
+def file_cached(kind, filename, loader, copy=None):
+    """:return :arg loader(:arg filename), cached in the :arg kind cache until the file changes (see :func cached)"""
+    return cached(kind, (os.path.abspath(filename), file_signature(filename)), lambda: loader(filename), copy)
+
+
+def statistics():
+    """:return {kind: {'entries', 'weight', 'hits', 'misses'}} of enabled caches"""
+    return {kind: {'entries': len(lru_cache), 'weight': lru_cache.weight, 'hits': lru_cache.hits,
+                   'misses': lru_cache.misses} for kind, lru_cache in (_caches or {}).items()}
@@ -0,0 +1,77 @@
+# cli. single entry point for all rnsutils commands
+# Copyright (C) 2016  Olivier Jolly
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""CLI dispatching ``rnsutils <command> [arguments]`` to the command main function. Only the module of the chosen
+command is imported, so that starting a command costs no more than running its own console script."""
+
+from __future__ import print_function
+
+import importlib
+import sys
+
+from rnsutils import __version__
+
+# command name -> (module defining main, description)
+COMMANDS = {
+    'sf2toxrni': ('rnsutils.sf2toxrni', "convert SoundFont 2 instruments into renoise instruments"),
+    'sfztoxrni': ('rnsutils.sfztoxrni', "convert SFZ instruments into renoise instruments"),
+    'xrniextract': ('rnsutils.xrniextract', "extract samples of renoise instruments along with SFZ mappings"),
+    'xrnidiff': ('rnsutils.xrnidiff', "report samples, mappings or metadata differing between renoise instruments"),
+    'xrnidedup': ('rnsutils.xrnidedup', "find samples duplicated among renoise instruments and store them once"),
+    'xrnicomment': ('rnsutils.xrnicomment', "display or change renoise instrument comments"),
+    'xrniorganise': ('rnsutils.xrniorganise', "organise renoise instruments according to their tags"),
+    'xrnireencode': ('rnsutils.xrnireencode', "reencode samples in renoise instruments"),
+    'xrnitag': ('rnsutils.xrnitag', "display or change renoise instrument tags"),
+    'xrniverify': ('rnsutils.xrniverify', "check renoise instruments integrity"),
+    'serve': ('rnsutils.serve', "serve commands over a unix domain socket, keeping caches warm"),
+    'client': ('rnsutils.client', "run a command on a running server"),
+}
+
+
+def usage():
+    """:return help text listing available commands"""
+    lines = ["usage: rnsutils <command> [arguments]", "", "commands:"]
+    lines += ["  {:<14} {}".format(name, description) for name, (_, description) in sorted(COMMANDS.items())]
+    lines += ["", "use 'rnsutils <command> --help' for the arguments of a command"]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0 if argv else 2
+
+    if argv[0] in ('-v', '--version'):
+        print('rnsutils {}'.format(__version__))
+        return 0
+
+    command = argv[0]
+    if command not in COMMANDS:
+        sys.stderr.write("rnsutils: unknown command '{}'\n{}\n".format(command, usage()))
+        return 2
+
+    # commands name themselves after sys.argv[0] in their usage and error messages
+    sys.argv[0] = 'rnsutils {}'.format(command)
+
+    module_name, _ = COMMANDS[command]
+    return importlib.import_module(module_name).main(argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# client. submit jobs to a running rnsutils conversion server
+# Copyright (C) 2016  Olivier Jolly
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""thin client for the conversion server (see :mod rnsutils.serve), taking the same arguments as the commands.
+
+Jobs are sent as one json line ``{"command": ..., "args": [...], "cwd": ...}`` over a unix domain socket. The server
+answers with json lines, ``{"event": "output", "stream": "stdout" or "stderr", "text": ...}`` as the job runs and
+``{"event": "done", "status": ...}`` when it completes."""
+
+from __future__ import print_function
+
+import argparse
+import os
+import socket
+import sys
+
+# requests which are not commands
+REQUEST_STATUS = 'status'
+REQUEST_SHUTDOWN = 'shutdown'
+
+
+def default_socket_path():
+    """:return socket path of the server, from RNSUTILS_SOCKET if set, else in the user runtime directory"""
+    if os.environ.get('RNSUTILS_SOCKET'):
+        return os.environ['RNSUTILS_SOCKET']
+
+    return os.path.join(os.environ.get('XDG_RUNTIME_DIR') or os.environ.get('TMPDIR') or '/tmp',
+                        'rnsutils-{}.sock'.format(os.getuid()))
+
+
+def submit(socket_path, command, args=(), cwd=None):
+    """send a :arg command job with :arg args to the server listening on :arg socket_path, run from :arg cwd
+    [default: current directory]
+    :return iterator over the events received for the job"""
+    import json
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(socket_path)
+
+    with connection, connection.makefile('rwb') as stream:
+        stream.write(json.dumps({'command': command, 'args': list(args), 'cwd': cwd or os.getcwd()}).encode('utf-8')
+                     + b'\n')
+        stream.flush()
+
+        for line in stream:
+            yield json.loads(line.decode('utf-8'))
+
+
+def main(argv=None):
+    program_name = os.path.basename(sys.argv[0])
+    program_longdesc = '''Run a command on the rnsutils conversion server'''
+    program_license = "GPL v3+ 2016-2017 Olivier Jolly"
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    try:
+        parser = argparse.ArgumentParser(epilog=program_longdesc,
+                                         description=program_license)
+        parser.add_argument("-S", "--socket", dest="socket_path", default=default_socket_path(),
+                            help="server socket [default: %(default)s]")
+        parser.add_argument("command", help="command to run, '{}' to show server caches or '{}' to stop the "
+                                            "server".format(REQUEST_STATUS, REQUEST_SHUTDOWN))
+        parser.add_argument("args", nargs=argparse.REMAINDER, help="command arguments")
+
+        # process options
+        opts = parser.parse_args(argv)
+
+    except Exception as e:
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help")
+        return 2
+
+    status = 1
+    try:
+        for event in submit(opts.socket_path, opts.command, opts.args):
+            if event['event'] == 'output':
+                stream = sys.stderr if event['stream'] == 'stderr' else sys.stdout
+                stream.write(event['text'])
+                stream.flush()
+            elif event['event'] == 'done':
+                status = event['status']
+    except (IOError, OSError) as e:
+        sys.stderr.write("{}: no server on {} ({}), start one with 'rnsutils serve'\n".format(program_name,
+                                                                                            opts.socket_path, e))
+        return 2
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""structural comparison of instruments, telling whether two instruments hold the same Instrument.xml once serialized
+canonically (see :func rnsutils.instrument.canonical_xml), the same samples and the same fingerprint, whatever the
+bytes of their archives, and reporting which samples, mappings or metadata differ otherwise.
+
+Instruments are described by their tree and the sha1 of their samples (see :func describe_instrument and
+:func describe_file), archives being read an entry chunk at a time so that their samples are never held in memory.
+:func same_content compares an instrument about to be saved with an existing archive, cheap checks (entry names,
+sample sizes and CRCs found in the zip central directory, fingerprint, then Instrument.xml) coming first so that
+changed instruments are told apart without hashing any sample."""
+
+import hashlib
+import re
+import zlib
+from collections import Counter, OrderedDict, namedtuple
+
+KIND_METADATA = 'metadata'
+KIND_MAPPING = 'mapping'
+KIND_SAMPLE = 'sample'
+
+XML_ENTRY = 'Instrument.xml'
+
+_SAMPLE_PATH_REGEX = re.compile(r'^SampleGenerator/Samples/Sample(?:\[(\d+)\])?(?:/(.*))?$')
+
+# root: instrument tree, samples: list of (entry name, sha1) in sample order, fingerprint: conversion fingerprint
+InstrumentDescription = namedtuple('InstrumentDescription', 'root samples fingerprint')
+
+# kind among KIND_*, sample index (None for metadata), path of the element differing relative to the sample mapping,
+# the sample or the instrument, and its values in both instruments (None when missing)
+Difference = namedtuple('Difference', 'kind sample path first second')
+
+
+def xml_digest(root):
+    """:return sha1 of :arg root serialized canonically"""
+    from .instrument import canonical_xml
+    return hashlib.sha1(canonical_xml(root, pretty_print=False)).hexdigest()
+
+
+def sample_digest(sample):
+    """:return sha1 of :arg sample content"""
+    return hashlib.sha1(sample).hexdigest()
+
+
+def entry_digest(zip_file, name):
+    """:return sha1 of :arg name entry of opened :arg zip_file, inflated by chunks"""
+    from .ziputils import CHUNK_SIZE
+
+    digest = hashlib.sha1()
+    with zip_file.open(name) as entry:
+        for chunk in iter(lambda: entry.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_root(zip_file):
+    from lxml import etree
+    from .lookup import get_renoise_parser
+    return etree.fromstring(zip_file.read(XML_ENTRY), get_renoise_parser())
+
+
+def describe_instrument(instrument):
+    """:return InstrumentDescription of :arg instrument, whose samples are in memory"""
+    return InstrumentDescription(instrument.root, [(instrument.sample_entry_name(sample_idx, sample),
+                                                    sample_digest(sample))
+                                                   for sample_idx, sample in enumerate(instrument.sample_data)],
+                                 instrument.fingerprint)
+
+
+def describe_file(filename):
+    """:return InstrumentDescription of the instrument archive :arg filename, or readable file object"""
+    from zipfile import ZipFile
+    from .fingerprint import decode_fingerprint
+    from .xrniextract import sample_entries
+
+    with ZipFile(filename) as z:
+        entries = sample_entries(z.namelist())
+        return InstrumentDescription(_read_root(z), [(entries[sample_idx], entry_digest(z, entries[sample_idx]))
+                                                     for sample_idx in sorted(entries)], decode_fingerprint(z.comment))
+
+
+def same_description(first, second):
+    """:return whether :arg first and :arg second InstrumentDescription describe the same instrument"""
+    return first.fingerprint == second.fingerprint and first.samples == second.samples and \
+        xml_digest(first.root) == xml_digest(second.root)
+
+
+def same_files(first_filename, second_filename):
+    """:return whether instrument archives :arg first_filename and :arg second_filename hold the same instrument,
+    False if either can't be read"""
+    from zipfile import BadZipfile
+    from lxml import etree
+
+    try:
+        return same_description(describe_file(first_filename), describe_file(second_filename))
+    except (IOError, OSError, KeyError, BadZipfile, etree.XMLSyntaxError):
+        return False
+
+
+def same_content(instrument, filename):
+    """:return whether :arg filename holds what saving :arg instrument into it would write, False if unreadable"""
+    from zipfile import ZipFile, BadZipfile
+    from lxml import etree
+    from .fingerprint import decode_fingerprint
+
+    names = [instrument.sample_entry_name(sample_idx, sample) for sample_idx, sample in
+             enumerate(instrument.sample_data)]
+
+    try:
+        with ZipFile(filename) as z:
+            if sorted(z.namelist()) != sorted(names + [XML_ENTRY]) or \
+                    decode_fingerprint(z.comment) != instrument.fingerprint:
+                return False
+
+            for name, sample in zip(names, instrument.sample_data):
+                info = z.getinfo(name)
+                if info.file_size != len(sample) or info.CRC != zlib.crc32(sample) & 0xffffffff:
+                    return False
+
+            if xml_digest(_read_root(z)) != xml_digest(instrument.root):
+                return False
+
+            # CRCs may collide, digests are only compared once everything else matches
+            return all(entry_digest(z, name) == sample_digest(sample) for name, sample in
+                       zip(names, instrument.sample_data))
+    except (IOError, OSError, BadZipfile, etree.XMLSyntaxError):
+        return False
+
+
+def _is_leaf(element):
+    # len() of objectified elements counts their siblings, not their children
+    return next(element.iterchildren(), None) is None
+
+
+def _element_value(element):
+    if element is None:
+        return None
+    return element.text if _is_leaf(element) else '<{}>'.format(element.tag)
+
+
+def _children(element, indexed):
+    """:return list of (name, child) of :arg element, names of :arg indexed tags being suffixed by their rank"""
+    children = []
+    ranks = Counter()
+    for child in element.iterchildren():
+        children.append(('{}[{}]'.format(child.tag, ranks[child.tag]) if child.tag in indexed else child.tag, child))
+        ranks[child.tag] += 1
+    return children
+
+
+def _tree_differences(e1, e2, path):
+    """:return iterator over (path, first value, second value) of elements differing between :arg e1 and :arg e2,
+    compared like :func rnsutils.instrument._elements_equal, ignoring whitespace between elements"""
+    if e1 is None or e2 is None or e1.tag != e2.tag:
+        yield path, _element_value(e1), _element_value(e2)
+        return
+
+    if _is_leaf(e1) and _is_leaf(e2) and (e1.text or '') != (e2.text or ''):
+        yield path, e1.text, e2.text
+
+    for key in sorted(set(e1.attrib) | set(e2.attrib)):
+        if e1.get(key) != e2.get(key):
+            yield '{}@{}'.format(path, key), e1.get(key), e2.get(key)
+
+    # tags repeated in either tree are named by rank in both
+    indexed = set()
+    for element in (e1, e2):
+        indexed.update(tag for tag, count in Counter(child.tag for child in element.iterchildren()).items()
+                       if count > 1)
+
+    children2 = OrderedDict(_children(e2, indexed))
+    for name, child1 in _children(e1, indexed):
+        for difference in _tree_differences(child1, children2.pop(name, None), '/'.join(filter(None, (path, name)))):
+            yield difference
+    for name, child2 in children2.items():
+        yield '/'.join(filter(None, (path, name))), None, _element_value(child2)
+
+
+def _classify(path, first, second):
+    match = _SAMPLE_PATH_REGEX.match(path)
+    if match is None:
+        return Difference(KIND_METADATA, None, path, first, second)
+
+    sample_idx, sample_path = int(match.group(1) or 0), match.group(2) or ''
+    if sample_path == 'Mapping' or sample_path.startswith('Mapping/'):
+        return Difference(KIND_MAPPING, sample_idx, sample_path[len('Mapping/'):], first, second)
+    return Difference(KIND_SAMPLE, sample_idx, sample_path, first, second)
+
+
+def differences(first, second):
+    """:return list of Difference between :arg first and :arg second InstrumentDescription: instrument metadata,
+    sample properties and mappings, sample contents (path 'data', with their sha1) and fingerprint"""
+    result = [_classify(path, value1, value2) for path, value1, value2 in
+              _tree_differences(first.root, second.root, '')]
+
+    for sample_idx in range(max(len(first.samples), len(second.samples))):
+        digest1 = first.samples[sample_idx][1] if sample_idx < len(first.samples) else None
+        digest2 = second.samples[sample_idx][1] if sample_idx < len(second.samples) else None
+        if digest1 != digest2:
+            result.append(Difference(KIND_SAMPLE, sample_idx, 'data', digest1, digest2))
+
+    if first.fingerprint != second.fingerprint:
+        result.append(Difference(KIND_METADATA, None, 'fingerprint', first.fingerprint, second.fingerprint))
+
+    return result
+
+
+def format_difference(difference):
+    """:return human readable line describing :arg difference"""
+    if difference.kind == KIND_METADATA:
+        subject = difference.path or 'instrument'
+    elif difference.kind == KIND_MAPPING:
+        subject = 'sample {} mapping{}'.format(difference.sample, ' ' + difference.path if difference.path else '')
+    else:
+        subject = 'sample {}{}'.format(difference.sample, ' ' + difference.path if difference.path else '')
+    return '{}: {!r} -> {!r}'.format(subject, difference.first, difference.second)
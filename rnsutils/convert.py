@@ -0,0 +1,82 @@
+"""in memory conversion API, taking SoundFont 2, SFZ and XRNI content as bytes or file objects and returning XRNI
+content as bytes, or writing it into a writable file object, without touching the disk::
+
+    xrni = convert_sf2(uploaded_sf2_bytes, instrument_index=2)
+    xrni = convert_sfz(uploaded_sfz_bytes, sample_resolver=lambda path: uploaded_samples.get(path))
+    convert_sf2(sf2_file, output=response_stream)
+
+flac and ogg are encoded in process through soundfile when it is installed, otherwise by the flac and oggenc
+commands, which read and write temporary files (see :mod rnsutils.encoders). The default uncompressed encoding never
+touches the disk."""
+
+import io
+
+from .utils import ENCODING_NONE, encode_audio_file, expand_keymap as expand
+
+
+def _readable(content):
+    return io.BytesIO(content) if isinstance(content, (bytes, bytearray, memoryview)) else content
+
+
+def _output(renoise_instrument, output):
+    if output is None:
+        return renoise_instrument.to_bytes()
+    renoise_instrument.save(output)
+    return None
+
+
+def convert_sf2(sf2, instrument_index=0, encoding=ENCODING_NONE, template_filename="empty-31.xrni",
+                expand_keymap=True, output=None, **converter_options):
+    """convert the :arg instrument_index th instrument of SoundFont 2 :arg sf2, given as bytes or a binary file
+    object, like sf2toxrni
+    :arg converter_options Sf2ToXrni options, eg force_center
+    :return XRNI content, or None when written into the :arg output writable file object"""
+    from .instrument import RenoiseInstrument
+    from .sf2toxrni import Sf2ToXrni, _parse_sf2
+
+    sf2_instruments = _parse_sf2(_readable(sf2)).instruments
+    if not 0 <= instrument_index < len(sf2_instruments) or sf2_instruments[instrument_index].is_sentinel():
+        raise IndexError("no instrument {} in SoundFont 2 content".format(instrument_index))
+
+    renoise_instrument = RenoiseInstrument(template_filename=template_filename)
+    Sf2ToXrni(encoding=encoding, **converter_options).convert_instrument(sf2_instruments[instrument_index],
+                                                                         renoise_instrument)
+    if expand_keymap:
+        expand(renoise_instrument)
+
+    return _output(renoise_instrument, output)
+
+
+def convert_sfz(sfz, sample_resolver, sfz_name='instrument.sfz', encoding=ENCODING_NONE,
+                template_filename="empty-31.xrni", output=None, **converter_options):
+    """convert SFZ :arg sfz, given as bytes, text or a file object, like sfztoxrni
+    :arg sample_resolver called with the path of every sample, relative to the SFZ, and returning its content as bytes
+    or a binary file object, or None when missing
+    :arg sfz_name SFZ filename, used to name the instrument
+    :return XRNI content, or None when written into the :arg output writable file object"""
+    from .instrument import RenoiseInstrument
+    from .sfztoxrni import SfzToXrni
+
+    if isinstance(sfz, (bytes, bytearray)):
+        sfz = sfz.decode('utf-8')
+    if isinstance(sfz, str):
+        sfz = io.StringIO(sfz)
+    sfz_lines = [line.decode('utf-8') if isinstance(line, bytes) else line for line in sfz]
+
+    renoise_instrument = RenoiseInstrument(template_filename=template_filename)
+    SfzToXrni(sfz_path='', encoding=encoding, sample_resolver=sample_resolver,
+              **converter_options).convert_lines(sfz_lines, sfz_name, renoise_instrument)
+
+    return _output(renoise_instrument, output)
+
+
+def reencode_xrni(xrni, encoding, output=None):
+    """reencode samples of renoise instrument :arg xrni, given as bytes or a binary file object, into :arg encoding
+    like xrnireencode
+    :return XRNI content, or None when written into the :arg output writable file object"""
+    from .instrument import RenoiseInstrument
+
+    renoise_instrument = RenoiseInstrument(_readable(xrni))
+    renoise_instrument.sample_data = [encode_audio_file(sample, encoding) for sample in renoise_instrument.sample_data]
+
+    return _output(renoise_instrument, output)
@@ -0,0 +1,278 @@
+# corpus. generate synthetic SoundFont 2, SFZ and XRNI files
+# Copyright (C) 2016  Olivier Jolly
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""deterministic synthetic inputs of configurable size, to exercise converters without real sound libraries.
+Audio is made of noisy sines and white noise, generated from a seed so that identical arguments always produce
+identical files."""
+
+from __future__ import print_function
+
+import argparse
+import io
+import math
+import os
+import random
+import struct
+import sys
+import wave
+from copy import deepcopy
+
+from rnsutils.instrument import RenoiseInstrument
+
+SAMPLE_RATE = 44100
+
+WAVEFORM_SINE = "sine"
+WAVEFORM_NOISE = "noise"
+
+# audio is generated as a block of frames repeated as much as needed
+_BLOCK_FRAMES = 4096
+
+
+def synthetic_frames(frames, seed=0, waveform=WAVEFORM_SINE, channels=1, sample_width=2):
+    """:return little endian interleaved pcm frames, :arg frames frames long, of a noisy sine or a white noise"""
+    rng = random.Random(seed)
+    amplitude = (1 << (8 * sample_width - 1)) - 1
+    period = 32. + seed % 97
+
+    values = []
+    for frame in range(_BLOCK_FRAMES):
+        for channel in range(channels):
+            if waveform == WAVEFORM_NOISE:
+                value = rng.uniform(-0.5, 0.5)
+            else:
+                value = 0.4 * math.sin(2 * math.pi * (frame / period + channel / 4.)) + rng.uniform(-0.005, 0.005)
+            values.append(int(value * amplitude))
+
+    if sample_width == 1:
+        block = bytes(bytearray(value + 128 for value in values))
+    elif sample_width == 2:
+        block = struct.pack('<{}h'.format(len(values)), *values)
+    else:
+        block = b''.join(struct.pack('<i', value)[:sample_width] for value in values)
+
+    frame_size = channels * sample_width
+    return (block * (frames // _BLOCK_FRAMES + 1))[:frames * frame_size]
+
+
+def synthetic_wav(frames, seed=0, waveform=WAVEFORM_SINE, channels=1, sample_width=2, sample_rate=SAMPLE_RATE):
+    """:return wav file content, :arg frames frames long, see :func synthetic_frames"""
+    content = io.BytesIO()
+    wav = wave.open(content, 'wb')
+    wav.setnchannels(channels)
+    wav.setsampwidth(sample_width)
+    wav.setframerate(sample_rate)
+    wav.writeframes(synthetic_frames(frames, seed, waveform, channels, sample_width))
+    wav.close()
+    return content.getvalue()
+
+
+def _waveform(idx):
+    return WAVEFORM_NOISE if idx % 4 == 3 else WAVEFORM_SINE
+
+
+def synthetic_instrument(samples, frames=4410, modulation_sets=None, seed=0, template_filename="empty-31.xrni"):
+    """:return renoise instrument with :arg samples samples of :arg frames frames, spread over keys and two velocity
+    layers, each using its own modulation set but cycling among :arg modulation_sets distinct settings
+    [default: all distinct]"""
+    modulation_sets = modulation_sets or samples
+    instrument = RenoiseInstrument(template_filename=template_filename)
+
+    for sample_idx in range(samples):
+        sample = deepcopy(instrument.sample_template)
+        sample.Name = 'synthetic {}'.format(sample_idx)
+        sample.ModulationSetIndex = sample_idx
+        sample.Mapping.NoteStart = sample.Mapping.NoteEnd = 12 + sample_idx % 96
+        sample.Mapping.VelocityStart = sample_idx % 2 * 64
+        sample.Mapping.VelocityEnd = sample_idx % 2 * 64 + 63
+        instrument.root.SampleGenerator.Samples.append(sample)
+
+        modulation_set = deepcopy(instrument.modulation_set_template)
+        modulation_set.ahdsr_release = sample_idx % modulation_sets / float(modulation_sets)
+        instrument.root.SampleGenerator.ModulationSets.append(modulation_set)
+
+        instrument.sample_data.append(synthetic_wav(frames, seed + sample_idx, _waveform(sample_idx)))
+
+    return instrument
+
+
+def write_xrni(filename, samples, frames=4410, modulation_sets=None, seed=0):
+    """write a renoise instrument, see :func synthetic_instrument"""
+    synthetic_instrument(samples, frames, modulation_sets, seed).save(filename, overwrite=True, cleanup=False)
+
+
+def _chunk(chunk_id, data):
+    return chunk_id + struct.pack('<I', len(data)) + data + (b'\0' if len(data) % 2 else b'')
+
+
+def _list(list_type, chunks):
+    return _chunk(b'LIST', list_type + b''.join(chunks))
+
+
+def _name(name):
+    return name.encode('latin1')[:19].ljust(20, b'\0')
+
+
+def write_sf2(filename, bags, instruments=1, samples=None, frames=4410, seed=0):
+    """write a SoundFont 2 file with :arg instruments instruments (and as many presets), each made of a global zone
+    followed by :arg bags zones. Zones use :arg samples 16 bits mono samples of :arg frames frames, shared among
+    zones and instruments when there are less samples than zones [default: one sample per zone]"""
+    samples = samples or bags * instruments
+
+    smpl = b''
+    shdr = b''
+    for sample_idx in range(samples):
+        start = len(smpl) // 2
+        # samples are followed by 46 zero frames per specification
+        smpl += synthetic_frames(frames, seed + sample_idx, _waveform(sample_idx)) + b'\0' * 92
+        shdr += struct.pack('<20sIIIIIBbHH', _name('sample {}'.format(sample_idx)), start, start + frames,
+                            start + 8, start + frames - 8, SAMPLE_RATE, 60 + sample_idx % 12, 0, 0, 1)
+    shdr += struct.pack('<20sIIIIIBbHH', _name('EOS'), 0, 0, 0, 0, 0, 0, 0, 0, 0)
+
+    inst = b''
+    ibag = b''
+    igen = b''
+    for instrument_idx in range(instruments):
+        inst += struct.pack('<20sH', _name('instrument {}'.format(instrument_idx)), len(ibag) // 4)
+
+        # global zone: release and reverb
+        ibag += struct.pack('<HH', len(igen) // 4, 0)
+        igen += struct.pack('<HHHH', 38, 0, 16, 100 + instrument_idx % 10 * 10)
+
+        for bag_idx in range(bags):
+            key = 12 + bag_idx % 96
+            velocity = bag_idx // 96 % 2 * 64
+            ibag += struct.pack('<HH', len(igen) // 4, 0)
+            igen += struct.pack('<HH', 43, key | key << 8)
+            igen += struct.pack('<HH', 44, velocity | (velocity + 63) << 8)
+            igen += struct.pack('<HH', 54, bag_idx % 2)
+            igen += struct.pack('<HH', 53, (instrument_idx * bags + bag_idx) % samples)
+
+    inst += struct.pack('<20sH', _name('EOI'), len(ibag) // 4)
+    ibag += struct.pack('<HH', len(igen) // 4, 0)
+    igen += struct.pack('<HH', 0, 0)
+
+    phdr = b''.join(struct.pack('<20sHHHIII', _name('preset {}'.format(instrument_idx)), instrument_idx % 128,
+                                instrument_idx // 128, instrument_idx, 0, 0, 0)
+                    for instrument_idx in range(instruments))
+    phdr += struct.pack('<20sHHHIII', _name('EOP'), 0, 0, instruments, 0, 0, 0)
+    pbag = b''.join(struct.pack('<HH', instrument_idx, 0) for instrument_idx in range(instruments + 1))
+    pgen = b''.join(struct.pack('<HH', 41, instrument_idx) for instrument_idx in range(instruments))
+    pgen += struct.pack('<HH', 0, 0)
+    mod = b'\0' * 10
+
+    info = _list(b'INFO', [_chunk(b'ifil', struct.pack('<HH', 2, 1)), _chunk(b'isng', b'EMU8000\0'),
+                           _chunk(b'INAM', b'synthetic\0'), _chunk(b'ISFT', b'rnsutils corpus\0')])
+    sdta = _list(b'sdta', [_chunk(b'smpl', smpl)])
+    pdta = _list(b'pdta', [_chunk(b'phdr', phdr), _chunk(b'pbag', pbag), _chunk(b'pmod', mod),
+                           _chunk(b'pgen', pgen), _chunk(b'inst', inst), _chunk(b'ibag', ibag),
+                           _chunk(b'imod', mod), _chunk(b'igen', igen), _chunk(b'shdr', shdr)])
+
+    with open(filename, 'wb') as sf2_file:
+        sf2_file.write(_chunk(b'RIFF', b'sfbk' + info + sdta + pdta))
+
+
+def sfz_sample_filename(sample_idx):
+    """:return filename on disk of the :arg sample_idx th sample of a synthetic SFZ, in mixed case"""
+    return 'Synth Sample {:03}.Wav'.format(sample_idx)
+
+
+def sfz_lines(regions, samples=None, default_path='Samples'):
+    """:return SFZ content lines with :arg regions regions using :arg samples samples [default: one per region],
+    stored in the :arg default_path directory. Sample paths are written in lower case with backslashes, as SFZ
+    built on case insensitive filesystems usually are"""
+    samples = samples or regions
+
+    lines = []
+    if default_path:
+        lines += ['<control>', 'default_path={}\\'.format(default_path.lower().replace('/', '\\'))]
+    lines += ['<group>', 'ampeg_release=0.5', 'ampeg_sustain=80']
+
+    for region_idx in range(regions):
+        lines += ['<region>', 'sample={}'.format(sfz_sample_filename(region_idx % samples).lower()),
+                  'key={}'.format(12 + region_idx % 96), 'lovel={}'.format(region_idx // 96 % 2 * 64),
+                  'hivel={}'.format(region_idx // 96 % 2 * 64 + 63)]
+        if region_idx % 3 == 0:
+            lines += ['ampeg_attack=0.01', 'loop_mode=loop_continuous', 'loop_start=8', 'loop_end=4000']
+
+    return [line + '\n' for line in lines]
+
+
+def write_sfz(directory, regions, samples=None, frames=4410, default_path='Samples', seed=0,
+              sfz_name='synthetic.sfz'):
+    """write into :arg directory a SFZ file and its samples, see :func sfz_lines
+    :return SFZ filename"""
+    samples = samples or regions
+    sample_dir = os.path.join(directory, default_path)
+    if not os.path.isdir(sample_dir):
+        os.makedirs(sample_dir)
+
+    for sample_idx in range(samples):
+        with open(os.path.join(sample_dir, sfz_sample_filename(sample_idx)), 'wb') as sample_file:
+            sample_file.write(synthetic_wav(frames, seed + sample_idx, _waveform(sample_idx)))
+
+    sfz_filename = os.path.join(directory, sfz_name)
+    with open(sfz_filename, 'w') as sfz_file:
+        sfz_file.writelines(sfz_lines(regions, samples, default_path))
+
+    return sfz_filename
+
+
+def main(argv=None):
+    program_name = os.path.basename(sys.argv[0])
+    program_longdesc = '''Generate synthetic SoundFont 2, SFZ and XRNI files'''
+    program_license = "GPL v3+ 2016-2017 Olivier Jolly"
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    try:
+        parser = argparse.ArgumentParser(epilog=program_longdesc,
+                                         description=program_license)
+        parser.add_argument("-b", "--bags", dest="bags", type=int, default=16,
+                            help="zones per SoundFont 2 instrument [default: %(default)s]")
+        parser.add_argument("-f", "--frames", dest="frames", type=int, default=44100,
+                            help="frames per sample [default: %(default)s]")
+        parser.add_argument("-i", "--instruments", dest="instruments", type=int, default=4,
+                            help="instruments in the SoundFont 2 file [default: %(default)s]")
+        parser.add_argument("-r", "--regions", dest="regions", type=int, default=64,
+                            help="regions in the SFZ file [default: %(default)s]")
+        parser.add_argument("-s", "--samples", dest="samples", type=int, default=32,
+                            help="samples in the XRNI file [default: %(default)s]")
+        parser.add_argument("--seed", dest="seed", type=int, default=0, help="random seed [default: %(default)s]")
+        parser.add_argument("-o", "--ouput-dir", dest="output_dir", required=True, help="output directory")
+
+        opts = parser.parse_args(argv)
+
+    except Exception as e:
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help")
+        return 2
+
+    if not os.path.isdir(opts.output_dir):
+        os.makedirs(opts.output_dir)
+
+    write_sf2(os.path.join(opts.output_dir, 'synthetic.sf2'), opts.bags, opts.instruments, frames=opts.frames,
+              seed=opts.seed)
+    write_sfz(os.path.join(opts.output_dir, 'sfz'), opts.regions, opts.regions // 2 or None, frames=opts.frames,
+              seed=opts.seed)
+    write_xrni(os.path.join(opts.output_dir, 'synthetic.xrni'), opts.samples, opts.frames, seed=opts.seed)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""sample encoder backends and their registry.
+
+Each encoding may be provided by several backends: in process libraries (soundfile, binding libsndfile, see
+``pip install rnsutils[soundfile]``) or external encoders run once per sample on temporary files (flac and oggenc,
+see :data rnsutils.utils.ENCODER_COMMANDS). Backends find out whether they can be used once, the first time they are
+asked, and in process ones are preferred as they save a process start and two temporary files per sample. Asking for
+an encoding no backend provides fails right away, naming the backends tried."""
+
+import logging
+import os
+from functools import lru_cache
+
+from .utils import ENCODER_COMMANDS, ENCODING_FLAC, ENCODING_OGG
+
+# backends of every encoding, by order of registration
+_BACKENDS = {}
+
+# lossless FLAC subtype of each WAV subtype
+_FLAC_SUBTYPES = {'PCM_U8': 'PCM_S8', 'PCM_S8': 'PCM_S8', 'PCM_16': 'PCM_16', 'PCM_24': 'PCM_24'}
+
+
+@lru_cache(maxsize=None)
+def _which(command):
+    import shutil
+    return shutil.which(command)
+
+
+@lru_cache(maxsize=None)
+def _soundfile_formats():
+    """:return {format: [subtypes]} libsndfile can write, empty if soundfile can't be loaded"""
+    try:
+        import soundfile
+    except (ImportError, OSError):
+        logging.debug("soundfile not available", exc_info=True)
+        return {}
+
+    return {audio_format: list(soundfile.available_subtypes(audio_format))
+            for audio_format in soundfile.available_formats()}
+
+
+class ExternalEncoder(object):
+    """backend running the command line of :arg encoding in ENCODER_COMMANDS on temporary files"""
+
+    in_process = False
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+
+    @property
+    def name(self):
+        return ENCODER_COMMANDS[self.encoding]('', '')[0]
+
+    def available(self):
+        return _which(self.name) is not None
+
+    def failure(self, returncode, output):
+        """:return RuntimeError reporting the encoder exited with status :arg returncode, printing :arg output bytes"""
+        return RuntimeError("{} failed with status {}: {}".format(self.name, returncode,
+                                                                 output.decode(errors='replace')))
+
+    def encode(self, sample_content):
+        """:return :arg sample_content, WAV content, encoded
+        :raise RuntimeError when the encoder fails"""
+        import subprocess
+        import tempfile
+
+        in_filename = tempfile.NamedTemporaryFile(suffix='.wav', delete=False).name
+        out_filename = tempfile.NamedTemporaryFile(suffix='.{}'.format(self.encoding), delete=False).name
+        try:
+            with open(in_filename, "wb") as infile:
+                infile.write(sample_content)
+
+            process = subprocess.run(ENCODER_COMMANDS[self.encoding](in_filename, out_filename),
+                                     stderr=subprocess.STDOUT, stdout=subprocess.PIPE)
+            if process.returncode:
+                raise self.failure(process.returncode, process.stdout)
+
+            with open(out_filename, "rb") as outfile:
+                return outfile.read()
+        finally:
+            os.remove(in_filename)
+            os.remove(out_filename)
+
+
+class SoundFileEncoder(object):
+    """in process backend writing :arg encoding with libsndfile, through the soundfile module, as :arg audio_format
+    :arg subtype [default: lossless subtype matching the sample]"""
+
+    in_process = True
+    name = 'soundfile'
+
+    def __init__(self, encoding, audio_format, subtype=None):
+        self.encoding = encoding
+        self.audio_format = audio_format
+        self.subtype = subtype
+
+    def available(self):
+        subtypes = _soundfile_formats().get(self.audio_format)
+        return subtypes is not None and (self.subtype is None or self.subtype in subtypes)
+
+    def encode(self, sample_content):
+        """:return :arg sample_content, WAV content, encoded
+        :raise ValueError when the sample can't be encoded losslessly"""
+        import io
+
+        import soundfile
+
+        with soundfile.SoundFile(io.BytesIO(sample_content)) as wav:
+            subtype = self.subtype or _FLAC_SUBTYPES.get(wav.subtype)
+            if subtype is None:
+                raise ValueError("can't encode {} samples into {}".format(wav.subtype, self.encoding))
+
+            # integers are read at full scale, keeping integer samples untouched
+            frames = wav.read(dtype='float32' if self.subtype else 'int32', always_2d=True)
+            output = io.BytesIO()
+            soundfile.write(output, frames, wav.samplerate, format=self.audio_format, subtype=subtype)
+            return output.getvalue()
+
+
+def register(backend):
+    """add :arg backend, providing backend.encoding, after already registered ones"""
+    _BACKENDS.setdefault(backend.encoding, []).append(backend)
+
+
+def backends(encoding):
+    """:return available backends of :arg encoding, in process ones first"""
+    return sorted((backend for backend in _BACKENDS.get(encoding, []) if backend.available()),
+                  key=lambda backend: not backend.in_process)
+
+
+def backend(encoding):
+    """:return preferred backend of :arg encoding
+    :raise LookupError when none is available"""
+    available_backends = backends(encoding)
+    if not available_backends:
+        raise LookupError("no encoder available for {} (tried {})".format(
+            encoding, ", ".join(candidate.name for candidate in _BACKENDS.get(encoding, [])) or "none"))
+    return available_backends[0]
+
+
+def check(encodings):
+    """:return error message about :arg encodings without any available backend, None if all can be encoded"""
+    errors = []
+    for encoding in encodings:
+        if encoding in _BACKENDS:
+            try:
+                backend(encoding)
+            except LookupError as e:
+                errors.append(str(e))
+    return "; ".join(errors) or None
+
+
+def probe():
+    """:return {encoding: [names of available backends, preferred first]} of all registered encodings"""
+    return {encoding: [candidate.name for candidate in backends(encoding)] for encoding in sorted(_BACKENDS)}
+
+
+register(SoundFileEncoder(ENCODING_FLAC, 'FLAC'))
+register(SoundFileEncoder(ENCODING_OGG, 'OGG', 'VORBIS'))
+register(ExternalEncoder(ENCODING_FLAC))
+register(ExternalEncoder(ENCODING_OGG))
@@ -0,0 +1,65 @@
+"""conversion fingerprints, recording what an instrument was generated from so that up to date outputs can be
+skipped when converting again"""
+
+import os
+
+from . import __version__
+
+FINGERPRINT_PREFIX = 'rnsutils-fingerprint:'
+
+
+def file_signature(filename):
+    """:return (size, modification time) signature of :arg filename, None if it doesn't exist"""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+
+    return stat.st_size, stat.st_mtime_ns
+
+
+def conversion_fingerprint(sources, template_filename, options):
+    """:arg sources filenames of all files the conversion reads
+    :arg template_filename template used for the conversion, either a file or a packaged template
+    :arg options converter options influencing the output
+    :return digest changing whenever sources, template, options or rnsutils version change"""
+    import hashlib
+    import json
+
+    description = {
+        'version': __version__,
+        'sources': [(os.path.normpath(source), file_signature(source)) for source in sources],
+        'template': file_signature(template_filename) if os.path.isfile(template_filename) else template_filename,
+        'options': options,
+    }
+
+    return hashlib.sha1(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def encode_fingerprint(fingerprint):
+    """:return zip archive comment recording :arg fingerprint"""
+    return (FINGERPRINT_PREFIX + fingerprint).encode('ascii')
+
+
+def decode_fingerprint(comment):
+    """:return fingerprint recorded in zip archive :arg comment, None if there is none"""
+    if not comment.startswith(FINGERPRINT_PREFIX.encode('ascii')):
+        return None
+
+    return comment[len(FINGERPRINT_PREFIX):].decode('ascii')
+
+
+def read_fingerprint(xrni_filename):
+    """:return fingerprint recorded in :arg xrni_filename, None if missing, unreadable or not fingerprinted"""
+    from zipfile import ZipFile, BadZipfile
+
+    try:
+        with ZipFile(xrni_filename) as z:
+            return decode_fingerprint(z.comment)
+    except (IOError, BadZipfile):
+        return None
+
+
+def is_up_to_date(xrni_filename, fingerprint):
+    """:return whether :arg xrni_filename was generated with the conversion described by :arg fingerprint"""
+    return read_fingerprint(xrni_filename) == fingerprint
@@ -1,15 +1,17 @@
 import logging
 import math
-import pkgutil
-import pprint
-from zipfile import ZipFile, ZIP_DEFLATED
+from copy import deepcopy
+from zipfile import ZipFile
 
 import io
 import os
 from lxml import etree, objectify
 from lxml.objectify import ObjectifiedElement
 
+from . import cache, stats
+from .fingerprint import encode_fingerprint, decode_fingerprint
 from .utils import guesstimate_audio_extension
+from .ziputils import REPRODUCIBLE_COMPRESSION_LEVEL, ZipWriter, read_entries, reproducible_date_time
 
 
 def second_to_renoise_time(duration):
@@ -38,11 +40,68 @@ def _elements_equal(e1, e2):
     return all(_elements_equal(c1, c2) for c1, c2 in zip(e1.iterchildren(), e2.iterchildren()))
 
 
-class RenoiseSample(ObjectifiedElement):
+def canonical_xml(root, pretty_print=True):
+    """:return :arg root serialized canonically, as UTF-8 with attributes sorted by name and whitespace between
+    elements dropped, so that equal trees serialize to the same bytes however they were built"""
+    root = deepcopy(root)
+    for element in root.iter():
+        # len() of objectified elements counts their siblings, not their children
+        if next(element.iterchildren(), None) is not None and element.text is not None and \
+                not element.text.strip():
+            element.text = None
+        if element.tail is not None and not element.tail.strip():
+            element.tail = None
+        if len(element.attrib) > 1:
+            attributes = sorted(element.attrib.items())
+            element.attrib.clear()
+            element.attrib.update(attributes)
+    return etree.tostring(root, encoding='UTF-8', xml_declaration=True, pretty_print=pretty_print)
+
+
+# builds elements without type annotations, see :class RenoiseElement
+_ELEMENT_MAKER = objectify.ElementMaker(annotate=False)
+
+
+# attributes of elements themselves rather than children
+_ELEMENT_PROPERTIES = frozenset(('base', 'pyval', 'tag', 'tail', 'text'))
+
+
+def _to_text(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+class RenoiseElement(ObjectifiedElement):
+    """objectify tree element setting the value of its children without objectify type annotations (py:pytype and
+    xsi:nil attributes), so that trees can be serialized as they are. Properties of subclasses are honoured"""
+
+    def __setattr__(self, name, value):
+        descriptor = getattr(type(self), name, None)
+        if isinstance(descriptor, property):
+            descriptor.fset(self, value)
+            return
+
+        if name in _ELEMENT_PROPERTIES or value is not None and not isinstance(value, (bool, int, float, str)):
+            super(RenoiseElement, self).__setattr__(name, value)
+            return
+
+        child = self.find(name)
+        # len() of objectified elements counts their siblings, not their children
+        if child is not None and next(child.iterchildren(), None) is None and hasattr(child, '_setText') and \
+                not child.attrib:
+            # the element class is guessed from the new text next time the child is looked up
+            child._setText(None if value is None else _to_text(value))
+        else:
+            super(RenoiseElement, self).__setattr__(name, value)
+            objectify.deannotate(self.find(name), xsi_nil=True, cleanup_namespaces=True)
+
+
+class RenoiseSample(RenoiseElement):
     pass
 
 
-class RenoiseModulationSet(ObjectifiedElement):
+class RenoiseModulationSet(RenoiseElement):
     @property
     def ahdsr_attack(self):
         return self.Devices.SampleAhdsrModulationDevice.Attack.Value
@@ -92,6 +151,26 @@ class RenoiseModulationSet(ObjectifiedElement):
         self.Devices.SampleMixerModulationDevice.Cutoff.Value = value
 
 
+class StreamedSampleData(object):
+    """append only stand-in for RenoiseInstrument.sample_data writing every appended sample straight into the
+    instrument archive being streamed, so that only one sample at a time is held in memory"""
+
+    def __init__(self, instrument, destination):
+        """:arg destination temporary filename or writable file object the archive is streamed to"""
+        self.instrument = instrument
+        self.temp_filename = None if hasattr(destination, 'write') else destination
+        self.zip_writer = instrument.zip_writer(destination)
+        self.count = 0
+
+    def append(self, sample):
+        with stats.timer('zip.write'):
+            self.zip_writer.writestr(self.instrument.sample_entry_name(self.count, sample), sample)
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+
 class RenoiseInstrument(object):
     OVERLAP_CYCLE = "Cycle"
     OVERLAP_ALL = "Play All"
@@ -104,22 +183,37 @@ class RenoiseInstrument(object):
     FILTER_CLEAN_HP = 5
     FILTER_CLEAN_LP = 1
 
-    def __init__(self, filename=None, template_filename="empty-31.xrni"):
+    def __init__(self, filename=None, template_filename="empty-31.xrni", threads=None):
         self.root = None
         self.sample_data = None
         self.sample_template = None
         self.sample_modulation_set = None
+        self.fingerprint = None
+        # save Instrument.xml without indentation
+        self.compact = False
+        # save byte reproducible archives, see :meth zip_writer
+        self.deterministic = False
 
         if filename is not None:
-            self.load(filename)
+            self.load(filename, threads=threads)
         else:
-            try:
-                self.load(template_filename)
-            except IOError:
-                self.load(io.BytesIO(pkgutil.get_data('rnsutils', 'data/{}'.format(template_filename))))
+            self.root, self.sample_template, self.modulation_set_template = cache.file_cached(
+                'template', template_filename, self._read_template, copy=deepcopy)
+            self.sample_data = []
+            self.fingerprint = None
+
+    def _read_template(self, template_filename):
+        """load :arg template_filename, a file or the name of a packaged template
+        :return its (root, sample template, modulation set template)"""
+        try:
+            self.load(template_filename)
+        except IOError:
+            import pkgutil
+            self.load(io.BytesIO(pkgutil.get_data('rnsutils', 'data/{}'.format(template_filename))))
 
-            self.extract_sample_template()
-            self.extract_modulation_set_template()
+        self.extract_sample_template()
+        self.extract_modulation_set_template()
+        return self.root, self.sample_template, self.modulation_set_template
 
     def extract_sample_template(self):
 
@@ -142,34 +236,156 @@ class RenoiseInstrument(object):
         for original_modulation_set in modulation_set_node.ModulationSet:
             modulation_set_node.remove(original_modulation_set)
 
-    def load(self, filename):
-        from .lookup import renoise_parser
+    @stats.timed('instrument.load')
+    def load(self, filename, threads=None):
+        """load instrument from :arg filename, or a readable file object, inflating samples on :arg threads threads
+        [default: all cores]"""
+        from .lookup import get_renoise_parser
         with ZipFile(filename) as z:
-            self.root = etree.fromstring(z.read("Instrument.xml"), renoise_parser)
-            self.sample_data = [z.read(sample_filename) for sample_filename in sorted(z.namelist()) if
-                                sample_filename.startswith('SampleData')]
+            with stats.timer('xml.parse'):
+                self.root = etree.fromstring(z.read("Instrument.xml"), get_renoise_parser())
+            self.fingerprint = decode_fingerprint(z.comment)
+            with stats.timer('zip.read'):
+                self.sample_data = read_entries(z, [sample_filename for sample_filename in sorted(z.namelist()) if
+                                                    sample_filename.startswith('SampleData')], threads=threads)
+
+    def sample_entry_name(self, sample_idx, sample):
+        """:return zip entry name of :arg sample content, being the :arg sample_idx th sample"""
+        return 'SampleData/Sample{0:02} {1}.{2}'.format(sample_idx, self.root.SampleGenerator.Samples.
+                                                        Sample[sample_idx].Name.text,
+                                                        guesstimate_audio_extension(sample) or "wav")
+
+    def stream(self, filename, overwrite=False):
+        """start streaming instrument into :arg filename, or a writable file object: samples appended to
+        sample_data from now on are written to the archive right away instead of being kept in memory.
+        Instrument.xml is written last by :meth save, otherwise :meth discard_stream aborts the operation.
+        :return whether streaming started, False when destination exists and :arg overwrite was not forced"""
+
+        if hasattr(filename, 'write'):
+            destination = filename
+        elif os.path.isfile(filename) and not overwrite:
+            logging.error("Destination file %s exists and overwrite was not forced", filename)
+            return False
+        else:
+            destination = filename + '.part'
+
+        pending_samples = self.sample_data or []
+        self.sample_data = StreamedSampleData(self, destination)
+        for sample in pending_samples:
+            self.sample_data.append(sample)
+
+        return True
 
-    def save(self, filename, overwrite=False, cleanup=True):
+    @property
+    def streaming(self):
+        return isinstance(self.sample_data, StreamedSampleData)
+
+    def discard_stream(self):
+        """abort instrument streaming, removing the partially written archive if streamed to a file"""
+        self.sample_data.zip_writer.close()
+        if self.sample_data.temp_filename:
+            os.remove(self.sample_data.temp_filename)
+        self.sample_data = []
+
+    @stats.timed('save')
+    def save(self, filename, overwrite=False, cleanup=True, threads=None, if_changed=False):
+        """save instrument into :arg filename, or a writable file object, deflating samples on :arg threads
+        threads [default: all cores]. The conversion fingerprint, if any, is recorded as the archive comment.
+        With :arg if_changed, an existing :arg filename already holding the same instrument (see
+        :func rnsutils.compare.same_content) is left untouched
+        :return whether the instrument was written"""
 
         if cleanup:
             self.cleanup()
 
-        if os.path.isfile(filename) and not overwrite:
-            logging.error("Destination file %s exists and overwrite was not forced", filename)
-            return
+        if self.streaming:
+            return self._save_stream(filename, if_changed)
+
+        if hasattr(filename, 'write'):
+            self._write_archive(filename, threads)
+            return True
+
+        if os.path.isfile(filename):
+            if not overwrite:
+                logging.error("Destination file %s exists and overwrite was not forced", filename)
+                return False
+            if if_changed and self._unchanged(filename):
+                return False
 
         temp_filename = filename + '.part'
+        self._write_archive(temp_filename, threads)
+        os.rename(temp_filename, filename)
+        return True
 
-        with ZipFile(temp_filename, 'w', compression=ZIP_DEFLATED) as z:
-            objectify.deannotate(self.root, cleanup_namespaces=True, xsi_nil=True)
-            z.writestr("Instrument.xml", etree.tostring(self.root, pretty_print=True))
-            for sample_idx, sample in enumerate(self.sample_data):
-                z.writestr('SampleData/Sample{0:02} {1}.{2}'.format(sample_idx, self.root.SampleGenerator.Samples.
-                                                                    Sample[sample_idx].Name,
-                                                                    guesstimate_audio_extension(sample) or "wav"),
-                           sample)
+    def _unchanged(self, filename):
+        from .compare import same_content
+        with stats.timer('compare'):
+            unchanged = same_content(self, filename)
+        if unchanged:
+            logging.debug("%s is unchanged, left untouched", filename)
+        return unchanged
+
+    def to_bytes(self, cleanup=True, threads=None):
+        """:return instrument archive content, as saved by :meth save"""
+        output = io.BytesIO()
+        self.save(output, cleanup=cleanup, threads=threads)
+        return output.getvalue()
+
+    def zip_writer(self, destination, threads=None):
+        """:return ZipWriter of the instrument archive into :arg destination. Deterministic instruments use a fixed
+        timestamp (see :func rnsutils.ziputils.reproducible_date_time) and compression level, and write Instrument.xml
+        canonically after the samples, as streamed instruments do, so that equal instruments are saved into the same
+        bytes whether streamed or not"""
+        if self.deterministic:
+            return ZipWriter(destination, compresslevel=REPRODUCIBLE_COMPRESSION_LEVEL,
+                             date_time=reproducible_date_time(), threads=threads)
+        return ZipWriter(destination, threads=threads)
+
+    def _write_archive(self, destination, threads):
+        with self.zip_writer(destination, threads) as z:
+            if not self.deterministic:
+                self._write_xml(z)
+            with stats.timer('zip.write'):
+                z.write_entries((self.sample_entry_name(sample_idx, sample), sample) for sample_idx, sample in
+                                enumerate(self.sample_data))
+            if self.deterministic:
+                self._write_xml(z)
+            self._write_fingerprint(z)
+
+    def _save_stream(self, filename, if_changed):
+        # samples are already in the archive, only the xml remains to be written
+        with self.sample_data.zip_writer as z:
+            self._write_xml(z)
+            self._write_fingerprint(z)
+
+        temp_filename = self.sample_data.temp_filename
+        self.sample_data = []
+        if not temp_filename:
+            return True
+
+        if if_changed and os.path.isfile(filename):
+            from .compare import same_files
+            with stats.timer('compare'):
+                unchanged = same_files(temp_filename, filename)
+            if unchanged:
+                logging.debug("%s is unchanged, left untouched", filename)
+                os.remove(temp_filename)
+                return False
 
         os.rename(temp_filename, filename)
+        return True
+
+    def _write_xml(self, zip_writer):
+        # trees hold no type annotation (see RenoiseElement), they are serialized as they are straight into the archive
+        with stats.timer('xml.serialize'), zip_writer.open("Instrument.xml") as xml_entry:
+            if self.deterministic:
+                xml_entry.write(canonical_xml(self.root, pretty_print=not self.compact))
+            else:
+                etree.ElementTree(self.root).write(xml_entry, pretty_print=not self.compact)
+
+    def _write_fingerprint(self, zip_writer):
+        if self.fingerprint is not None:
+            zip_writer.comment = encode_fingerprint(self.fingerprint)
 
     @property
     def samples(self):
@@ -186,14 +402,14 @@ class RenoiseInstrument(object):
     @property
     def comment(self):
         try:
-            return "\n".join([comment.pyval for comment in self.root.GlobalProperties.Comments.Comment])
+            return "\n".join([comment.text or "" for comment in self.root.GlobalProperties.Comments.Comment])
         except AttributeError:
             return None
 
     @comment.setter
     def comment(self, value):
         # noinspection PyPep8Naming
-        E = objectify.E
+        E = _ELEMENT_MAKER
 
         if 'Comments' not in self.root.GlobalProperties.getchildren():
             self.root.GlobalProperties.Comments = E.Comments()
@@ -214,7 +430,7 @@ class RenoiseInstrument(object):
     @tags.setter
     def tags(self, value):
         # noinspection PyPep8Naming
-        E = objectify.E
+        E = _ELEMENT_MAKER
 
         if 'Tags' not in self.root.GlobalProperties.getchildren():
             self.root.GlobalProperties.Tags = E.Tags()
@@ -230,7 +446,7 @@ class RenoiseInstrument(object):
         if tags is None:
             self.tags = [tag]
         else:
-            self.root.GlobalProperties.Tags.append(objectify.E.Tag(tag))
+            self.root.GlobalProperties.Tags.append(_ELEMENT_MAKER.Tag(tag))
 
     def remove_tag(self, tag_to_remove):
         for tag_idx in range(len(self.root.GlobalProperties.Tags.getchildren())):
@@ -239,6 +455,7 @@ class RenoiseInstrument(object):
                 del self.root.GlobalProperties.Tags.Tag[tag_idx]
                 return
 
+    @stats.timed('cleanup')
     def cleanup(self):
         # ensure that key mapping remains in the limits of what renoise supports
         for sample in self.root.SampleGenerator.Samples.Sample:
@@ -273,6 +490,8 @@ class RenoiseInstrument(object):
 
 
 if __name__ == "__main__":
+    import pprint
+
     instrument = RenoiseInstrument('basic.xrni')
     pprint.pprint(instrument)
     pprint.pprint(instrument.samples)
@@ -0,0 +1,174 @@
+"""run journal of batch conversions, letting an interrupted run resume where it stopped.
+
+Every unit of work completed (an output converted from a source, an instrument index for SoundFont 2 files, with given
+options, as described by its conversion fingerprint, see :mod rnsutils.fingerprint) is appended to the journal along
+with the hash of its output, as soon as the output is saved. When resuming (see :func session), units whose output is
+still there with the same hash are skipped and half written outputs (``.part`` files left by
+:meth rnsutils.instrument.RenoiseInstrument.save) are removed before converting again.
+
+The journal is a json lines file, so that it can be appended to safely and a line truncated by an interruption is
+simply ignored."""
+
+import io
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+_journal = None
+
+
+def file_hash(filename):
+    """:return sha1 hex digest of :arg filename content, None if it can't be read"""
+    import hashlib
+    from .ziputils import CHUNK_SIZE
+
+    digest = hashlib.sha1()
+    try:
+        with io.open(filename, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except (IOError, OSError):
+        return None
+    return digest.hexdigest()
+
+
+class Journal(object):
+    """journal stored in :arg filename, continuing the one found there when :arg resume is set, starting afresh
+    otherwise"""
+
+    def __init__(self, filename, resume=False):
+        self.filename = filename
+        self.resume = resume
+        # (fingerprint, output filename) -> entry
+        self.entries = {}
+        # watch mode converts on several threads
+        self._lock = threading.Lock()
+
+        truncated = resume and self._load()
+        self._file = io.open(filename, 'a' if resume else 'w', encoding='utf-8')
+        if truncated:
+            # entries must not be appended to the line an interruption cut
+            self._file.write(u'\n')
+
+    def _load(self):
+        """:return whether the journal ends with a truncated line"""
+        import json
+
+        try:
+            journal_file = io.open(self.filename, encoding='utf-8')
+        except (IOError, OSError):
+            return False
+
+        line = u'\n'
+        with journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                    self.entries[entry['fingerprint'], entry['output']] = entry
+                except (ValueError, KeyError, TypeError):
+                    logging.debug("Ignoring journal line %r", line)
+        return not line.endswith(u'\n')
+
+    def completed(self, fingerprint, output_filename):
+        """:return whether the unit described by :arg fingerprint was recorded as completed and its
+        :arg output_filename is left untouched since"""
+        entry = self.entries.get((fingerprint, os.path.normpath(output_filename)))
+        if entry is None:
+            return False
+
+        try:
+            if os.path.getsize(output_filename) != entry['size']:
+                return False
+        except OSError:
+            return False
+
+        return file_hash(output_filename) == entry['sha1']
+
+    def record(self, source, instrument, fingerprint, output_filename):
+        """record the unit converting :arg instrument index [None for single instrument sources] of :arg source into
+        :arg output_filename as completed, unless the output wasn't written by the conversion described by
+        :arg fingerprint (eg existing output not overwritten)"""
+        import json
+        from .fingerprint import read_fingerprint
+
+        if read_fingerprint(output_filename) != fingerprint:
+            return
+
+        entry = {'source': os.path.normpath(source), 'instrument': instrument, 'fingerprint': fingerprint,
+                 'output': os.path.normpath(output_filename), 'size': os.path.getsize(output_filename),
+                 'sha1': file_hash(output_filename)}
+
+        with self._lock:
+            self.entries[entry['fingerprint'], entry['output']] = entry
+            self._file.write(json.dumps(entry, sort_keys=True) + u'\n')
+            # the entry must survive an interruption right after it
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def remove_partial(output_filename):
+    """remove what an interrupted save left of :arg output_filename, if anything"""
+    partial = output_filename + '.part'
+    if os.path.isfile(partial):
+        logging.info("Removing partially written %s", partial)
+        os.remove(partial)
+
+
+def completed(fingerprint, output_filename):
+    """:return whether a resumed session recorded the unit described by :arg fingerprint as completed into
+    :arg output_filename (see :meth Journal.completed), cleaning up what an interrupted save left of it otherwise"""
+    journal = _journal
+    if journal is None or not journal.resume:
+        return False
+
+    if journal.completed(fingerprint, output_filename):
+        return True
+
+    remove_partial(output_filename)
+    return False
+
+
+def record(source, instrument, fingerprint, output_filename):
+    """record the unit converting :arg source into :arg output_filename as completed in the session journal, if any
+    (see :meth Journal.record)"""
+    journal = _journal
+    if journal is not None:
+        journal.record(source, instrument, fingerprint, output_filename)
+
+
+def add_arguments(parser):
+    """add --journal and --resume options to argparse :arg parser"""
+    parser.add_argument("--journal", dest="journal", metavar="FILE",
+                        help="record conversions completed into FILE as they are done [default: none]")
+    parser.add_argument("--resume", dest="resume", action="store_true", default=False,
+                        help="resume the run recorded by --journal, skipping conversions it completed "
+                             "[default: %(default)s]")
+
+
+def check_arguments(parser, opts):
+    """report misuse of options added by :func add_arguments through argparse :arg parser"""
+    if opts.resume and not opts.journal:
+        parser.error("--resume needs the --journal of the interrupted run")
+
+
+@contextmanager
+def session(opts):
+    """journal conversions, as requested by :arg opts command line options (see :func add_arguments), during the
+    enclosed block
+    :return the journal, None if not journaling"""
+    global _journal
+
+    if not opts.journal:
+        yield None
+        return
+
+    journal = _journal = Journal(opts.journal, resume=opts.resume)
+    try:
+        yield journal
+    finally:
+        _journal = None
+        journal.close()
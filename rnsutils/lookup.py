@@ -2,14 +2,14 @@
 from lxml import etree
 from lxml.objectify import ObjectifyElementClassLookup
 
-from .instrument import RenoiseSample, RenoiseModulationSet
+from .instrument import RenoiseElement, RenoiseSample, RenoiseModulationSet
 
 
 class RenoiseClassLookup(etree.CustomElementClassLookup):
     """mapping class for xml element to python class"""
 
     def __init__(self):
-        super(RenoiseClassLookup, self).__init__(fallback=ObjectifyElementClassLookup())
+        super(RenoiseClassLookup, self).__init__(fallback=ObjectifyElementClassLookup(tree_class=RenoiseElement))
 
     def lookup(self, node_type, document, namespace, name):
         """mapping method for xml element to python class"""
@@ -21,5 +21,14 @@ class RenoiseClassLookup(etree.CustomElementClassLookup):
         return None
 
 
-renoise_parser = etree.XMLParser()
-renoise_parser.setElementClassLookup(RenoiseClassLookup())
+_renoise_parser = None
+
+
+def get_renoise_parser():
+    """:return xml parser mapping elements to renoise wrappers, built on first use. Indentation is dropped, it is
+    added back when saving unless compact"""
+    global _renoise_parser
+    if _renoise_parser is None:
+        _renoise_parser = etree.XMLParser(remove_blank_text=True)
+        _renoise_parser.setElementClassLookup(RenoiseClassLookup())
+    return _renoise_parser
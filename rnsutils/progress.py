@@ -0,0 +1,185 @@
+"""progress, throughput and ETA reporting of batch runs.
+
+Commands declare the work they find up front with ``add_total(files=..., instruments=..., samples=..., bytes=...)``,
+take back work they end up skipping with :func discard and account work done with :func advance, samples being
+accounted as they are encoded (see :func rnsutils.utils.encode_audio_file). Nothing is reported unless a session is
+active (see :func session): on a terminal, a status line with samples/s, MB/s of audio encoded and ETA is redrawn on
+standard error, otherwise json lines are written there periodically.
+
+Only the process which started the session accounts work: worker processes (see :mod rnsutils.sharedmem) inherit a
+copy of the session which ignores their calls, their work being accounted by the parent as results come back."""
+
+from __future__ import print_function
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+UNITS = ('files', 'instruments', 'samples', 'bytes')
+
+# seconds between reports on a terminal and elsewhere
+TTY_INTERVAL = .2
+DEFAULT_INTERVAL = 10.
+
+_reporter = None
+
+
+def _format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return '{}:{:02}:{:02}'.format(minutes // 60, minutes % 60, seconds)
+
+
+class ProgressReporter(object):
+    """accumulate work done against the total work, reporting it on :arg stream [default: standard error] at most
+    every :arg interval seconds [default: depending on :arg stream being a terminal]"""
+
+    def __init__(self, stream=None, interval=None):
+        self.stream = stream or sys.stderr
+        self.tty = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.interval = interval if interval is not None else TTY_INTERVAL if self.tty else DEFAULT_INTERVAL
+        self.pid = os.getpid()
+        self.total = dict.fromkeys(UNITS, 0)
+        self.done = dict.fromkeys(UNITS, 0)
+        self.start = self.last_report = time.monotonic()
+        # encoding threads account samples concurrently
+        self._lock = threading.Lock()
+
+    def add_total(self, **work):
+        with self._lock:
+            for unit, value in work.items():
+                self.total[unit] += value
+
+    def advance(self, now=None, **work):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for unit, value in work.items():
+                self.done[unit] += value
+            if now - self.last_report < self.interval:
+                return
+            self.last_report = now
+        self.report(now)
+
+    def snapshot(self, now=None):
+        """:return json serializable progress: elapsed seconds, done and total work per unit, samples_per_second,
+        mb_per_second and eta in seconds (None until it can be estimated)"""
+        now = time.monotonic() if now is None else now
+        elapsed = now - self.start
+
+        with self._lock:
+            snapshot = {'elapsed': round(elapsed, 3)}
+            for unit in UNITS:
+                snapshot[unit] = self.done[unit]
+                snapshot[unit + '_total'] = self.total[unit]
+
+        snapshot['samples_per_second'] = round(snapshot['samples'] / elapsed, 2) if elapsed else None
+        snapshot['mb_per_second'] = round(snapshot['bytes'] / 1e6 / elapsed, 3) if elapsed else None
+
+        # estimated on the most precise unit known
+        snapshot['eta'] = None
+        for unit in ('bytes', 'samples', 'instruments', 'files'):
+            if snapshot[unit + '_total']:
+                ratio = min(1., snapshot[unit] / float(snapshot[unit + '_total']))
+                if ratio:
+                    snapshot['eta'] = round(elapsed * (1 - ratio) / ratio, 1)
+                break
+
+        return snapshot
+
+    @staticmethod
+    def format(snapshot):
+        """:return human readable line of :arg snapshot (see :meth snapshot)"""
+        parts = ['{} {}/{}'.format(unit, snapshot[unit], snapshot[unit + '_total'])
+                 for unit in ('files', 'instruments', 'samples') if snapshot[unit + '_total'] > 1]
+        if snapshot['samples_per_second'] is not None:
+            parts.append('{:.1f} samples/s'.format(snapshot['samples_per_second']))
+            parts.append('{:.2f} MB/s'.format(snapshot['mb_per_second']))
+        parts.append('ETA {}'.format('?' if snapshot['eta'] is None else _format_duration(snapshot['eta'])))
+        return ', '.join(parts)
+
+    def report(self, now=None, final=False):
+        snapshot = self.snapshot(now)
+        if self.tty:
+            # redraw the status line, clearing what the previous one left
+            self.stream.write('\r' + self.format(snapshot) + '\x1b[K' + ('\n' if final else ''))
+        else:
+            import json
+            snapshot['event'] = 'done' if final else 'progress'
+            self.stream.write(json.dumps(snapshot, sort_keys=True) + '\n')
+        self.stream.flush()
+
+    def close(self):
+        self.report(final=True)
+
+
+def _active():
+    """:return reporter of the session, None outside one or in worker processes"""
+    reporter = _reporter
+    return reporter if reporter is not None and reporter.pid == os.getpid() else None
+
+
+def enabled():
+    """:return whether work is being reported, telling commands whether to look for the total work"""
+    return _active() is not None
+
+
+def add_total(**work):
+    """add :arg work (count per unit among UNITS) to the total work"""
+    reporter = _active()
+    if reporter is not None:
+        reporter.add_total(**work)
+
+
+def discard(**work):
+    """remove :arg work, found but not to be done (eg up to date outputs), from the total work"""
+    reporter = _active()
+    if reporter is not None:
+        reporter.add_total(**{unit: -value for unit, value in work.items()})
+
+
+def advance(**work):
+    """account :arg work as done"""
+    reporter = _active()
+    if reporter is not None:
+        reporter.advance(**work)
+
+
+def tracked(convert, work):
+    """:return :arg convert, called with a filename, adding the :arg work(filename) to the total work first, for files
+    found along the way (eg in watch mode) rather than up front"""
+
+    def inner(filename):
+        if enabled():
+            add_total(**work(filename))
+        return convert(filename)
+
+    return inner
+
+
+def add_arguments(parser):
+    """add --progress and --progress-interval options to argparse :arg parser"""
+    parser.add_argument("--progress", dest="progress", action="store_true", default=False,
+                        help="report progress, throughput and ETA on standard error, as json lines when it is not "
+                             "a terminal [default: %(default)s]")
+    parser.add_argument("--progress-interval", dest="progress_interval", metavar="SECONDS", type=float,
+                        help="seconds between progress reports [default: {} on a terminal, {} otherwise]".format(
+                            TTY_INTERVAL, DEFAULT_INTERVAL))
+
+
+@contextmanager
+def session(opts):
+    """report progress, as requested by :arg opts command line options (see :func add_arguments), during the enclosed
+    block"""
+    global _reporter
+
+    if not opts.progress:
+        yield
+        return
+
+    reporter = _reporter = ProgressReporter(interval=opts.progress_interval)
+    try:
+        yield
+    finally:
+        _reporter = None
+        reporter.close()
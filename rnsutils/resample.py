@@ -0,0 +1,102 @@
+"""sample rate and bit depth reduction of WAV samples, vectorized with numpy.
+
+Samples are resampled in the frequency domain (FFT), which low pass filters them at the new Nyquist frequency, and
+reduced bit depths are TPDF dithered with a fixed seed so that conversions stay reproducible. Frame positions of the
+renoise sample (loop, display and selection) are rescaled to match. Like silence trimming (see :mod rnsutils.analysis)
+this needs numpy and leaves samples which are not PCM WAV alone."""
+
+import logging
+import math
+
+from . import stats
+from .analysis import array_to_pcm, pcm_to_array, read_wav, write_wav
+
+BIT_DEPTHS = (8, 16, 24)
+
+# renoise sample fields holding frame positions, -1 meaning unset
+FRAME_POSITION_FIELDS = ('LoopStart', 'LoopEnd', 'DisplayStart', 'DisplayLength', 'SelectionRangeStart',
+                         'SelectionRangeEnd')
+
+# frames of silence appended before resampling, for the end of samples not to wrap around to their start
+_PADDING_FRAMES = 1024
+
+
+def resample(samples, sample_rate, target_sample_rate):
+    """:return (frames, channels) float array :arg samples resampled from :arg sample_rate to
+    :arg target_sample_rate"""
+    import numpy
+
+    frames = len(samples)
+    target_frames = int(round(frames * target_sample_rate / float(sample_rate)))
+
+    # pad to a length converting to a whole number of frames, so that the rate ratio is exact
+    step = sample_rate // math.gcd(sample_rate, target_sample_rate)
+    padded_frames = -(-(frames + _PADDING_FRAMES) // step) * step
+    padded_target_frames = padded_frames * target_sample_rate // sample_rate
+
+    spectrum = numpy.fft.rfft(samples, n=padded_frames, axis=0)
+    kept_bins = min(len(spectrum), padded_target_frames // 2 + 1)
+    spectrum = spectrum[:kept_bins]
+    if padded_target_frames < padded_frames and padded_target_frames % 2 == 0:
+        # the new Nyquist bin would alias
+        spectrum[-1] = 0
+
+    resampled = numpy.fft.irfft(spectrum, n=padded_target_frames, axis=0)
+    return resampled[:target_frames] * (padded_target_frames / float(padded_frames))
+
+
+def dither(samples, bit_depth, seed=0):
+    """:return float array :arg samples with triangular (TPDF) dither of one :arg bit_depth bits LSB added"""
+    import numpy
+
+    rng = numpy.random.default_rng(seed)
+    lsb = 1. / (1 << (bit_depth - 1))
+    return samples + (rng.random(samples.shape) - rng.random(samples.shape)) * lsb
+
+
+def scale_frame_positions(renoise_sample, ratio, frames):
+    """multiply frame positions of :arg renoise_sample by :arg ratio, keeping them within :arg frames frames"""
+    for field in FRAME_POSITION_FIELDS:
+        position = getattr(renoise_sample, field, None)
+        if position is None or int(position) < 0:
+            continue
+        setattr(renoise_sample, field, min(int(round(int(position) * ratio)), frames))
+
+
+@stats.timed('resample')
+def reduce_wav(wav_content, renoise_sample=None, sample_rate=None, bit_depth=None, seed=0):
+    """reduce :arg wav_content to at most :arg sample_rate Hz and :arg bit_depth bits, rescaling frame positions of
+    :arg renoise_sample if given. Lower rates and depths are kept as is.
+    :return reduced WAV content"""
+    wav = read_wav(wav_content)
+    if wav is None:
+        logging.debug("Not reducing sample which isn't PCM WAV")
+        return wav_content
+    params, frames = wav
+
+    target_sample_rate = min(sample_rate or params.framerate, params.framerate)
+    target_sample_width = min((bit_depth or 8 * params.sampwidth) // 8, params.sampwidth)
+    if target_sample_rate == params.framerate and target_sample_width == params.sampwidth:
+        return wav_content
+
+    samples = pcm_to_array(frames, params.sampwidth, params.nchannels)
+    frame_count = len(samples)
+    if target_sample_rate != params.framerate:
+        samples = resample(samples, params.framerate, target_sample_rate)
+    if target_sample_width != params.sampwidth:
+        samples = dither(samples, 8 * target_sample_width, seed)
+
+    if renoise_sample is not None and frame_count:
+        scale_frame_positions(renoise_sample, len(samples) / float(frame_count), len(samples))
+
+    stats.count('reduced_bytes', len(frames) - len(samples) * params.nchannels * target_sample_width)
+    return write_wav(array_to_pcm(samples, target_sample_width), params.nchannels, target_sample_width,
+                     target_sample_rate)
+
+
+def add_arguments(parser):
+    """add --sample-rate and --bit-depth options to argparse :arg parser"""
+    parser.add_argument("--sample-rate", dest="sample_rate", metavar="HZ", type=int,
+                        help="resample samples above HZ down to HZ, needs numpy [default: keep rate]")
+    parser.add_argument("--bit-depth", dest="bit_depth", type=int, choices=BIT_DEPTHS,
+                        help="dither samples above the given bit depth down to it, needs numpy [default: keep depth]")
@@ -0,0 +1,277 @@
+# serve. long running rnsutils conversion server
+# Copyright (C) 2016  Olivier Jolly
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""conversion server running commands sent over a unix domain socket (see :mod rnsutils.client for the protocol).
+
+Running many commands in a single process saves interpreter startup and imports for every job, and keeps parsed
+templates, parsed SoundFont 2 files and encoded samples cached (see :mod rnsutils.cache) along with the zip thread
+pool. Jobs run one at a time, in the order they are received, each in the working directory of its client."""
+
+from __future__ import print_function
+
+import argparse
+import io
+import logging
+import os
+import queue
+import signal
+import socketserver
+import sys
+import threading
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+
+from rnsutils import cache
+from rnsutils.cache import LruCache
+from rnsutils.client import default_socket_path, submit, REQUEST_STATUS, REQUEST_SHUTDOWN
+
+__date__ = '2017-03-01'
+__updated__ = '2017-03-01'
+__author__ = 'olivier@pcedev.com'
+
+# commands the server refuses to run
+EXCLUDED_COMMANDS = {'client', 'serve'}
+
+
+class _EventStream(io.TextIOBase):
+    """text stream forwarding everything written to it as output events"""
+
+    def __init__(self, send, name):
+        super(_EventStream, self).__init__()
+        self.send = send
+        self.name = name
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if text:
+            self.send({'event': 'output', 'stream': self.name, 'text': text})
+        return len(text)
+
+
+class _Job(object):
+    def __init__(self, request, stream):
+        self.request = request
+        self.stream = stream
+        self.done = threading.Event()
+        self.disconnected = False
+
+    def send(self, event):
+        # keep running the job even if its client went away, its output is lost but files are still written
+        if self.disconnected:
+            return
+        import json
+        try:
+            self.stream.write(json.dumps(event).encode('utf-8') + b'\n')
+            self.stream.flush()
+        except (IOError, OSError):
+            self.disconnected = True
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        import json
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+        except ValueError as e:
+            request = {'error': 'malformed request: {}'.format(e)}
+        if not isinstance(request, dict):
+            request = {'error': 'malformed request: not a json object'}
+
+        job = _Job(request, self.wfile)
+        self.server.conversion_server.jobs.put(job)
+        job.done.wait()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ConversionServer(object):
+    """serve jobs on :arg socket_path, caching up to :arg templates parsed templates, :arg sf2_files parsed SoundFont 2
+    files and :arg encoded_bytes bytes of encoded samples"""
+
+    def __init__(self, socket_path, templates=8, sf2_files=4, encoded_bytes=256 * 1024 * 1024):
+        self.socket_path = socket_path
+        self.caches = {'template': LruCache(templates), 'sf2': LruCache(sf2_files),
+                       'encode': LruCache(encoded_bytes, weigh=len)}
+        self.jobs = queue.Queue()
+        self.server = None
+
+    def serve_forever(self):
+        """serve jobs until a shutdown request is received"""
+        self.server = _UnixServer(self.socket_path, _RequestHandler)
+        self.server.conversion_server = self
+
+        cache.enable(self.caches)
+        worker = threading.Thread(target=self._run_jobs, name='rnsutils-jobs')
+        worker.daemon = True
+        worker.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            cache.disable()
+            self.server.server_close()
+            os.remove(self.socket_path)
+
+    def shutdown(self):
+        # serve_forever is waiting for shutdown to complete, hence it must not be called from its thread
+        threading.Thread(target=self.server.shutdown).start()
+
+    def _run_jobs(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if 'error' in job.request:
+                    job.send({'event': 'output', 'stream': 'stderr', 'text': job.request['error'] + '\n'})
+                    job.send({'event': 'done', 'status': 2})
+                else:
+                    job.send({'event': 'done', 'status': self.run(job.request, job.send)})
+            except Exception:
+                # this thread runs every job, it must survive any of them
+                logging.exception("Failed to run job %r", job.request)
+                job.send({'event': 'done', 'status': 1})
+            finally:
+                job.done.set()
+
+    def run(self, request, send):
+        """run the command described by :arg request, sending output events with :arg send
+        :return command exit status"""
+        import json
+        from rnsutils.cli import COMMANDS
+
+        command = request.get('command')
+        if command == REQUEST_STATUS:
+            send({'event': 'output', 'stream': 'stdout',
+                  'text': json.dumps({'jobs': self.jobs.qsize(), 'caches': cache.statistics()}, indent=2,
+                                     sort_keys=True) + '\n'})
+            return 0
+        if command == REQUEST_SHUTDOWN:
+            self.shutdown()
+            return 0
+        if command not in COMMANDS or command in EXCLUDED_COMMANDS:
+            send({'event': 'output', 'stream': 'stderr', 'text': "unknown command '{}'\n".format(command)})
+            return 2
+
+        import importlib
+        main = importlib.import_module(COMMANDS[command][0]).main
+
+        stdin = sys.stdin
+        argv0 = sys.argv[0]
+        cwd = os.getcwd()
+        try:
+            sys.stdin = io.StringIO()
+            sys.argv[0] = 'rnsutils {}'.format(command)
+            try:
+                os.chdir(request.get('cwd') or cwd)
+            except OSError as e:
+                send({'event': 'output', 'stream': 'stderr', 'text': "can't run in {}: {}\n".format(
+                    request.get('cwd'), e.strerror)})
+                return 2
+            with redirect_stdout(_EventStream(send, 'stdout')), redirect_stderr(_EventStream(send, 'stderr')):
+                try:
+                    return main(request.get('args', [])) or 0
+                except SystemExit as e:
+                    return e.code if isinstance(e.code, int) else 0 if e.code is None else 1
+                except Exception:
+                    sys.stderr.write(traceback.format_exc())
+                    return 1
+        finally:
+            os.chdir(cwd)
+            sys.argv[0] = argv0
+            sys.stdin = stdin
+
+
+def is_serving(socket_path):
+    """:return whether a server is listening on :arg socket_path"""
+    try:
+        for _ in submit(socket_path, REQUEST_STATUS):
+            pass
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def main(argv=None):
+    program_name = os.path.basename(sys.argv[0])
+    program_version = "v0.9"
+    program_build_date = "%s" % __updated__
+
+    program_version_string = 'serve %s (%s)' % (program_version, program_build_date)
+    program_longdesc = '''Serve rnsutils commands over a unix domain socket'''
+    program_license = "GPL v3+ 2016-2017 Olivier Jolly"
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    try:
+        parser = argparse.ArgumentParser(epilog=program_longdesc,
+                                         description=program_license)
+        parser.add_argument("-d", "--debug", dest="debug", action="store_true",
+                            default=False,
+                            help="debug parsing [default: %(default)s]")
+        parser.add_argument("-S", "--socket", dest="socket_path", default=default_socket_path(),
+                            help="socket to listen on [default: %(default)s]")
+        parser.add_argument("--encode-cache", dest="encode_cache", type=int, default=256,
+                            help="MB of encoded samples to keep [default: %(default)s]")
+        parser.add_argument("--sf2-cache", dest="sf2_cache", type=int, default=4,
+                            help="parsed SoundFont 2 files to keep [default: %(default)s]")
+        parser.add_argument("--template-cache", dest="template_cache", type=int, default=8,
+                            help="parsed templates to keep [default: %(default)s]")
+        parser.add_argument("-q", "--quiet", dest="quiet", action="store_true", default=False,
+                            help="quiet operation [default: %(default)s]")
+        parser.add_argument("-v", "--version", action="version", version=program_version_string)
+
+        # process options
+        opts = parser.parse_args(argv)
+
+    except Exception as e:
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help")
+        return 2
+
+    if opts.debug:
+        logging.root.setLevel(logging.DEBUG)
+    else:
+        logging.root.setLevel(logging.INFO)
+
+    if os.path.exists(opts.socket_path):
+        if is_serving(opts.socket_path):
+            sys.stderr.write("{}: a server is already listening on {}\n".format(program_name, opts.socket_path))
+            return 1
+        # left over by a server which didn't exit cleanly
+        os.remove(opts.socket_path)
+
+    server = ConversionServer(opts.socket_path, templates=opts.template_cache, sf2_files=opts.sf2_cache,
+                              encoded_bytes=opts.encode_cache * 1024 * 1024)
+
+    if not opts.quiet:
+        print("Serving on {}".format(opts.socket_path))
+        sys.stdout.flush()
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.shutdown())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,12 +23,14 @@ import sys
 
 import io
 import os
+from contextlib import contextmanager
 from copy import deepcopy
+from functools import partial
 
-from rnsutils.instrument import RenoiseInstrument
-from rnsutils.utils import ENCODING_NONE, encode_audio_file, ENCODING_FLAC, ENCODING_OGG, expand_keymap
+from rnsutils import analysis, budget, cache, encoders, journal, progress, resample, stats, watch
+from rnsutils.utils import ENCODING_NONE, encode_audio_file, ENCODING_FLAC, encoded_filename, encoding_list, \
+    encoding_passes, expand_keymap, save_encoded
 from sf2utils.generator import Sf2Gen
-from sf2utils.sf2parse import Sf2File
 
 __date__ = '2016-01-22'
 __updated__ = '2017-02-08'
@@ -39,12 +41,17 @@ class Sf2ToXrni(object):
     WHITELIST_UNUSED_GEN_OPERS = {Sf2Gen.OPER_INITIAL_ATTENUATION, Sf2Gen.OPER_VIB_LFO_TO_PITCH,
                                   Sf2Gen.OPER_DELAY_VIB_LFO, Sf2Gen.OPER_FREQ_VIB_LFO}
 
-    def __init__(self, show_unused=False, encoding=ENCODING_NONE, force_center=False, **kwargs):
+    def __init__(self, show_unused=False, encoding=ENCODING_NONE, force_center=False, trim_silence=None,
+                 sample_rate=None, bit_depth=None, **kwargs):
         self.show_unused = show_unused
+        self.trim_silence = trim_silence
+        self.sample_rate = sample_rate
+        self.bit_depth = bit_depth
         self.encoding = encoding
         self.unused_gens = set()
         self.force_center = force_center
 
+    @stats.timed('convert.bag')
     def convert_bag(self, sf2_bag, renoise_sample, renoise_modulation_set, default_sample, default_modulation_set):
 
         # sample looping
@@ -143,8 +150,9 @@ class Sf2ToXrni(object):
                                      "\n---\n{}".format(sf2_instrument.name, sf2_instrument.parent.info)
 
         # load global properties if any
-        renoise_global_sample = deepcopy(renoise_instrument.sample_template)
-        renoise_global_modulation_set = deepcopy(renoise_instrument.modulation_set_template)
+        with stats.timer('template.deepcopy'):
+            renoise_global_sample = deepcopy(renoise_instrument.sample_template)
+            renoise_global_modulation_set = deepcopy(renoise_instrument.modulation_set_template)
 
         self.load_default_sample_settings(renoise_global_sample, renoise_global_modulation_set)
         global_chorus_send, global_reverb_send = self.load_global_sample_settings(sf2_instrument, renoise_global_sample,
@@ -162,8 +170,9 @@ class Sf2ToXrni(object):
                 continue
 
             # convert sample meta data in xml
-            renoise_sample = deepcopy(renoise_instrument.sample_template)
-            renoise_modulation_set = deepcopy(renoise_instrument.modulation_set_template)
+            with stats.timer('template.deepcopy'):
+                renoise_sample = deepcopy(renoise_instrument.sample_template)
+                renoise_modulation_set = deepcopy(renoise_instrument.modulation_set_template)
 
             # link sample to its dedicated modulation set
             renoise_sample.ModulationSetIndex = bag_idx
@@ -187,8 +196,14 @@ class Sf2ToXrni(object):
 
             # copy wav content from sf2 to renoise
             wav_content = io.BytesIO()
-            sf2_bag.sample.export(wav_content)
-            renoise_instrument.sample_data.append(encode_audio_file(wav_content.getvalue(), self.encoding))
+            with stats.timer('sf2.export'):
+                sf2_bag.sample.export(wav_content)
+            wav_content = wav_content.getvalue()
+            if self.trim_silence is not None:
+                wav_content = analysis.trim_silence(wav_content, renoise_sample, self.trim_silence)
+            if self.sample_rate or self.bit_depth:
+                wav_content = resample.reduce_wav(wav_content, renoise_sample, self.sample_rate, self.bit_depth)
+            renoise_instrument.sample_data.append(encode_audio_file(wav_content, self.encoding))
 
             # check which generator where not used from the sf2, excluding those which have no mapping or are
             # ignored on purpose
@@ -226,6 +241,179 @@ class Sf2ToXrni(object):
         return math.pow(envelope_attenuation / 60., 1 / 3.) if envelope_attenuation else None
 
 
+def _parse_sf2(sf2_file):
+    from sf2utils.sf2parse import Sf2File
+    with stats.timer('sf2.parse'):
+        return Sf2File(sf2_file)
+
+
+@contextmanager
+def open_sf2(sf2_filename):
+    """parse SoundFont 2 :arg sf2_filename for the enclosed block. Sample data being read on demand, the file remains
+    open until the block exits, or as long as the parsed file is cached (see :mod rnsutils.cache)"""
+    if cache.enabled('sf2'):
+        yield cache.file_cached('sf2', sf2_filename, lambda filename: _parse_sf2(open(filename, 'rb')))
+        return
+
+    with open(sf2_filename, 'rb') as sf2_file:
+        yield _parse_sf2(sf2_file)
+
+
+# size of the header of samples exported as WAV
+_WAV_HEADER_SIZE = 44
+
+
+def selected_instruments(sf2, opts):
+    """:return iterator over (index, instrument) of instruments of :arg sf2 to convert as requested by :arg opts"""
+    for instrument_idx, sf2_instrument in enumerate(sf2.instruments):
+        if sf2_instrument.is_sentinel():
+            continue
+
+        if opts.instruments_index and instrument_idx not in opts.instruments_index:
+            continue
+
+        yield instrument_idx, sf2_instrument
+
+
+def instrument_work(sf2_instrument, passes=1):
+    """:return samples and bytes of audio encoded when converting :arg sf2_instrument, going :arg passes times through
+    encoding (see :func rnsutils.utils.encoding_passes)"""
+    samples = [sf2_bag.sample for sf2_bag in sf2_instrument.bags if sf2_bag.sample is not None]
+    return {'samples': len(samples) * passes,
+            'bytes': sum(_WAV_HEADER_SIZE + sample.duration * sample.sample_width for sample in samples) * passes}
+
+
+def file_work(sf2_filename, opts):
+    """:return work (see :mod rnsutils.progress) of converting :arg sf2_filename as requested by :arg opts"""
+    work = {'files': 1, 'instruments': 0, 'samples': 0, 'bytes': 0}
+    # noinspection PyBroadException
+    try:
+        with open_sf2(sf2_filename) as sf2:
+            for _, sf2_instrument in selected_instruments(sf2, opts):
+                work['instruments'] += 1
+                for unit, value in instrument_work(sf2_instrument, encoding_passes(len(opts.encodings))).items():
+                    work[unit] += value
+    except Exception:
+        logging.debug("Can't estimate the work of converting %s", sf2_filename, exc_info=True)
+    return work
+
+
+def convert_file(sf2_filename, opts):
+    """convert instruments of :arg sf2_filename as requested by :arg opts command line options"""
+    try:
+        _convert_file(sf2_filename, opts)
+    finally:
+        progress.advance(files=1)
+
+
+def _convert_file(sf2_filename, opts):
+    stats.file(sf2_filename)
+
+    if not opts.quiet:
+        print("Reading instruments from '{}'".format(sf2_filename))
+
+    with open_sf2(sf2_filename) as sf2:
+        # print(sf2.pretty_print())
+
+        sf2_to_xrni = Sf2ToXrni(**vars(opts))
+
+        for instrument_idx, sf2_instrument in selected_instruments(sf2, opts):
+            try:
+                _convert_instrument(sf2_filename, sf2_to_xrni, instrument_idx, sf2_instrument, opts)
+            finally:
+                progress.advance(instruments=1)
+
+
+def _convert_instrument(sf2_filename, sf2_to_xrni, instrument_idx, sf2_instrument, opts):
+    from rnsutils.fingerprint import conversion_fingerprint, is_up_to_date
+    from rnsutils.instrument import RenoiseInstrument
+
+    if not opts.quiet:
+        print("Converting '{}'...".format(sf2_instrument.name), end='')
+
+    # one output per encoding, samples being encoded right away when there is only one
+    outputs = []
+    for encoding in opts.encodings:
+        output_filename = encoded_filename(os.path.join(opts.output_dir or '', '{}_{}.xrni'.format(
+            instrument_idx, sf2_instrument.name)), encoding, opts.encodings)
+        fingerprint = conversion_fingerprint([sf2_filename], opts.template, {
+            'converter': 'sf2toxrni', 'instrument': instrument_idx, 'encoding': encoding,
+            'force_center': opts.force_center, 'expand_keymap': not opts.no_expand_keymap,
+            'trim_silence': opts.trim_silence, 'sample_rate': opts.sample_rate,
+            'bit_depth': opts.bit_depth, 'compact_xml': opts.compact_xml, 'deterministic': opts.deterministic})
+        if journal.completed(fingerprint, output_filename):
+            if not opts.quiet:
+                print(" already converted {}".format(output_filename), end='')
+            continue
+        if not opts.rebuild and is_up_to_date(output_filename, fingerprint):
+            if not opts.quiet:
+                print(" up to date {}".format(output_filename), end='')
+            continue
+        outputs.append((encoding, output_filename, fingerprint))
+
+    # up to date outputs won't be encoded
+    progress.discard(**instrument_work(sf2_instrument, encoding_passes(len(opts.encodings)) -
+                                       encoding_passes(len(outputs))))
+
+    if not outputs:
+        if not opts.quiet:
+            print()
+        return
+
+    # noinspection PyBroadException
+    try:
+        sf2_to_xrni.encoding = outputs[0][0] if len(outputs) == 1 else ENCODING_NONE
+        renoise_instrument = RenoiseInstrument(template_filename=opts.template)
+        renoise_instrument.fingerprint = outputs[0][2]
+        renoise_instrument.compact = opts.compact_xml
+        renoise_instrument.deterministic = opts.deterministic
+        if opts.stream and not renoise_instrument.stream(outputs[0][1], overwrite=opts.force):
+            progress.discard(**instrument_work(sf2_instrument))
+            if not opts.quiet:
+                print(" skipped")
+            return
+
+        try:
+            sf2_to_xrni.convert_instrument(sf2_instrument, renoise_instrument)
+
+            if not opts.no_expand_keymap:
+                expand_keymap(renoise_instrument)
+
+            # saves refuse to overwrite existing outputs unless forced, forced ones leave unchanged outputs untouched
+            refused = [not opts.force and os.path.isfile(output_filename) for _, output_filename, _ in outputs]
+            if len(outputs) == 1:
+                # noinspection PyTypeChecker
+                written = [renoise_instrument.save(outputs[0][1], overwrite=opts.force, if_changed=True)]
+            else:
+                written = save_encoded(renoise_instrument, outputs, overwrite=opts.force, if_changed=True)
+        except Exception:
+            if renoise_instrument.streaming:
+                renoise_instrument.discard_stream()
+            raise
+
+        for _, output_filename, fingerprint in outputs:
+            journal.record(sf2_filename, instrument_idx, fingerprint, output_filename)
+
+        if not opts.quiet:
+            print(" {}".format(", ".join(
+                "skipped {} (exists)".format(output_filename) if output_refused else
+                "saved {}{}".format(output_filename, "" if output_written else " (unchanged)")
+                for (_, output_filename, _), output_written, output_refused in zip(outputs, written, refused))))
+    except Exception:
+        if not opts.quiet:
+            print(" FAILED")
+        logging.exception("Failed to convert instrument")
+
+        # pprint.pprint(sf2.samples)
+        # sf2.samples[3].export('/tmp/test.wav')
+
+        # pprint.pprint(sf2.presets)
+        # pprint.pprint(sf2.instruments)
+        #
+        # for instrument in sf2.instruments:
+        #     print(instrument.pretty_print())
+
+
 def main(argv=None):
     program_name = os.path.basename(sys.argv[0])
     program_version = "v0.9"
@@ -243,31 +431,54 @@ def main(argv=None):
                                          description=program_license)
         parser.add_argument("-c", "--force-center", dest="force_center", action="store_true", default="False",
                             help="force panning of generated samples to center [default: %(default)s]")
+        parser.add_argument("--compact-xml", dest="compact_xml", action="store_true", default=False,
+                            help="save Instrument.xml without indentation [default: %(default)s]")
         parser.add_argument("-d", "--debug", dest="debug", action="store_true",
                             default=False,
                             help="debug parsing [default: %(default)s]")
-        parser.add_argument("-e", "--encode", dest="encoding", choices=[ENCODING_NONE, ENCODING_FLAC, ENCODING_OGG],
-                            default=ENCODING_FLAC, help="encode samples into given format [default: %(default)s]")
+        parser.add_argument("--deterministic", dest="deterministic", action="store_true", default=False,
+                            help="save byte reproducible instruments, with fixed timestamps and canonical "
+                                 "Instrument.xml [default: %(default)s]")
+        parser.add_argument("-e", "--encode", dest="encodings", type=encoding_list, default=[ENCODING_FLAC],
+                            help="encode samples into given formats among none, flac and ogg, comma separated, "
+                                 "writing one instrument per format [default: flac]")
         parser.add_argument("-f", "--force", dest="force", default=False, action="store_true",
                             help="force overwriting existing files [default: %(default)s]")
         parser.add_argument("-q", "--quiet", dest="quiet", action="store_true", default=False,
                             help="quiet operation [default: %(default)s]")
         parser.add_argument("-i", "--instrument", dest="instruments_index", action="append", type=int,
                             help="instrument index to extract [default: all]")
+        parser.add_argument("-s", "--stream", dest="stream", action="store_true", default=False,
+                            help="write samples to output as soon as converted to bound memory use "
+                                 "[default: %(default)s]")
         parser.add_argument("--no-expand-keymap", dest="no_expand_keymap", action="store_true")
         parser.add_argument("-o", "--ouput-dir", dest="output_dir",
                             help="output directory [default: current directory]")
+        parser.add_argument("-r", "--rebuild", dest="rebuild", action="store_true", default=False,
+                            help="convert even if output is up to date [default: %(default)s]")
         parser.add_argument("-t", dest="template", help="template filename [default: %(default)s]",
                             default="empty-31.xrni")
         parser.add_argument("-u", "--unused", dest="show_unused", action="store_true", default=True,
                             help="show unused generators [default: %(default)s]")
         parser.add_argument("--no-unused", dest="show_unused", action="store_false")
         parser.add_argument("-v", "--version", action="version", version=program_version_string)
+        analysis.add_arguments(parser)
+        resample.add_arguments(parser)
+        watch.add_arguments(parser)
+        journal.add_arguments(parser)
+        budget.add_arguments(parser)
+        progress.add_arguments(parser)
+        stats.add_arguments(parser)
 
-        parser.add_argument("sf2_filename", help="input file in SoundFont2 format", nargs="+")
+        parser.add_argument("sf2_filename", help="input file in SoundFont2 format", nargs="*")
 
         # process options
         opts = parser.parse_args(argv)
+        if not opts.sf2_filename and not opts.watch:
+            parser.error("no input file nor directory to watch given")
+        if opts.stream and len(opts.encodings) > 1:
+            parser.error("streaming only supports a single encoding")
+        journal.check_arguments(parser, opts)
 
     except Exception as e:
         indent = len(program_name) * " "
@@ -280,55 +491,28 @@ def main(argv=None):
     else:
         logging.root.setLevel(logging.INFO)
 
-    for sf2_filename in opts.sf2_filename:
-
-        if not opts.quiet:
-            print("Reading instruments from '{}'".format(sf2_filename))
-
-        with open(sf2_filename, "rb") as sf2_file:
-            sf2 = Sf2File(sf2_file)
-
-            # print(sf2.pretty_print())
-
-            sf2_to_xrni = Sf2ToXrni(**vars(opts))
-
-            for instrument_idx, sf2_instrument in enumerate(sf2.instruments):
-                if sf2_instrument.is_sentinel():
-                    continue
-
-                if opts.instruments_index and instrument_idx not in opts.instruments_index:
-                    continue
-
-                if not opts.quiet:
-                    print("Converting '{}'...".format(sf2_instrument.name), end='')
-
-                # noinspection PyBroadException
-                try:
-                    renoise_instrument = RenoiseInstrument(template_filename=opts.template)
-                    sf2_to_xrni.convert_instrument(sf2_instrument, renoise_instrument)
+    if (opts.trim_silence is not None or opts.sample_rate or opts.bit_depth) and not analysis.available():
+        sys.stderr.write(program_name + ": trimming silence and reducing samples need numpy\n")
+        return 2
 
-                    if not opts.no_expand_keymap:
-                        expand_keymap(renoise_instrument)
+    encoding_error = encoders.check(opts.encodings)
+    if encoding_error:
+        sys.stderr.write(program_name + ": " + encoding_error + "\n")
+        return 2
 
-                    output_filename = os.path.join(opts.output_dir or '',
-                                                   '{}_{}.xrni'.format(instrument_idx, renoise_instrument.name))
-                    # noinspection PyTypeChecker
-                    renoise_instrument.save(output_filename, overwrite=opts.force)
-                    if not opts.quiet:
-                        print(" saved {}".format(output_filename))
-                except Exception:
-                    if not opts.quiet:
-                        print(" FAILED")
-                    logging.exception("Failed to convert instrument")
+    with stats.session(opts), journal.session(opts), budget.session(opts), progress.session(opts):
+        if progress.enabled():
+            for sf2_filename in opts.sf2_filename:
+                progress.add_total(**file_work(sf2_filename, opts))
 
-                    # pprint.pprint(sf2.samples)
-                    # sf2.samples[3].export('/tmp/test.wav')
+        for sf2_filename in opts.sf2_filename:
+            convert_file(sf2_filename, opts)
 
-                    # pprint.pprint(sf2.presets)
-                    # pprint.pprint(sf2.instruments)
-                    #
-                    # for instrument in sf2.instruments:
-                    #     print(instrument.pretty_print())
+        if opts.watch:
+            if not opts.quiet:
+                print("Watching '{}'".format(opts.watch))
+            watch.watch(opts.watch, progress.tracked(partial(convert_file, opts=opts), partial(file_work, opts=opts)),
+                        ('.sf2',), settle=opts.watch_settle, interval=opts.watch_interval, workers=opts.watch_jobs)
 
     return 0
 
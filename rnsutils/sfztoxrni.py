@@ -24,9 +24,11 @@ import sys
 import os
 import re
 from copy import deepcopy
+from functools import partial
 
-from rnsutils.instrument import RenoiseInstrument, second_to_renoise_time, db_to_renoise_volume
-from rnsutils.utils import ENCODING_NONE, ENCODING_FLAC, ENCODING_OGG, encode_audio_file
+from rnsutils import analysis, budget, encoders, journal, progress, resample, stats, watch
+from rnsutils.utils import ENCODING_NONE, ENCODING_FLAC, encode_audio_file, encoded_filename, encoding_list, \
+    encoding_passes, save_encoded
 
 __date__ = '2016-01-28'
 __updated__ = '2017-02-08'
@@ -53,6 +55,17 @@ def search_case_insensitive_path(path):
     return None
 
 
+def normalize_sfz_path(path):
+    """:return :arg path as found in a SFZ file, using '/' as separator and relative to the SFZ location"""
+    path = re.sub(r'\\+', r'/', path)
+
+    # remove first char if file separator
+    if path[:1] in (r'/', r'\\'):
+        path = path[1:]
+
+    return path
+
+
 SFZ_NOTE_LETTER_OFFSET = {'a': 9, 'b': 11, 'c': 0, 'd': 2, 'e': 4, 'f': 5, 'g': 7}
 
 
@@ -67,13 +80,26 @@ def sfz_note_to_midi_key(sfz_note):
 
 
 class SfzToXrni(object):
-    def __init__(self, sfz_path, show_unused=False, encoding=ENCODING_NONE, **kwargs):
+    def __init__(self, sfz_path, show_unused=False, encoding=ENCODING_NONE, sample_resolver=None, trim_silence=None,
+                 sample_rate=None, bit_depth=None, **kwargs):
+        """:arg sfz_path directory of the SFZ file, samples are looked up from
+        :arg sample_resolver callable returning the content of a sample given its path relative to the SFZ file, as
+        bytes or a readable file object, None if missing [default: :meth read_sample, reading from disk]
+        :arg trim_silence threshold in dBFS below which leading and trailing silence is trimmed from samples
+        [default: no trimming]
+        :arg sample_rate, :arg bit_depth maximum sample rate and bit depth of samples [default: unchanged]"""
         self.encoding = encoding
+        self.trim_silence = trim_silence
+        self.sample_rate = sample_rate
+        self.bit_depth = bit_depth
         self.sfz_path = sfz_path
         self.show_unused = show_unused
         self.sfz_default_path = ''
+        self.sample_resolver = sample_resolver or self.read_sample
 
     def load_default_sample_settings(self, renoise_global_sample, renoise_global_modulation_set):
+        from rnsutils.instrument import RenoiseInstrument
+
         renoise_global_modulation_set.Devices.SampleMixerModulationDevice.Cutoff.Value = self.freq_to_cutoff(20000)
         renoise_global_modulation_set.Devices.SampleAhdsrModulationDevice.Attack.Value = 0
         renoise_global_modulation_set.Devices.SampleAhdsrModulationDevice.Hold.Value = 0
@@ -95,67 +121,115 @@ class SfzToXrni(object):
         renoise_global_sample.Mapping.NoteStart, renoise_global_sample.Mapping.NoteEnd = (0, 119)
         renoise_global_sample.Mapping.VelocityStart, renoise_global_sample.Mapping.VelocityEnd = (0, 127)
 
+    def sample_path(self, sample_filename):
+        """:return path of :arg sample_filename as written in the SFZ, with the current default path"""
+        return os.path.join(self.sfz_path, self.sfz_default_path, sample_filename)
+
+    def read_sample(self, sample_filename):
+        """:return content of :arg sample_filename, relative to the SFZ file, looked up case insensitively on disk,
+        None if missing"""
+        sample_filename = search_case_insensitive_path(os.path.join(self.sfz_path, sample_filename))
+        if sample_filename is None:
+            return None
+
+        with open(sample_filename, 'rb') as sample_file:
+            return sample_file.read()
+
+    def sample_filenames(self, sfz_filename):
+        """:return path of all samples referenced by regions of :arg sfz_filename, whether they exist or not"""
+        self.sfz_default_path = ''
+        sample_filenames = []
+
+        with open(sfz_filename, 'rt') as sfz_file:
+            for section_name, section_content in self.parse_sfz(sfz_file.readlines()):
+                if 'default_path' in section_content:
+                    self.sfz_default_path = normalize_sfz_path(section_content['default_path'].lower())
+
+                if section_name not in ('group', 'global') and section_content.get('sample'):
+                    sample_path = self.sample_path(normalize_sfz_path(section_content['sample'].lower()))
+                    sample_filenames.append(search_case_insensitive_path(sample_path) or sample_path)
+
+        self.sfz_default_path = ''
+        return sample_filenames
+
     def convert_instrument(self, sfz_filename, renoise_instrument):
+        with open(sfz_filename, 'rt') as sfz_file:
+            self.convert_lines(sfz_file.readlines(), sfz_filename, renoise_instrument)
+
+    def convert_lines(self, sfz_lines, sfz_name, renoise_instrument):
+        """convert SFZ content, given as :arg sfz_lines and named :arg sfz_name, into :arg renoise_instrument"""
+        from rnsutils.instrument import RenoiseInstrument
+
+        self.sfz_default_path = ''
 
         renoise_instrument.root.find('GlobalProperties/*[Name="SF2 reverb"]').Value = 0
         renoise_instrument.root.find('GlobalProperties/*[Name="SF2 chorus"]').Value = 0
         renoise_instrument.root.SampleGenerator.KeyzoneOverlappingMode = RenoiseInstrument.OVERLAP_ALL
 
         renoise_instrument.comment = "Converted from SFZ {} with sfztoxrni " \
-                                     "( https://gitlab.com/zeograd/rnsutils )".format(sfz_filename)
+                                     "( https://gitlab.com/zeograd/rnsutils )".format(sfz_name)
 
         renoise_instrument.root.GlobalProperties.MacrosVisible = False
 
-        with open(sfz_filename, 'rt') as sfz_file:
-            # convert instrument meta data
-            renoise_instrument.name = os.path.basename(sfz_filename)
+        # convert instrument meta data
+        renoise_instrument.name = os.path.basename(sfz_name)
 
-            # load global properties if any
+        # load global properties if any
+        with stats.timer('template.deepcopy'):
             renoise_default_sample = deepcopy(renoise_instrument.sample_template)
             renoise_default_modulation_set = deepcopy(renoise_instrument.modulation_set_template)
 
-            self.load_default_sample_settings(renoise_default_sample, renoise_default_modulation_set)
+        self.load_default_sample_settings(renoise_default_sample, renoise_default_modulation_set)
 
-            sfz_content = self.parse_sfz(sfz_file.readlines())
+        sfz_content = self.parse_sfz(sfz_lines)
 
-            section_idx = 0
+        section_idx = 0
 
-            for section_name, section_content in sfz_content:
+        for section_name, section_content in sfz_content:
 
-                if section_name in ('group', 'global'):
-                    self.convert_section(section_name, section_content, renoise_default_sample,
-                                         renoise_default_modulation_set, renoise_default_sample,
-                                         renoise_default_modulation_set, renoise_instrument)
-                    continue
+            if section_name in ('group', 'global'):
+                self.convert_section(section_name, section_content, renoise_default_sample,
+                                     renoise_default_modulation_set, renoise_default_sample,
+                                     renoise_default_modulation_set, renoise_instrument)
+                continue
 
-                # convert sample meta data in xml
+            # convert sample meta data in xml
+            with stats.timer('template.deepcopy'):
                 renoise_sample = deepcopy(renoise_default_sample)
                 renoise_modulation_set = deepcopy(renoise_default_modulation_set)
 
-                # force modulation set index to 0, but the sf2 modulation set remains easily enabled if needed by user
-                renoise_sample.ModulationSetIndex = 0
+            # force modulation set index to 0, but the sf2 modulation set remains easily enabled if needed by user
+            renoise_sample.ModulationSetIndex = 0
 
-                renoise_sample.FileName = None
+            renoise_sample.FileName = None
 
-                self.convert_section(section_name, section_content, renoise_sample, renoise_modulation_set,
-                                     renoise_default_sample, renoise_default_modulation_set, renoise_instrument)
+            self.convert_section(section_name, section_content, renoise_sample, renoise_modulation_set,
+                                 renoise_default_sample, renoise_default_modulation_set, renoise_instrument)
 
-                if renoise_sample.FileName:
-                    renoise_instrument.root.SampleGenerator.Samples.append(renoise_sample)
-                    renoise_instrument.root.SampleGenerator.ModulationSets.append(renoise_modulation_set)
+            if renoise_sample.FileName:
+                renoise_instrument.root.SampleGenerator.Samples.append(renoise_sample)
+                renoise_instrument.root.SampleGenerator.ModulationSets.append(renoise_modulation_set)
 
-                    # copy wav content from sfz to renoise
-                    sample_filename = search_case_insensitive_path(
-                        os.path.join(self.sfz_path, self.sfz_default_path, str(renoise_sample.FileName)))
+                # copy wav content from sfz to renoise
+                with stats.timer('sample.read'):
+                    sample_content = self.sample_resolver(
+                        os.path.join(self.sfz_default_path, str(renoise_sample.FileName)))
+                    if hasattr(sample_content, 'read'):
+                        sample_content = sample_content.read()
 
-                    if sample_filename is None:
-                        logging.info("missing sample file '%s'", renoise_sample.FileName)
-                    else:
-                        with open(sample_filename, 'rb') as sample_content:
-                            renoise_instrument.sample_data.append(encode_audio_file(sample_content.read(), self.encoding))
+                if sample_content is None:
+                    logging.info("missing sample file '%s'", renoise_sample.FileName)
+                else:
+                    if self.trim_silence is not None:
+                        sample_content = analysis.trim_silence(sample_content, renoise_sample, self.trim_silence)
+                    if self.sample_rate or self.bit_depth:
+                        sample_content = resample.reduce_wav(sample_content, renoise_sample, self.sample_rate,
+                                                             self.bit_depth)
+                    renoise_instrument.sample_data.append(encode_audio_file(sample_content, self.encoding))
 
-                section_idx += 1
+            section_idx += 1
 
+    @stats.timed('sfz.parse')
     def parse_sfz(self, sfz):
 
         match_section = re.compile('^<(.*)>$')
@@ -188,21 +262,18 @@ class SfzToXrni(object):
     def to_renoise_time(self, envelope_attenuation):
         return math.pow(envelope_attenuation / 60., 1 / 3.) if envelope_attenuation else None
 
+    @stats.timed('convert.section')
     def convert_section(self, section_name, section_content, renoise_sample, renoise_modulation_set,
                         renoise_default_sample, renoise_default_modulation_set, renoise_instrument):
+        from rnsutils.instrument import RenoiseInstrument, second_to_renoise_time, db_to_renoise_volume
 
         unused_keys = []
 
         for key in section_content.keys():
             value = section_content[key].lower()
             if key == 'sample':
-                renoise_sample.FileName = re.sub(r'\\+', r'/', value)
-
-                # remove first char if file separator
-                if renoise_sample.FileName.pyval[0] in (r'/', r'\\'):
-                    renoise_sample.FileName = renoise_sample.FileName.pyval[1:]
-
-                renoise_sample.Name, _ = os.path.splitext(os.path.basename(renoise_sample.FileName.pyval))
+                renoise_sample.FileName = normalize_sfz_path(value)
+                renoise_sample.Name, _ = os.path.splitext(os.path.basename(renoise_sample.FileName.text))
             elif key == 'lokey':
                 renoise_sample.Mapping.NoteStart = sfz_note_to_midi_key(value)
             elif key == 'hikey':
@@ -272,17 +343,12 @@ class SfzToXrni(object):
             elif key == 'off_by':
                 logging.info("Ignoring mute group info")
             elif key == 'default_path':
-                self.sfz_default_path = re.sub(r'\\+', r'/', value)
-
-                # remove first char if file separator
-                if self.sfz_default_path[0] in (r'/', r'\\'):
-                    self.sfz_default_path = self.sfz_default_path[1:]
-
+                self.sfz_default_path = normalize_sfz_path(value)
             else:
                 unused_keys.append(key)
 
         # disable loop when no loop duration was set
-        if renoise_sample.LoopStart.pyval is None or renoise_sample.LoopEnd.pyval is None:
+        if renoise_sample.LoopStart.text is None or renoise_sample.LoopEnd.text is None:
             renoise_sample.LoopMode = RenoiseInstrument.LOOP_NONE
 
         if unused_keys and self.show_unused:
@@ -291,6 +357,122 @@ class SfzToXrni(object):
                                                              "\n".join([" - " + k for k in unused_keys])))
 
 
+def sfz_sources(sfz_filename):
+    """:return filenames of :arg sfz_filename and the samples it references"""
+    return [sfz_filename] + SfzToXrni(sfz_path=os.path.dirname(sfz_filename)).sample_filenames(sfz_filename)
+
+
+def sources_work(sources, passes=1):
+    """:return samples and bytes of audio encoded when converting the SFZ file of :arg sources (see :func sfz_sources),
+    going :arg passes times through encoding (see :func rnsutils.utils.encoding_passes)"""
+    samples = sources[1:]
+    return {'samples': len(samples) * passes,
+            'bytes': sum(os.path.getsize(sample) for sample in samples if os.path.isfile(sample)) * passes}
+
+
+def file_work(sfz_filename, opts):
+    """:return work (see :mod rnsutils.progress) of converting :arg sfz_filename as requested by :arg opts"""
+    work = {'files': 1, 'instruments': 1}
+    # noinspection PyBroadException
+    try:
+        work.update(sources_work(sfz_sources(sfz_filename), encoding_passes(len(opts.encodings))))
+    except Exception:
+        logging.debug("Can't estimate the work of converting %s", sfz_filename, exc_info=True)
+    return work
+
+
+def convert_file(sfz_filename, opts):
+    """convert :arg sfz_filename as requested by :arg opts command line options"""
+    try:
+        _convert_file(sfz_filename, opts)
+    finally:
+        progress.advance(files=1, instruments=1)
+
+
+def _convert_file(sfz_filename, opts):
+    from rnsutils.fingerprint import conversion_fingerprint, is_up_to_date
+    from rnsutils.instrument import RenoiseInstrument
+
+    stats.file(sfz_filename)
+
+    if not opts.quiet:
+        print("Reading instrument from '{}'".format(sfz_filename))
+
+    # noinspection PyBroadException
+    try:
+        sfz_path = os.path.dirname(sfz_filename)
+        sfz_to_xrni = SfzToXrni(sfz_path=sfz_path, **vars(opts))
+
+        filename_without_extension, extension = os.path.splitext(os.path.basename(sfz_filename))
+        sources = sfz_sources(sfz_filename)
+
+        # one output per encoding, samples being encoded right away when there is only one
+        outputs = []
+        for encoding in opts.encodings:
+            output_filename = encoded_filename(os.path.join(opts.output_dir or sfz_path, '{}.xrni'.format(
+                filename_without_extension)), encoding, opts.encodings)
+            fingerprint = conversion_fingerprint(sources, opts.template,
+                                                 {'converter': 'sfztoxrni', 'encoding': encoding,
+                                                  'trim_silence': opts.trim_silence,
+                                                  'sample_rate': opts.sample_rate,
+                                                  'bit_depth': opts.bit_depth,
+                                                  'compact_xml': opts.compact_xml,
+                                                  'deterministic': opts.deterministic})
+            if journal.completed(fingerprint, output_filename):
+                if not opts.quiet:
+                    print("Already converted {}".format(output_filename))
+                continue
+            if not opts.rebuild and is_up_to_date(output_filename, fingerprint):
+                if not opts.quiet:
+                    print("Up to date {}".format(output_filename))
+                continue
+            outputs.append((encoding, output_filename, fingerprint))
+
+        # up to date outputs won't be encoded
+        progress.discard(**sources_work(sources, encoding_passes(len(opts.encodings)) - encoding_passes(len(outputs))))
+
+        if not outputs:
+            return
+
+        sfz_to_xrni.encoding = outputs[0][0] if len(outputs) == 1 else ENCODING_NONE
+        renoise_instrument = RenoiseInstrument(template_filename=opts.template)
+        renoise_instrument.fingerprint = outputs[0][2]
+        renoise_instrument.compact = opts.compact_xml
+        renoise_instrument.deterministic = opts.deterministic
+        if opts.stream and not renoise_instrument.stream(outputs[0][1], overwrite=opts.force):
+            progress.discard(**sources_work(sources))
+            if not opts.quiet:
+                print("Skipped {}".format(outputs[0][1]))
+            return
+
+        try:
+            sfz_to_xrni.convert_instrument(sfz_filename, renoise_instrument)
+            # saves refuse to overwrite existing outputs unless forced, forced ones leave unchanged outputs untouched
+            refused = [not opts.force and os.path.isfile(output_filename) for _, output_filename, _ in outputs]
+            if len(outputs) == 1:
+                written = [renoise_instrument.save(outputs[0][1], overwrite=opts.force, if_changed=True)]
+            else:
+                written = save_encoded(renoise_instrument, outputs, overwrite=opts.force, if_changed=True)
+        except Exception:
+            if renoise_instrument.streaming:
+                renoise_instrument.discard_stream()
+            raise
+
+        for _, output_filename, fingerprint in outputs:
+            journal.record(sfz_filename, None, fingerprint, output_filename)
+
+        if not opts.quiet:
+            for (_, output_filename, _), output_written, output_refused in zip(outputs, written, refused):
+                if output_refused:
+                    print("Skipped {} (exists)".format(output_filename))
+                else:
+                    print("{} {}".format("Saved" if output_written else "Unchanged", output_filename))
+    except Exception:
+        if not opts.quiet:
+            print("FAILED")
+        logging.exception("Failed to convert instrument")
+
+
 def main(argv=None):
     program_name = os.path.basename(sys.argv[0])
     program_version = "v0.9"
@@ -306,28 +488,51 @@ def main(argv=None):
     try:
         parser = argparse.ArgumentParser(epilog=program_longdesc,
                                          description=program_license)
+        parser.add_argument("--compact-xml", dest="compact_xml", action="store_true", default=False,
+                            help="save Instrument.xml without indentation [default: %(default)s]")
         parser.add_argument("-d", "--debug", dest="debug", action="store_true",
                             default=False,
                             help="debug parsing [default: %(default)s]")
-        parser.add_argument("-e", "--encode", dest="encoding", choices=[ENCODING_NONE, ENCODING_FLAC, ENCODING_OGG],
-                            default=ENCODING_FLAC, help="encode samples into given format [default: %(default)s]")
+        parser.add_argument("--deterministic", dest="deterministic", action="store_true", default=False,
+                            help="save byte reproducible instruments, with fixed timestamps and canonical "
+                                 "Instrument.xml [default: %(default)s]")
+        parser.add_argument("-e", "--encode", dest="encodings", type=encoding_list, default=[ENCODING_FLAC],
+                            help="encode samples into given formats among none, flac and ogg, comma separated, "
+                                 "writing one instrument per format [default: flac]")
         parser.add_argument("-f", "--force", dest="force", default=False, action="store_true",
                             help="force overwriting existing files [default: %(default)s]")
         parser.add_argument("-q", "--quiet", dest="quiet", action="store_true", default=False,
                             help="quiet operation [default: %(default)s]")
         parser.add_argument("-o", "--ouput-dir", dest="output_dir",
                             help="output directory [default: current directory]")
+        parser.add_argument("-r", "--rebuild", dest="rebuild", action="store_true", default=False,
+                            help="convert even if output is up to date [default: %(default)s]")
+        parser.add_argument("-s", "--stream", dest="stream", action="store_true", default=False,
+                            help="write samples to output as soon as converted to bound memory use "
+                                 "[default: %(default)s]")
         parser.add_argument("-t", dest="template", help="template filename [default: %(default)s]",
                             default="empty-31.xrni")
         parser.add_argument("-u", "--unused", dest="show_unused", action="store_true", default=True,
                             help="show unused generators [default: %(default)s]")
         parser.add_argument("--no-unused", dest="show_unused", action="store_false")
         parser.add_argument("-v", "--version", action="version", version=program_version_string)
+        analysis.add_arguments(parser)
+        resample.add_arguments(parser)
+        watch.add_arguments(parser)
+        journal.add_arguments(parser)
+        budget.add_arguments(parser)
+        progress.add_arguments(parser)
+        stats.add_arguments(parser)
 
-        parser.add_argument("sfz_filename", help="input file in SFZ format", nargs="+")
+        parser.add_argument("sfz_filename", help="input file in SFZ format", nargs="*")
 
         # process options
         opts = parser.parse_args(argv)
+        if not opts.sfz_filename and not opts.watch:
+            parser.error("no input file nor directory to watch given")
+        if opts.stream and len(opts.encodings) > 1:
+            parser.error("streaming only supports a single encoding")
+        journal.check_arguments(parser, opts)
 
     except Exception as e:
         indent = len(program_name) * " "
@@ -340,29 +545,30 @@ def main(argv=None):
     else:
         logging.root.setLevel(logging.INFO)
 
-    for sfz_filename in opts.sfz_filename:
-
-        if not opts.quiet:
-            print("Reading instrument from '{}'".format(sfz_filename))
+    if (opts.trim_silence is not None or opts.sample_rate or opts.bit_depth) and not analysis.available():
+        sys.stderr.write(program_name + ": trimming silence and reducing samples need numpy\n")
+        return 2
 
-        # noinspection PyBroadException
-        try:
-            sfz_path = os.path.dirname(sfz_filename)
-            sfz_to_xrni = SfzToXrni(sfz_path=sfz_path, **vars(opts))
+    encoding_error = encoders.check(opts.encodings)
+    if encoding_error:
+        sys.stderr.write(program_name + ": " + encoding_error + "\n")
+        return 2
 
-            renoise_instrument = RenoiseInstrument(template_filename=opts.template)
-            sfz_to_xrni.convert_instrument(sfz_filename, renoise_instrument)
+    with stats.session(opts), journal.session(opts), budget.session(opts), progress.session(opts):
+        if progress.enabled():
+            for sfz_filename in opts.sfz_filename:
+                progress.add_total(**file_work(sfz_filename, opts))
 
-            filename_without_extension, extension = os.path.splitext(os.path.basename(sfz_filename))
-            output_filename = os.path.join(opts.output_dir or sfz_path, '{}.xrni'.format(filename_without_extension))
-            renoise_instrument.save(output_filename, overwrite=opts.force)
+        for sfz_filename in opts.sfz_filename:
+            convert_file(sfz_filename, opts)
 
+        if opts.watch:
             if not opts.quiet:
-                print("Saved {}".format(output_filename))
-        except Exception:
-            if not opts.quiet:
-                print("FAILED")
-            logging.exception("Failed to convert instrument")
+                print("Watching '{}'".format(opts.watch))
+            # samples referenced by SFZ files are watched too
+            watch.watch(opts.watch, progress.tracked(partial(convert_file, opts=opts), partial(file_work, opts=opts)),
+                        ('.sfz',), dependencies=sfz_sources, settle=opts.watch_settle, interval=opts.watch_interval,
+                        workers=opts.watch_jobs)
 
     return 0
 
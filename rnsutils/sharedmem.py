@@ -0,0 +1,205 @@
+"""process pool exchanging sample payloads through shared memory instead of pickling them.
+
+Samples are copied once into shared memory segments and workers receive segment handles, reading samples in place.
+Workers return their results the same way, in segments created by them and released by the parent once read back::
+
+    with SharedMemoryPool(processes=4) as pool:
+        renoise_instrument.sample_data = pool.encode(renoise_instrument.sample_data, ENCODING_FLAC)
+
+Segments are released whether jobs succeed, fail or are interrupted. Workers are forked where possible so that they
+share the parent resource tracker, which releases segments left over by processes killed outright.
+
+Only encoding, which runs external encoders, is worth moving to other processes: zip (de)compression already runs on
+threads (see :mod rnsutils.ziputils) since zlib releases the GIL."""
+
+from collections import namedtuple
+
+from . import progress, stats
+from .ziputils import default_thread_count
+
+# shared memory segment :arg name holding :arg size bytes of payload, name being None for empty payloads
+SharedBuffer = namedtuple('SharedBuffer', ['name', 'size'])
+
+
+def _attach(name):
+    from multiprocessing.shared_memory import SharedMemory
+    return SharedMemory(name=name)
+
+
+def share(content):
+    """copy :arg content, bytes like, into a new shared memory segment, which the caller must release with
+    :func release
+    :return its SharedBuffer handle"""
+    from multiprocessing.shared_memory import SharedMemory
+
+    if not len(content):
+        return SharedBuffer(None, 0)
+
+    segment = SharedMemory(create=True, size=len(content))
+    try:
+        segment.buf[:len(content)] = content
+    except BaseException:
+        segment.close()
+        segment.unlink()
+        raise
+    segment.close()
+    return SharedBuffer(segment.name, len(content))
+
+
+def call_shared(func, shared_buffer, *args):
+    """:return :arg func(view, *args), view being a memoryview over the payload of :arg shared_buffer, only valid
+    during the call"""
+    if shared_buffer.name is None:
+        return func(memoryview(b''), *args)
+
+    segment = _attach(shared_buffer.name)
+    try:
+        view = segment.buf[:shared_buffer.size]
+        try:
+            return func(view, *args)
+        finally:
+            view.release()
+    finally:
+        segment.close()
+
+
+def read(shared_buffer):
+    """:return payload of :arg shared_buffer, as bytes"""
+    return call_shared(bytes, shared_buffer)
+
+
+def release(shared_buffer):
+    """free the segment of :arg shared_buffer, if not already freed"""
+    if shared_buffer is None or shared_buffer.name is None:
+        return
+    try:
+        segment = _attach(shared_buffer.name)
+    except FileNotFoundError:
+        return
+    segment.close()
+    segment.unlink()
+
+
+def _run_shared(func, shared_buffer, args):
+    """worker side of :meth SharedMemoryPool.map
+    :return SharedBuffer handle of the result, None if None"""
+    result = call_shared(func, shared_buffer, *args)
+    return None if result is None else share(result)
+
+
+def _encode(sample_view, encoding):
+    from .encoders import backend
+    return backend(encoding).encode(sample_view)
+
+
+class SharedMemoryPool(object):
+    """pool of :arg processes worker processes [default: all cores] exchanging payloads through shared memory"""
+
+    def __init__(self, processes=None):
+        self.processes = processes or default_thread_count()
+        self.executor = None
+
+    def __enter__(self):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import resource_tracker
+
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        if hasattr(resource_tracker, 'ensure_running'):
+            # started before forking workers for them to share it
+            resource_tracker.ensure_running()
+        self.executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=context)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.executor.shutdown(wait=exc_type is None, cancel_futures=True)
+        self.executor = None
+
+    def map(self, func, payloads, *args, on_result=None):
+        """ordered map of :arg func(view, *args) over :arg payloads, bytes like, in worker processes. view is a
+        memoryview over the payload, :arg func must be a module level function returning a bytes like result or None.
+        Under a memory budget (see :mod rnsutils.budget), payloads are only shared and submitted once they fit,
+        results being collected meanwhile.
+        :arg on_result called with the index of each payload once its result is back
+        :return list of results, as bytes"""
+        from concurrent.futures import wait
+
+        from . import budget
+
+        memory_budget = budget.current()
+        inputs = []
+        futures = []
+        # memory reserved for each submitted payload, given back once its result is read
+        reservations = []
+        results = []
+
+        def collect():
+            idx = len(results)
+            shared_buffer = futures[idx].result()
+            try:
+                results.append(None if shared_buffer is None else read(shared_buffer))
+            finally:
+                release(shared_buffer)
+            release(inputs[idx])
+            if memory_budget is not None:
+                memory_budget.release(reservations[idx])
+                reservations[idx] = 0
+            if on_result is not None:
+                on_result(idx)
+
+        try:
+            for payload in payloads:
+                if memory_budget is not None:
+                    size = budget.encode_cost(len(payload))
+                    # running jobs free memory as their results are collected
+                    while not memory_budget.try_acquire(size):
+                        if len(results) < len(futures):
+                            collect()
+                        else:
+                            memory_budget.acquire(size)
+                            break
+                    reservations.append(size)
+
+                with stats.timer('shm.share'):
+                    inputs.append(share(payload))
+                futures.append(self.executor.submit(_run_shared, func, inputs[-1], args))
+
+            while len(results) < len(futures):
+                collect()
+            return results
+        except BaseException:
+            # release results of the jobs which went on running, including the one being collected, their segments
+            # being owned by us
+            pending = futures[len(results):]
+            for future in pending:
+                future.cancel()
+            wait(pending)
+            for future in pending:
+                if not future.cancelled() and future.exception() is None:
+                    release(future.result())
+            raise
+        finally:
+            for shared_buffer in inputs:
+                release(shared_buffer)
+            if memory_budget is not None:
+                memory_budget.release(sum(reservations))
+
+    def encode(self, samples, encoding):
+        """:return :arg samples encoded into :arg encoding format, like :func rnsutils.utils.encode_audio_file"""
+        from .encoders import backend
+        from .utils import ENCODING_NONE
+
+        for sample in samples:
+            stats.count('samples')
+            stats.count('sample_bytes', len(sample))
+
+        if encoding == ENCODING_NONE:
+            progress.advance(samples=len(samples), bytes=sum(len(sample) for sample in samples))
+            return list(samples)
+        # fail before starting any job when the encoding has no backend
+        backend(encoding)
+
+        with stats.timer('encode.{}'.format(encoding)):
+            # workers don't account progress, the work they do is accounted here
+            return self.map(_encode, samples, encoding,
+                            on_result=lambda idx: progress.advance(samples=1, bytes=len(samples[idx])))
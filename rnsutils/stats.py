@@ -0,0 +1,234 @@
+"""lightweight stage timing, counters and profiling for the command line tools.
+
+Stages are timed with ``with timer('name'):`` blocks or the ``@timed('name')`` decorator, quantities are accumulated
+with ``count('name', value)`` and per item details are kept with ``record('kind', {...})``. Nothing is recorded unless
+a collection session is active (see :func session), in which case every measure is accounted both globally and for
+the input file being processed (see :func file), records being only kept with the file.
+Stages may nest (eg 'save' includes 'xml.serialize' and 'zip.write'), so their times do not add up. Peak values are
+kept globally with ``peak('name', value)``, the peak resident memory of the process and its children being always
+reported."""
+
+from __future__ import print_function
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+_collector = None
+
+
+class _NullTimer(object):
+    """timer used when collection is disabled, doing nothing as cheaply as possible"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer(object):
+    def __init__(self, collector, name):
+        self.collector = collector
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.collector.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def _peak_rss(children):
+    """:return peak resident memory in bytes of this process, or of its largest waited for child process if
+    :arg children, None where unknown"""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    import sys
+
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes, but on macOS
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+class StatsCollector(object):
+    """accumulate stage times and counters, globally and per input file"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.elapsed = None
+        self.total = self._new_record()
+        self.files = OrderedDict()
+        self.current_file = None
+        self.peaks = OrderedDict()
+        # samples are encoded on several threads, each accounting its measures
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_record():
+        return {'stages': OrderedDict(), 'counters': OrderedDict(), 'records': OrderedDict()}
+
+    def _records(self):
+        if self.current_file is None:
+            return self.total,
+        return self.total, self.files[self.current_file]
+
+    def add_time(self, name, duration):
+        with self._lock:
+            for record in self._records():
+                calls, total = record['stages'].get(name, (0, 0.))
+                record['stages'][name] = (calls + 1, total + duration)
+
+    def add_count(self, name, value):
+        with self._lock:
+            for record in self._records():
+                record['counters'][name] = record['counters'].get(name, 0) + value
+
+    def add_record(self, kind, entry):
+        with self._lock:
+            # only kept once, with the current file if any
+            self._records()[-1]['records'].setdefault(kind, []).append(entry)
+
+    def add_peak(self, name, value):
+        with self._lock:
+            self.peaks[name] = max(self.peaks.get(name, value), value)
+
+    def enter_file(self, filename):
+        with self._lock:
+            self.files.setdefault(filename, self._new_record())
+            self.current_file = filename
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self.start
+        for name, peak_rss in (('memory.peak_rss', _peak_rss(False)),
+                                ('memory.peak_rss_children', _peak_rss(True))):
+            if peak_rss:
+                self.add_peak(name, peak_rss)
+
+    def as_dict(self):
+        """:return machine readable breakdown of the collected measures"""
+
+        def record_dict(record):
+            return {'stages': OrderedDict((name, {'calls': calls, 'time': total}) for name, (calls, total) in
+                                          record['stages'].items()),
+                    'counters': record['counters'], 'records': record['records']}
+
+        return {'elapsed': self.elapsed, 'total': record_dict(self.total), 'peaks': self.peaks,
+                'files': OrderedDict((filename, record_dict(record)) for filename, record in self.files.items())}
+
+    def summary(self):
+        """:return human readable summary of the collected measures"""
+        lines = ["{:<28} {:>8} {:>10} {:>6}".format("stage", "calls", "time (s)", "%")]
+        for name, (calls, total) in sorted(self.total['stages'].items(), key=lambda item: -item[1][1]):
+            lines.append("{:<28} {:>8} {:>10.3f} {:>6.1f}".format(name, calls, total,
+                                                                  100. * total / self.elapsed if self.elapsed else 0))
+        for name, value in self.total['counters'].items():
+            lines.append("{:<28} {:>8}".format(name, value))
+        for name, value in self.peaks.items():
+            lines.append("{:<28} {:>8} {:>10.1f} MiB".format(name, "", value / 1048576.))
+        lines.append("{:<28} {:>8} {:>10.3f}".format("total ({} file(s))".format(len(self.files)), "",
+                                                     self.elapsed))
+        return "\n".join(lines)
+
+
+def timer(name):
+    """:return context manager timing the enclosed block as stage :arg name"""
+    if _collector is None:
+        return _NULL_TIMER
+    return _Timer(_collector, name)
+
+
+def timed(name):
+    """decorator timing every call of the decorated function as stage :arg name"""
+
+    def decorator(func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            if _collector is None:
+                return func(*args, **kwargs)
+            with _Timer(_collector, name):
+                return func(*args, **kwargs)
+
+        return inner
+
+    return decorator
+
+
+def count(name, value=1):
+    """add :arg value to counter :arg name"""
+    if _collector is not None:
+        _collector.add_count(name, value)
+
+
+def record(kind, entry):
+    """keep :arg entry, a json serializable dict, among :arg kind records"""
+    if _collector is not None:
+        _collector.add_record(kind, entry)
+
+
+def peak(name, value):
+    """keep the largest of :arg value and previous values of peak :arg name"""
+    if _collector is not None:
+        _collector.add_peak(name, value)
+
+
+def file(filename):
+    """account the following measures to input :arg filename"""
+    if _collector is not None:
+        _collector.enter_file(filename)
+
+
+def add_arguments(parser):
+    """add --stats, --stats-json and --profile options to argparse :arg parser"""
+    parser.add_argument("--stats", dest="stats", action="store_true", default=False,
+                        help="print time spent per stage when done [default: %(default)s]")
+    parser.add_argument("--stats-json", dest="stats_json", metavar="FILE",
+                        help="write time spent per file and stage into FILE as json")
+    parser.add_argument("--profile", dest="profile", metavar="FILE",
+                        help="profile the run and dump the result into FILE (to be read with pstats)")
+
+
+@contextmanager
+def session(opts):
+    """collect measures, as requested by :arg opts command line options (see :func add_arguments), during the
+    enclosed block and report them when it exits"""
+    global _collector
+
+    collector = StatsCollector() if opts.stats or opts.stats_json else None
+    profiler = None
+    if opts.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+
+    _collector = collector
+    if profiler:
+        profiler.enable()
+    try:
+        yield collector
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(opts.profile)
+        _collector = None
+
+        if collector:
+            collector.stop()
+            if opts.stats:
+                print(collector.summary())
+            if opts.stats_json:
+                import io
+                import json
+
+                with io.open(opts.stats_json, 'w') as stats_file:
+                    stats_file.write(json.dumps(collector.as_dict(), indent=2))
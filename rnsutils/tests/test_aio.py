@@ -0,0 +1,59 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from rnsutils import aio, corpus
+from rnsutils.encoders import SoundFileEncoder
+from rnsutils.utils import ENCODING_FLAC, ENCODING_NONE
+from sf2utils.sf2parse import Sf2File
+
+
+class TestAio(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        shutil.rmtree(self.output_dir)
+
+    def test_convert_and_save(self):
+        sf2_filename = os.path.join(self.output_dir, 'synthetic.sf2')
+        corpus.write_sf2(sf2_filename, bags=3, instruments=3)
+
+        async def convert(sf2):
+            instruments = await asyncio.gather(
+                *(aio.convert_sf2_instrument(sf2_instrument, encoding=ENCODING_NONE, limiter=asyncio.Semaphore(2))
+                  for sf2_instrument in sf2.instruments if not sf2_instrument.is_sentinel()))
+            await asyncio.gather(*(aio.save_instrument(instrument, os.path.join(self.output_dir, '{}.xrni'.format(idx)))
+                                   for idx, instrument in enumerate(instruments)))
+            return await aio.load_instrument(os.path.join(self.output_dir, '2.xrni'))
+
+        with open(sf2_filename, 'rb') as sf2_file:
+            instrument = self.loop.run_until_complete(convert(Sf2File(sf2_file)))
+
+        self.assertEqual('instrument 2', instrument.name)
+        self.assertEqual(3, len(instrument.sample_data))
+
+    def test_encode(self):
+        sample = corpus.synthetic_wav(100)
+
+        self.assertIs(sample, self.loop.run_until_complete(aio.encode_audio_file_async(sample, ENCODING_NONE)))
+
+        # stand in for flac, which may not be installed
+        with mock.patch.dict(aio.ENCODER_COMMANDS, {ENCODING_FLAC: lambda in_filename, out_filename: [
+                'cp', in_filename, out_filename]}), \
+                mock.patch.object(SoundFileEncoder, 'available', return_value=False):
+            self.assertEqual(sample, self.loop.run_until_complete(aio.encode_audio_file_async(sample, ENCODING_FLAC)))
+
+    def test_encode_failure(self):
+        with mock.patch.dict(aio.ENCODER_COMMANDS, {ENCODING_FLAC: lambda in_filename, out_filename: [
+                'sh', '-c', 'echo broken; exit 3']}), \
+                mock.patch.object(SoundFileEncoder, 'available', return_value=False):
+            with self.assertRaisesRegex(RuntimeError, 'sh failed with status 3: broken'):
+                self.loop.run_until_complete(aio.encode_audio_file_async(corpus.synthetic_wav(100), ENCODING_FLAC))
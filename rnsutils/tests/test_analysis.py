@@ -0,0 +1,89 @@
+import argparse
+import io
+import unittest
+import wave
+from copy import deepcopy
+
+from rnsutils import analysis, corpus, stats
+from rnsutils.instrument import RenoiseInstrument
+
+
+def padded_wav(frames, leading, trailing, channels=1, sample_width=2):
+    """:return wav content of :arg frames synthetic frames between :arg leading and :arg trailing silent frames"""
+    silence = (b'\x80' if sample_width == 1 else b'\0') * channels * sample_width
+    content = io.BytesIO()
+    with wave.open(content, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(sample_width)
+        wav_file.setframerate(corpus.SAMPLE_RATE)
+        wav_file.writeframes(silence * leading + corpus.synthetic_frames(frames, channels=channels,
+                                                                          sample_width=sample_width)
+                             + silence * trailing)
+    return content.getvalue()
+
+
+@unittest.skipUnless(analysis.available(), "numpy is not installed")
+class TestAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.renoise_sample = deepcopy(RenoiseInstrument().sample_template)
+        self.renoise_sample.LoopMode = "Off"
+
+    def test_analyse(self):
+        for sample_width in (1, 2, 3, 4):
+            sample_analysis = analysis.analyse(padded_wav(1000, 100, 50, channels=2, sample_width=sample_width))
+
+            self.assertEqual((1150, 2, 100, 1100), (sample_analysis.frames, sample_analysis.channels,
+                                                    sample_analysis.start, sample_analysis.end))
+            # synthetic samples are sines of 0.4 full scale amplitude
+            self.assertAlmostEqual(-8, sample_analysis.peak, delta=0.2)
+            self.assertAlmostEqual(-11.7, sample_analysis.rms, delta=0.2)
+
+        silent_analysis = analysis.analyse(padded_wav(0, 60, 40))
+        self.assertEqual((0, 100, None, None), (silent_analysis.start, silent_analysis.end, silent_analysis.peak,
+                                                silent_analysis.rms))
+        self.assertIsNone(analysis.analyse(b'fLaC\0\0\0\x22'))
+
+    def test_trim_silence(self):
+        self.renoise_sample.LoopStart = 0
+        self.renoise_sample.LoopEnd = 1150
+
+        trimmed_analysis = analysis.analyse(analysis.trim_silence(padded_wav(1000, 100, 50, sample_width=3),
+                                                                  self.renoise_sample))
+
+        self.assertEqual((1000, 0, 1000), (trimmed_analysis.frames, trimmed_analysis.start, trimmed_analysis.end))
+        self.assertEqual((0, 1000), (self.renoise_sample.LoopStart, self.renoise_sample.LoopEnd))
+
+    def test_trim_silence_keeps_loop(self):
+        self.renoise_sample.LoopMode = "Forward"
+        self.renoise_sample.LoopStart = 50
+        self.renoise_sample.LoopEnd = 1120
+
+        trimmed_analysis = analysis.analyse(analysis.trim_silence(padded_wav(1000, 100, 50), self.renoise_sample))
+
+        self.assertEqual(1070, trimmed_analysis.frames)
+        self.assertEqual((0, 1070), (self.renoise_sample.LoopStart, self.renoise_sample.LoopEnd))
+
+    def test_untouched(self):
+        sample = padded_wav(1000, 0, 0)
+        self.assertIs(sample, analysis.trim_silence(sample, self.renoise_sample))
+
+        silent_sample = padded_wav(0, 100, 0)
+        self.assertIs(silent_sample, analysis.trim_silence(silent_sample, self.renoise_sample))
+
+    def test_stats(self):
+        self.renoise_sample.Name = 'padded'
+        sample = padded_wav(1000, 100, 50)
+        sample_analysis = analysis.analyse(sample)
+        with stats.session(argparse.Namespace(stats=False, stats_json='/dev/null', profile=None)) as collector:
+            stats.file('padded.sf2')
+            analysis.trim_silence(sample, self.renoise_sample)
+
+        self.assertEqual(150, collector.files['padded.sf2']['counters']['trimmed_frames'])
+        self.assertEqual([{'name': 'padded', 'frames': 1150, 'channels': 1, 'peak': sample_analysis.peak,
+                           'rms': sample_analysis.rms,
+                           'trimmed_start': 100, 'trimmed_end': 50}],
+                         collector.files['padded.sf2']['records']['sample_analysis'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from rnsutils import budget, corpus, utils, xrnireencode
+from rnsutils.budget import MemoryBudget
+from rnsutils.encoders import SoundFileEncoder
+from rnsutils.sharedmem import SharedMemoryPool
+from rnsutils.utils import ENCODER_COMMANDS, ENCODING_FLAC
+
+
+def _copy(view):
+    return bytes(view)
+
+
+class ConcurrencyRecorder(object):
+    """stand in encoder backend recording how many encodings run at once"""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def encode(self, sample_content):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(.01)
+        with self.lock:
+            self.running -= 1
+        return sample_content
+
+
+class TestBudget(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.samples = [corpus.synthetic_wav(1000, seed) for seed in range(6)]
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_memory_size(self):
+        self.assertEqual((512, 1536, 512 << 20), tuple(budget.memory_size(value) for value in ('512', '1.5k', '512M')))
+        for value in ('lots', '0'):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                budget.memory_size(value)
+
+    def test_admission(self):
+        memory_budget = MemoryBudget(100)
+        self.assertTrue(memory_budget.try_acquire(60))
+        self.assertFalse(memory_budget.try_acquire(60))
+
+        # blocks until enough memory is given back
+        acquired = threading.Event()
+        thread = threading.Thread(target=lambda: (memory_budget.acquire(60), acquired.set()))
+        thread.start()
+        self.assertFalse(acquired.wait(.05))
+        memory_budget.release(60)
+        thread.join(10)
+        self.assertTrue(acquired.is_set())
+        memory_budget.release(60)
+
+        # what exceeds the budget runs alone
+        self.assertTrue(memory_budget.try_acquire(1000))
+        self.assertFalse(memory_budget.try_acquire(1))
+        memory_budget.release(1000)
+        self.assertEqual((0, 1000), (memory_budget.reserved, memory_budget.peak))
+
+    def test_encode_samples(self):
+        encoder = ConcurrencyRecorder()
+        with mock.patch('rnsutils.encoders.backend', return_value=encoder):
+            # room for two samples at once
+            with budget.session(mock.Mock(max_memory=2 * budget.encode_cost(len(self.samples[0])))) \
+                    as memory_budget:
+                self.assertEqual({ENCODING_FLAC: self.samples},
+                                 utils.encode_samples(self.samples, [ENCODING_FLAC], threads=4))
+
+        self.assertLessEqual(encoder.max_running, 2)
+        self.assertEqual((0, 2 * budget.encode_cost(len(self.samples[0]))),
+                         (memory_budget.reserved, memory_budget.peak))
+
+    def test_shared_memory_pool(self):
+        with SharedMemoryPool(processes=2) as pool, \
+                budget.session(mock.Mock(max_memory=budget.encode_cost(len(self.samples[0])))) as memory_budget:
+            self.assertEqual(self.samples, pool.map(_copy, self.samples))
+        self.assertEqual((0, budget.encode_cost(len(self.samples[0]))), (memory_budget.reserved, memory_budget.peak))
+
+    @mock.patch.dict(ENCODER_COMMANDS, {ENCODING_FLAC: lambda in_filename, out_filename: [
+        'cp', in_filename, out_filename]})
+    @mock.patch.object(SoundFileEncoder, 'available', return_value=False)
+    def test_report(self, _):
+        xrni_filename = os.path.join(self.output_dir, 'synthetic.xrni')
+        stats_filename = os.path.join(self.output_dir, 'stats.json')
+        corpus.write_xrni(xrni_filename, 3, frames=1000)
+
+        self.assertEqual(0, xrnireencode.main(['-q', '-j', '2', '--max-memory', '10k', '--stats-json', stats_filename,
+                                               xrni_filename]))
+
+        with open(stats_filename) as stats_file:
+            peaks = json.load(stats_file)['peaks']
+        self.assertLessEqual(peaks['memory.peak_reserved'], 10240)
+        self.assertGreater(peaks['memory.peak_rss'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from rnsutils import cli, corpus
+from rnsutils.instrument import RenoiseInstrument
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_usage(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(0, cli.main(['--help']))
+        for command in cli.COMMANDS:
+            self.assertIn(command, output.getvalue())
+
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(2, cli.main(['unknown']))
+
+    def test_dispatch(self):
+        filename = os.path.join(self.output_dir, 'synthetic.xrni')
+        corpus.write_xrni(filename, 2, frames=10)
+
+        self.assertEqual(0, cli.main(['xrnitag', '-a', 'drums', filename]))
+
+        self.assertEqual('drums', RenoiseInstrument(filename).tags[0])
+
+    def test_lazy_imports(self):
+        # starting any command must not load what only processing files needs
+        code = "import sys, rnsutils.cli\n" \
+               "for module_name, _ in rnsutils.cli.COMMANDS.values(): __import__(module_name)\n" \
+               "print(' '.join(name for name in ('lxml', 'sf2utils.sf2parse', 'zipfile') if name in sys.modules))"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        self.assertEqual('', subprocess.check_output([sys.executable, '-c', code], env=env,
+                                                     universal_newlines=True).strip())
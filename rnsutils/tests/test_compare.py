@@ -0,0 +1,112 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from rnsutils import compare, corpus, sf2toxrni, sfztoxrni, xrnidiff, xrnitag
+from rnsutils.compare import Difference, KIND_MAPPING, KIND_METADATA, KIND_SAMPLE
+from rnsutils.instrument import RenoiseInstrument
+
+
+class TestCompare(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.xrni_filename = os.path.join(self.output_dir, 'synthetic.xrni')
+        corpus.write_xrni(self.xrni_filename, 3, frames=100)
+        # back in time, so that any write shows
+        os.utime(self.xrni_filename, (0, 0))
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def assertUntouched(self, untouched=True):
+        self.assertEqual(untouched, os.stat(self.xrni_filename).st_mtime == 0)
+
+    def test_save_if_changed(self):
+        instrument = RenoiseInstrument(self.xrni_filename)
+        self.assertFalse(instrument.save(self.xrni_filename, overwrite=True, if_changed=True))
+        self.assertUntouched()
+
+        # streamed instruments are compared once written
+        streamed = RenoiseInstrument(self.xrni_filename)
+        sample_data, streamed.sample_data = streamed.sample_data, []
+        self.assertTrue(streamed.stream(self.xrni_filename, overwrite=True))
+        for sample in sample_data:
+            streamed.sample_data.append(sample)
+        self.assertFalse(streamed.save(self.xrni_filename, if_changed=True))
+        self.assertUntouched()
+        self.assertEqual(['synthetic.xrni'], os.listdir(self.output_dir))
+
+        instrument.sample_data[1] = instrument.sample_data[1][:-2] + b'\x00\x01'
+        self.assertTrue(instrument.save(self.xrni_filename, overwrite=True, if_changed=True))
+        self.assertUntouched(False)
+
+    def test_xrnitag(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(0, xrnitag.main(['-a', 'piano', self.xrni_filename]))
+            self.assertUntouched(False)
+
+            os.utime(self.xrni_filename, (0, 0))
+            self.assertEqual(0, xrnitag.main(['-r', 'missing', self.xrni_filename]))
+            self.assertUntouched()
+
+    def test_conversion_reports(self):
+        sf2_filename = os.path.join(self.output_dir, 'synthetic.sf2')
+        corpus.write_sf2(sf2_filename, bags=2, instruments=1)
+        sfz_filename = corpus.write_sfz(self.output_dir, regions=2, frames=100, sfz_name='converted.sfz')
+
+        def convert(main, argv):
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                self.assertEqual(0, main(['--no-unused', '-e', 'none'] + argv))
+            return output.getvalue()
+
+        for main, argv, output_filename, reports in (
+                (sf2toxrni.main, ['-o', self.output_dir, sf2_filename], '0_instrument 0.xrni',
+                 (" saved {} (unchanged)", " skipped {} (exists)")),
+                (sfztoxrni.main, [sfz_filename], os.path.splitext(sfz_filename)[0] + '.xrni',
+                 ("Unchanged {}", "Skipped {} (exists)"))):
+            output_filename = os.path.join(self.output_dir, output_filename)
+            convert(main, argv)
+            self.assertIn(reports[0].format(output_filename), convert(main, ['-f', '-r'] + argv))
+
+            # a changed conversion refused to overwrite the output isn't reported as unchanged
+            with self.assertLogs(level='ERROR'):
+                self.assertIn(reports[1].format(output_filename), convert(main, ['--compact-xml'] + argv))
+
+    def test_differences(self):
+        other_filename = os.path.join(self.output_dir, 'other.xrni')
+        instrument = RenoiseInstrument(self.xrni_filename)
+        instrument.root.Name = 'other'
+        instrument.root.SampleGenerator.Samples.Sample[1].Mapping.BaseNote = 61
+        instrument.sample_data[2] = instrument.sample_data[2][:-2] + b'\x00\x01'
+        instrument.save(other_filename, cleanup=False)
+
+        first, second = compare.describe_file(self.xrni_filename), compare.describe_file(other_filename)
+        self.assertEqual([Difference(KIND_METADATA, None, 'Name', 'basic', 'other'),
+                          Difference(KIND_MAPPING, 1, 'BaseNote', '48', '61'),
+                          Difference(KIND_SAMPLE, 2, 'data', first.samples[2][1], second.samples[2][1])],
+                         compare.differences(first, second))
+        self.assertEqual("sample 1 mapping BaseNote: '48' -> '61'",
+                         compare.format_difference(compare.differences(first, second)[1]))
+
+        # removed samples show
+        del instrument.sample_data[2]
+        instrument.root.SampleGenerator.Samples.remove(instrument.root.SampleGenerator.Samples.Sample[2])
+        self.assertEqual([(KIND_SAMPLE, 2, ''), (KIND_SAMPLE, 2, 'data')],
+                         [(difference.kind, difference.sample, difference.path) for difference in
+                          compare.differences(second, compare.describe_instrument(instrument))
+                          if difference.second is None])
+
+        report_filename = os.path.join(self.output_dir, 'report.json')
+        self.assertEqual(0, xrnidiff.main(['-q', self.xrni_filename, self.xrni_filename]))
+        self.assertEqual(1, xrnidiff.main(['-q', '--json', report_filename, self.xrni_filename, other_filename]))
+        with open(report_filename) as report_file:
+            self.assertEqual(['metadata', 'mapping', 'sample'], [difference['kind'] for difference in
+                                                                 json.load(report_file)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from rnsutils import compare, convert, corpus
+from rnsutils.instrument import RenoiseInstrument
+from rnsutils.utils import ENCODING_NONE
+
+
+class TestConvert(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+        sf2_filename = os.path.join(self.output_dir, 'synthetic.sf2')
+        corpus.write_sf2(sf2_filename, bags=4, instruments=2)
+        with open(sf2_filename, 'rb') as sf2_file:
+            self.sf2 = sf2_file.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_convert_sf2(self):
+        # neither temporary nor output files are written
+        with mock.patch('os.rename') as rename, mock.patch('tempfile.mkstemp') as mkstemp:
+            xrni = convert.convert_sf2(self.sf2, instrument_index=1)
+        rename.assert_not_called()
+        mkstemp.assert_not_called()
+
+        instrument = RenoiseInstrument(io.BytesIO(xrni))
+        self.assertEqual('instrument 1', instrument.name)
+        self.assertEqual(4, len(instrument.sample_data))
+
+        output = io.BytesIO()
+        self.assertIsNone(convert.convert_sf2(io.BytesIO(self.sf2), instrument_index=1, output=output))
+        # zip entries are timestamped, archives of the same instrument may differ byte wise
+        self.assertTrue(compare.same_files(io.BytesIO(xrni), io.BytesIO(output.getvalue())))
+
+        # the sentinel instrument can't be converted
+        with self.assertRaises(IndexError):
+            convert.convert_sf2(self.sf2, instrument_index=2)
+
+    def test_convert_sfz(self):
+        samples = {os.path.join('samples', corpus.sfz_sample_filename(sample_idx).lower()): corpus.synthetic_wav(
+            100, sample_idx) for sample_idx in range(2)}
+        sfz = ''.join(corpus.sfz_lines(regions=3, samples=2)).encode('utf-8')
+
+        xrni = convert.convert_sfz(sfz, samples.get, sfz_name='synthetic.sfz')
+
+        instrument = RenoiseInstrument(io.BytesIO(xrni))
+        self.assertEqual('synthetic.sfz', instrument.name)
+        self.assertEqual([samples[os.path.join('samples', corpus.sfz_sample_filename(region_idx % 2).lower())]
+                          for region_idx in range(3)], instrument.sample_data)
+
+    def test_reencode_xrni(self):
+        xrni = corpus.synthetic_instrument(samples=2).to_bytes()
+
+        output = io.BytesIO()
+        convert.reencode_xrni(xrni, ENCODING_NONE, output=output)
+
+        self.assertEqual(RenoiseInstrument(io.BytesIO(xrni)).sample_data,
+                         RenoiseInstrument(io.BytesIO(output.getvalue())).sample_data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+import wave
+
+from rnsutils import corpus, sf2toxrni, sfztoxrni
+from rnsutils.instrument import RenoiseInstrument
+
+
+class TestCorpus(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_deterministic(self):
+        first_filename = os.path.join(self.output_dir, 'first.sf2')
+        second_filename = os.path.join(self.output_dir, 'second.sf2')
+        corpus.write_sf2(first_filename, bags=4, instruments=2)
+        corpus.write_sf2(second_filename, bags=4, instruments=2)
+
+        with open(first_filename, 'rb') as first, open(second_filename, 'rb') as second:
+            self.assertEqual(first.read(), second.read())
+
+        self.assertEqual(corpus.synthetic_wav(1000, seed=3), corpus.synthetic_wav(1000, seed=3))
+        self.assertNotEqual(corpus.synthetic_wav(1000, seed=3), corpus.synthetic_wav(1000, seed=4))
+
+    def test_wav_formats(self):
+        for sample_width in (1, 2, 3):
+            filename = os.path.join(self.output_dir, 'sample.wav')
+            with open(filename, 'wb') as sample_file:
+                sample_file.write(corpus.synthetic_wav(5000, channels=2, sample_width=sample_width))
+
+            wav = wave.open(filename)
+            self.assertEqual((2, sample_width, 5000), (wav.getnchannels(), wav.getsampwidth(), wav.getnframes()))
+            wav.close()
+
+    def test_convert_sf2(self):
+        sf2_filename = os.path.join(self.output_dir, 'synthetic.sf2')
+        corpus.write_sf2(sf2_filename, bags=5, instruments=3, samples=4)
+
+        sf2toxrni.main(['-q', '--no-unused', '-e', 'none', '-o', self.output_dir, sf2_filename])
+
+        for instrument_idx in range(3):
+            instrument = RenoiseInstrument(
+                os.path.join(self.output_dir, '{0}_instrument {0}.xrni'.format(instrument_idx)))
+            self.assertEqual(5, len(instrument.sample_data))
+
+    def test_convert_sfz(self):
+        sfz_filename = corpus.write_sfz(self.output_dir, regions=6, samples=3)
+
+        sfztoxrni.main(['-q', '--no-unused', '-e', 'none', sfz_filename])
+
+        instrument = RenoiseInstrument(os.path.join(self.output_dir, 'synthetic.xrni'))
+        self.assertEqual(6, len(instrument.sample_data))
+        self.assertEqual(instrument.sample_data[0], instrument.sample_data[3])
@@ -0,0 +1,70 @@
+import argparse
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from rnsutils import corpus, sf2toxrni, sfztoxrni, utils
+from rnsutils.encoders import SoundFileEncoder
+from rnsutils.fingerprint import read_fingerprint
+from rnsutils.instrument import RenoiseInstrument
+from rnsutils.utils import ENCODER_COMMANDS, ENCODING_FLAC, ENCODING_NONE, ENCODING_OGG
+
+
+def fake_encoder(in_filename, out_filename):
+    """stand in for flac and oggenc, which may not be installed"""
+    return ['cp', in_filename, out_filename]
+
+
+@mock.patch.dict(ENCODER_COMMANDS, {ENCODING_FLAC: fake_encoder, ENCODING_OGG: fake_encoder})
+@mock.patch.object(SoundFileEncoder, 'available', return_value=False)
+class TestEncode(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_encoding_list(self, _):
+        self.assertEqual([ENCODING_FLAC, ENCODING_OGG], utils.encoding_list('flac,ogg,flac'))
+        with self.assertRaises(argparse.ArgumentTypeError):
+            utils.encoding_list('flac,mp3')
+
+    def test_encode_samples(self, _):
+        samples = [corpus.synthetic_wav(100, seed) for seed in range(3)]
+
+        encoded_samples = utils.encode_samples(samples, [ENCODING_NONE, ENCODING_FLAC], threads=2)
+
+        self.assertEqual({ENCODING_NONE: samples, ENCODING_FLAC: samples}, encoded_samples)
+
+    def test_sf2toxrni(self, _):
+        sf2_filename = os.path.join(self.output_dir, 'synthetic.sf2')
+        corpus.write_sf2(sf2_filename, bags=3)
+
+        with mock.patch.object(sf2toxrni.Sf2ToXrni, 'convert_instrument',
+                               autospec=True, side_effect=sf2toxrni.Sf2ToXrni.convert_instrument) as convert:
+            self.assertEqual(0, sf2toxrni.main(['-q', '--no-unused', '-e', 'none,flac,ogg', '-o', self.output_dir,
+                                                sf2_filename]))
+        # the instrument is converted once for all formats
+        self.assertEqual(1, convert.call_count)
+
+        fingerprints = set()
+        for encoding in (ENCODING_NONE, ENCODING_FLAC, ENCODING_OGG):
+            output_filename = os.path.join(self.output_dir, '0_instrument 0.{}.xrni'.format(encoding))
+            self.assertEqual(3, len(RenoiseInstrument(output_filename).sample_data))
+            fingerprints.add(read_fingerprint(output_filename))
+        # each output is fingerprinted with its own encoding
+        self.assertEqual(3, len(fingerprints - {None}))
+
+    def test_sfztoxrni(self, _):
+        sfz_filename = corpus.write_sfz(self.output_dir, regions=2, frames=100)
+
+        self.assertEqual(0, sfztoxrni.main(['-q', '-e', 'flac,ogg', sfz_filename]))
+
+        for encoding in (ENCODING_FLAC, ENCODING_OGG):
+            self.assertTrue(os.path.isfile(os.path.join(self.output_dir, 'synthetic.{}.xrni'.format(encoding))))
+
+
+if __name__ == '__main__':
+    unittest.main()
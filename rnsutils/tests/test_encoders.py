@@ -0,0 +1,62 @@
+import io
+import unittest
+from unittest import mock
+
+from rnsutils import corpus, encoders
+from rnsutils.encoders import ExternalEncoder, SoundFileEncoder
+from rnsutils.utils import ENCODER_COMMANDS, ENCODING_FLAC, ENCODING_NONE, ENCODING_OGG, encode_audio_file, \
+    guesstimate_audio_extension
+
+
+def missing_encoder(in_filename, out_filename):
+    return ['rnsutils-missing-encoder', in_filename, out_filename]
+
+
+class TestEncoders(unittest.TestCase):
+    @unittest.skipUnless(SoundFileEncoder(ENCODING_FLAC, 'FLAC').available(), "soundfile is not installed")
+    def test_soundfile(self):
+        import soundfile
+
+        self.assertIsInstance(encoders.backend(ENCODING_FLAC), SoundFileEncoder)
+
+        for sample_width in (1, 2, 3):
+            wav = corpus.synthetic_wav(1000, channels=2, sample_width=sample_width)
+            flac = encode_audio_file(wav, ENCODING_FLAC)
+
+            self.assertEqual('flac', guesstimate_audio_extension(flac))
+            # lossless
+            self.assertEqual(soundfile.read(io.BytesIO(wav), dtype='int32')[0].tolist(),
+                             soundfile.read(io.BytesIO(flac), dtype='int32')[0].tolist())
+
+        self.assertEqual('ogg', guesstimate_audio_extension(encode_audio_file(corpus.synthetic_wav(1000),
+                                                                              ENCODING_OGG)))
+
+    @mock.patch.object(SoundFileEncoder, 'available', return_value=False)
+    def test_external(self, _):
+        sample = corpus.synthetic_wav(100)
+
+        with mock.patch.dict(ENCODER_COMMANDS, {ENCODING_FLAC: lambda in_filename, out_filename: [
+                'cp', in_filename, out_filename]}):
+            self.assertIsInstance(encoders.backend(ENCODING_FLAC), ExternalEncoder)
+            self.assertEqual(sample, encode_audio_file(sample, ENCODING_FLAC))
+
+        with mock.patch.dict(ENCODER_COMMANDS, {ENCODING_FLAC: lambda in_filename, out_filename: ['false']}):
+            with self.assertRaises(RuntimeError):
+                encode_audio_file(sample, ENCODING_FLAC)
+
+    @mock.patch.object(SoundFileEncoder, 'available', return_value=False)
+    def test_unavailable(self, _):
+        with mock.patch.dict(ENCODER_COMMANDS, {ENCODING_FLAC: missing_encoder, ENCODING_OGG: missing_encoder}):
+            self.assertEqual({ENCODING_FLAC: [], ENCODING_OGG: []}, encoders.probe())
+            self.assertIsNone(encoders.check([ENCODING_NONE]))
+            self.assertIn("no encoder available for flac (tried soundfile, rnsutils-missing-encoder)",
+                          encoders.check([ENCODING_NONE, ENCODING_FLAC]))
+
+            # fails before writing anything
+            with mock.patch('tempfile.NamedTemporaryFile') as temporary_file, self.assertRaises(LookupError):
+                encode_audio_file(corpus.synthetic_wav(100), ENCODING_OGG)
+            temporary_file.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from rnsutils.fingerprint import conversion_fingerprint, is_up_to_date
+from rnsutils.instrument import RenoiseInstrument
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.output_dir, 'source.sfz')
+        with open(self.source, 'w') as source:
+            source.write('<region>\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_fingerprint_changes(self):
+        fingerprint = conversion_fingerprint([self.source], 'empty-31.xrni', {'encoding': 'flac'})
+
+        self.assertEqual(fingerprint, conversion_fingerprint([self.source], 'empty-31.xrni', {'encoding': 'flac'}))
+        self.assertNotEqual(fingerprint, conversion_fingerprint([self.source], 'empty-31.xrni', {'encoding': 'ogg'}))
+        self.assertNotEqual(fingerprint, conversion_fingerprint([self.source, 'missing.wav'], 'empty-31.xrni',
+                                                                {'encoding': 'flac'}))
+
+        with open(self.source, 'a') as source:
+            source.write('sample=a.wav\n')
+        self.assertNotEqual(fingerprint, conversion_fingerprint([self.source], 'empty-31.xrni', {'encoding': 'flac'}))
+
+    def test_up_to_date(self):
+        output_filename = os.path.join(self.output_dir, 'output.xrni')
+        self.assertFalse(is_up_to_date(output_filename, 'abc'))
+
+        instrument = RenoiseInstrument()
+        instrument.fingerprint = 'abc'
+        instrument.save(output_filename, cleanup=False)
+
+        self.assertTrue(is_up_to_date(output_filename, 'abc'))
+        self.assertFalse(is_up_to_date(output_filename, 'def'))
+        self.assertEqual('abc', RenoiseInstrument(output_filename).fingerprint)
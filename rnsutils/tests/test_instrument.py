@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+from copy import deepcopy
+from zipfile import ZipFile
+
+from rnsutils.instrument import RenoiseInstrument
+
+
+def add_sample(instrument, name, data):
+    sample = deepcopy(instrument.sample_template)
+    sample.Name = name
+    instrument.root.SampleGenerator.Samples.append(sample)
+    instrument.root.SampleGenerator.ModulationSets.append(deepcopy(instrument.modulation_set_template))
+    instrument.sample_data.append(data)
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_stream(self):
+        output_filename = os.path.join(self.output_dir, 'streamed.xrni')
+
+        instrument = RenoiseInstrument()
+        self.assertTrue(instrument.stream(output_filename))
+        add_sample(instrument, 'first', b'first content')
+        add_sample(instrument, 'second', b'second content')
+        self.assertTrue(os.path.isfile(output_filename + '.part'))
+        instrument.save(output_filename)
+
+        loaded = RenoiseInstrument(output_filename)
+        self.assertEqual([b'first content', b'second content'], loaded.sample_data)
+        self.assertEqual(['first', 'second'], [str(sample.Name) for sample in loaded.samples])
+        self.assertFalse(RenoiseInstrument().stream(output_filename))
+
+    def test_discard_stream(self):
+        output_filename = os.path.join(self.output_dir, 'discarded.xrni')
+
+        instrument = RenoiseInstrument()
+        instrument.stream(output_filename)
+        add_sample(instrument, 'first', b'first content')
+        instrument.discard_stream()
+
+        self.assertEqual([], os.listdir(self.output_dir))
+
+    def test_xml(self):
+        instrument = RenoiseInstrument()
+        add_sample(instrument, 'first', b'first content')
+        sample = instrument.samples[0]
+        sample.LoopStart = None
+        sample.LoopEnd = 4410
+        sample.IsAlias = True
+        instrument.modulation_set_template.ahdsr_attack = 0.25
+        instrument.comment = "first line\n2"
+        instrument.tags = ['piano']
+
+        self.assertIsNone(sample.LoopStart.text)
+        self.assertEqual((4410, True, 0.25), (sample.LoopEnd, sample.IsAlias, instrument.modulation_set_template.
+                                              ahdsr_attack))
+        self.assertEqual("first line\n2", instrument.comment)
+
+        for compact in (False, True):
+            output_filename = os.path.join(self.output_dir, 'compact.xrni' if compact else 'pretty.xrni')
+            instrument.compact = compact
+            instrument.save(output_filename, cleanup=False)
+
+            with ZipFile(output_filename) as z:
+                self.assertIsNone(z.testzip())
+                xml = z.read('Instrument.xml')
+            # no objectify annotation ends up in the instrument
+            self.assertNotIn(b'pytype', xml)
+            self.assertNotIn(b'xsi:', xml)
+            self.assertEqual(not compact, b'\n  <' in xml)
+
+            loaded = RenoiseInstrument(output_filename)
+            self.assertEqual(['first'], [str(sample.Name) for sample in loaded.samples])
+            self.assertEqual(['piano'], [str(tag) for tag in loaded.tags])
+            self.assertEqual(4410, loaded.samples[0].LoopEnd)
+
+    def test_text_values(self):
+        output_filename = os.path.join(self.output_dir, 'names.xrni')
+
+        instrument = RenoiseInstrument()
+        for name in ('001', 'true', '1.50'):
+            add_sample(instrument, name, b'RIFF')
+        instrument.samples[0].Mapping.BaseNote = 61
+        instrument.samples[1].Mapping.BaseNote = True
+        instrument.save(output_filename, cleanup=False)
+
+        with ZipFile(output_filename) as z:
+            self.assertEqual(['SampleData/Sample00 001.wav', 'SampleData/Sample01 true.wav',
+                              'SampleData/Sample02 1.50.wav'], sorted(name for name in z.namelist() if
+                                                                        name.startswith('SampleData')))
+        loaded = RenoiseInstrument(output_filename)
+        self.assertEqual(['001', 'true', '1.50'], [sample.Name.text for sample in loaded.samples])
+        self.assertEqual(['61', 'true'], [sample.Mapping.BaseNote.text for sample in loaded.samples[:2]])
@@ -0,0 +1,64 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from rnsutils import corpus, sfztoxrni
+from rnsutils.journal import Journal
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.journal_filename = os.path.join(self.output_dir, 'journal.jsonl')
+        self.sfz_filenames = [corpus.write_sfz(self.output_dir, regions=2, frames=100, seed=seed,
+                                               sfz_name='synthetic{}.sfz'.format(seed)) for seed in range(3)]
+        self.xrni_filenames = [os.path.splitext(sfz_filename)[0] + '.xrni' for sfz_filename in self.sfz_filenames]
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def run_main(self, argv):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return sfztoxrni.main(['-q', '-e', 'none', '--journal', self.journal_filename] + argv)
+
+    def test_resume(self):
+        # a run interrupted after converting two files, while saving the third
+        self.assertEqual(0, self.run_main(self.sfz_filenames[:2]))
+        with open(self.xrni_filenames[2] + '.part', 'wb') as partial:
+            partial.write(b'PK')
+        with open(self.journal_filename, 'a') as journal_file:
+            journal_file.write('{"source": "trunc')
+        converted_mtime = os.stat(self.xrni_filenames[0]).st_mtime_ns
+
+        # an output altered since is converted again
+        with open(self.xrni_filenames[1], 'ab') as altered:
+            altered.write(b'garbage')
+
+        self.assertEqual(0, self.run_main(['-f', '-r', '--resume'] + self.sfz_filenames))
+
+        self.assertEqual(converted_mtime, os.stat(self.xrni_filenames[0]).st_mtime_ns)
+        self.assertFalse(os.path.exists(self.xrni_filenames[2] + '.part'))
+        journal = Journal(self.journal_filename, resume=True)
+        journal.close()
+        for sfz_filename, xrni_filename in zip(self.sfz_filenames, self.xrni_filenames):
+            self.assertTrue(any(entry['source'] == os.path.normpath(sfz_filename) and
+                                journal.completed(entry['fingerprint'], xrni_filename)
+                                for entry in journal.entries.values()))
+
+        # without resuming, the journal starts afresh
+        self.assertEqual(0, self.run_main(['-r', self.sfz_filenames[0]]))
+        with open(self.journal_filename) as journal_file:
+            self.assertEqual([os.path.normpath(self.xrni_filenames[0])],
+                             [json.loads(line)['output'] for line in journal_file])
+
+    def test_resume_needs_journal(self):
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            sfztoxrni.main(['--resume', self.sfz_filenames[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from rnsutils import corpus, progress, sfztoxrni, xrnireencode
+from rnsutils.encoders import SoundFileEncoder
+from rnsutils.utils import ENCODER_COMMANDS, ENCODING_FLAC
+
+
+def fake_encoder(in_filename, out_filename):
+    return ['cp', in_filename, out_filename]
+
+
+class TestProgress(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def run_main(self, main, argv):
+        """:return exit status of :arg main(argv) and the progress events it wrote"""
+        output = io.StringIO()
+        with contextlib.redirect_stderr(output):
+            status = main(['-q', '--progress', '--progress-interval', '0'] + argv)
+        return status, [json.loads(line) for line in output.getvalue().splitlines() if line.startswith('{')]
+
+    def test_reporter(self):
+        output = io.StringIO()
+        reporter = progress.ProgressReporter(output, interval=5)
+        reporter.start = reporter.last_report = 0
+        reporter.add_total(files=1, samples=4, bytes=4000000)
+
+        reporter.advance(now=2, samples=1, bytes=1000000)
+        self.assertEqual('', output.getvalue())
+        reporter.advance(now=5, samples=1, bytes=1000000)
+
+        snapshot = json.loads(output.getvalue())
+        self.assertEqual(('progress', 2, 4, 0.4, 0.4, 5.),
+                         (snapshot['event'], snapshot['samples'], snapshot['samples_total'],
+                          snapshot['samples_per_second'], snapshot['mb_per_second'], snapshot['eta']))
+        self.assertEqual('samples 2/4, 0.4 samples/s, 0.40 MB/s, ETA 0:00:05', reporter.format(snapshot))
+
+    def test_worker_processes(self):
+        with progress.session(mock.Mock(progress=True, progress_interval=1000)):
+            progress.add_total(samples=2)
+            progress.advance(samples=1)
+            # a forked worker holds a copy of the session, which must not account anything
+            with mock.patch('os.getpid', return_value=-1):
+                self.assertFalse(progress.enabled())
+                progress.advance(samples=1)
+            self.assertEqual(1, progress._reporter.done['samples'])
+        self.assertFalse(progress.enabled())
+
+    def test_sfztoxrni(self):
+        sfz_filename = corpus.write_sfz(self.output_dir, regions=3, frames=100)
+
+        status, events = self.run_main(sfztoxrni.main, ['-e', 'none', sfz_filename])
+        self.assertEqual(0, status)
+        self.assertEqual('done', events[-1]['event'])
+        self.assertEqual((1, 1, 3, 3), (events[-1]['files'], events[-1]['files_total'], events[-1]['samples'],
+                                        events[-1]['samples_total']))
+        self.assertEqual(events[-1]['bytes_total'], events[-1]['bytes'])
+
+        # up to date conversions are not to be done
+        status, events = self.run_main(sfztoxrni.main, ['-e', 'none', sfz_filename])
+        self.assertEqual((0, 0), (events[-1]['samples'], events[-1]['samples_total']))
+
+    @mock.patch.dict(ENCODER_COMMANDS, {ENCODING_FLAC: fake_encoder})
+    @mock.patch.object(SoundFileEncoder, 'available', return_value=False)
+    def test_xrnireencode(self, _):
+        xrni_filenames = [os.path.join(self.output_dir, 'synthetic{}.xrni'.format(idx)) for idx in range(2)]
+        for xrni_filename in xrni_filenames:
+            corpus.write_xrni(xrni_filename, 3, frames=100)
+
+        # samples encoded in worker processes are accounted once
+        status, events = self.run_main(xrnireencode.main, ['-j', '2', '-e', 'flac'] + xrni_filenames)
+        self.assertEqual(0, status)
+        self.assertEqual((2, 2, 6, 6), (events[-1]['files'], events[-1]['files_total'], events[-1]['samples'],
+                                        events[-1]['samples_total']))
+        self.assertEqual(events[-1]['bytes_total'], events[-1]['bytes'])
+        self.assertEqual(0, events[-1]['eta'])
+
+
+if __name__ == '__main__':
+    unittest.main()
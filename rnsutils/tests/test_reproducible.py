@@ -0,0 +1,95 @@
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from zipfile import ZipFile
+
+from lxml import etree
+
+from rnsutils import corpus
+from rnsutils.instrument import RenoiseInstrument, canonical_xml
+from rnsutils.lookup import get_renoise_parser
+
+
+def save(instrument, stream=False):
+    """:return bytes of :arg instrument saved as of a different time at every call"""
+    save.now += 3600
+    output = io.BytesIO()
+    with mock.patch('rnsutils.ziputils.time.time', return_value=save.now):
+        if stream:
+            sample_data, instrument.sample_data = instrument.sample_data, []
+            instrument.stream(output)
+            for sample in sample_data:
+                instrument.sample_data.append(sample)
+        instrument.save(output, cleanup=False)
+    return output.getvalue()
+
+
+save.now = 1500000000
+
+
+class TestReproducible(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.instrument = corpus.synthetic_instrument(3, frames=100)
+        self.instrument.fingerprint = 'f' * 40
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_save(self):
+        self.assertNotEqual(save(self.instrument), save(self.instrument))
+
+        self.instrument.deterministic = True
+        content = save(self.instrument)
+        self.assertEqual(content, save(self.instrument))
+        self.assertEqual(content, save(self.instrument, stream=True))
+
+        with ZipFile(io.BytesIO(content)) as z:
+            self.assertEqual({(1980, 1, 1, 0, 0, 0)}, set(info.date_time for info in z.infolist()))
+            self.assertEqual('Instrument.xml', z.namelist()[-1])
+
+        # saving a loaded instrument gives the same bytes back
+        reloaded = RenoiseInstrument(io.BytesIO(content))
+        reloaded.deterministic = True
+        self.assertEqual(content, save(reloaded))
+
+        with mock.patch.dict(os.environ, {'SOURCE_DATE_EPOCH': '1500000000'}), \
+                ZipFile(io.BytesIO(save(self.instrument))) as z:
+            self.assertEqual((2017, 7, 14, 2, 40, 0), z.infolist()[0].date_time)
+
+    def test_canonical_xml(self):
+        # only whitespace between elements is dropped, blank text of leaves is kept
+        root = etree.fromstring(b'<Instrument b="2" a="1">\n  <Name> </Name>\n  <Samples>\n    <Sample/>\n'
+                                b'  </Samples>\n</Instrument>', get_renoise_parser())
+        self.assertEqual(b"<?xml version='1.0' encoding='UTF-8'?>\n"
+                         b'<Instrument a="1" b="2"><Name> </Name><Samples><Sample/></Samples></Instrument>',
+                         canonical_xml(root, pretty_print=False))
+
+    def test_runs(self):
+        sfz_filename = corpus.write_sfz(self.output_dir, regions=3, frames=100)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+
+        # separate runs, each with its own hash seed, an hour apart
+        outputs = []
+        for run in range(2):
+            output_dir = os.path.join(self.output_dir, 'run{}'.format(run))
+            os.mkdir(output_dir)
+            env['PYTHONHASHSEED'] = str(run)
+            subprocess.check_call([sys.executable, '-c', 'import sys, time\n'
+                                                         'time.time = lambda: {}\n'
+                                                         'from rnsutils import sfztoxrni\n'
+                                                         'sys.exit(sfztoxrni.main())'.format(save.now + run * 3600),
+                                   '-q', '-e', 'none', '--deterministic', '-o', output_dir, sfz_filename], env=env)
+            with open(os.path.join(output_dir, 'synthetic.xrni'), 'rb') as xrni_file:
+                outputs.append(xrni_file.read())
+
+        self.assertEqual(outputs[0], outputs[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from copy import deepcopy
+
+from rnsutils import analysis, corpus, resample
+from rnsutils.instrument import RenoiseInstrument
+
+
+def sine_wav(frequency, sample_rate, frames, channels=1, sample_width=2):
+    """:return WAV content of a half full scale sine of :arg frequency Hz"""
+    import numpy
+
+    samples = 0.5 * numpy.sin(2 * numpy.pi * frequency * numpy.arange(frames) / float(sample_rate))
+    return analysis.write_wav(analysis.array_to_pcm(numpy.repeat(samples[:, None], channels, axis=1), sample_width),
+                              channels, sample_width, sample_rate)
+
+
+def dominant_frequency(wav_content):
+    import numpy
+
+    params, frames = analysis.read_wav(wav_content)
+    samples = analysis.pcm_to_array(frames, params.sampwidth, params.nchannels)[:, 0]
+    return numpy.argmax(numpy.abs(numpy.fft.rfft(samples))) * params.framerate / float(len(samples))
+
+
+@unittest.skipUnless(analysis.available(), "numpy is not installed")
+class TestResample(unittest.TestCase):
+    def setUp(self):
+        self.renoise_sample = deepcopy(RenoiseInstrument().sample_template)
+        self.renoise_sample.LoopStart = 9600
+        self.renoise_sample.LoopEnd = 19200
+        self.renoise_sample.SelectionRangeStart = -1
+
+    def test_reduce(self):
+        wav = sine_wav(1000, 96000, 19200, channels=2, sample_width=3)
+
+        reduced_wav = resample.reduce_wav(wav, self.renoise_sample, sample_rate=44100, bit_depth=16)
+
+        params, frames = analysis.read_wav(reduced_wav)
+        self.assertEqual((2, 2, 44100, 8820), (params.nchannels, params.sampwidth, params.framerate, params.nframes))
+        self.assertEqual((4410, 8820, -1), (self.renoise_sample.LoopStart, self.renoise_sample.LoopEnd,
+                                            self.renoise_sample.SelectionRangeStart))
+        self.assertAlmostEqual(1000, dominant_frequency(reduced_wav), delta=5)
+        self.assertAlmostEqual(-6, analysis.analyse(reduced_wav).peak, delta=0.1)
+
+        # dithering is reproducible
+        self.assertEqual(reduced_wav, resample.reduce_wav(wav, sample_rate=44100, bit_depth=16))
+
+    def test_filter(self):
+        # content above the new Nyquist frequency is dropped rather than aliased, only the clicks of the sine starting
+        # and ending abruptly remain
+        reduced_wav = resample.reduce_wav(sine_wav(15000, 48000, 4800), sample_rate=22050)
+        self.assertLess(analysis.analyse(reduced_wav).rms, -30)
+
+    def test_untouched(self):
+        wav = corpus.synthetic_wav(100)
+        self.assertIs(wav, resample.reduce_wav(wav, self.renoise_sample, sample_rate=96000, bit_depth=24))
+        self.assertEqual((9600, 19200), (self.renoise_sample.LoopStart, self.renoise_sample.LoopEnd))
+
+        self.assertIs(b'fLaC\0\0\0\x22', resample.reduce_wav(b'fLaC\0\0\0\x22', sample_rate=22050))
+
+    def test_bit_depth(self):
+        reduced_wav = resample.reduce_wav(corpus.synthetic_wav(100, sample_width=2), bit_depth=8)
+
+        params, _ = analysis.read_wav(reduced_wav)
+        self.assertEqual((1, 44100, 100), (params.sampwidth, params.framerate, params.nframes))
+
+
+if __name__ == '__main__':
+    unittest.main()
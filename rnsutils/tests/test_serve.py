@@ -0,0 +1,74 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from rnsutils import cache, corpus
+from rnsutils.client import submit
+from rnsutils.instrument import RenoiseInstrument
+from rnsutils.serve import ConversionServer
+
+
+class TestServe(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.output_dir, 'rnsutils.sock')
+        self.server = ConversionServer(self.socket_path)
+        self.server_thread = threading.Thread(target=self.server.serve_forever)
+        self.server_thread.start()
+        while not os.path.exists(self.socket_path):
+            self.server_thread.join(0.01)
+
+    def tearDown(self):
+        self.run_job('shutdown')
+        self.server_thread.join()
+        shutil.rmtree(self.output_dir)
+
+    def run_job(self, command, *args):
+        """:return (exit status, stdout) of :arg command run by the server"""
+        status, output = None, ''
+        for event in submit(self.socket_path, command, args, cwd=self.output_dir):
+            if event['event'] == 'output' and event['stream'] == 'stdout':
+                output += event['text']
+            elif event['event'] == 'done':
+                status = event['status']
+        return status, output
+
+    def test_convert(self):
+        corpus.write_sf2(os.path.join(self.output_dir, 'synthetic.sf2'), bags=3, instruments=2)
+
+        for _ in range(2):
+            status, output = self.run_job('sf2toxrni', '-f', '-r', '-e', 'none', '--no-unused', 'synthetic.sf2')
+            self.assertEqual(0, status)
+            self.assertIn("saved 1_instrument 1.xrni", output)
+
+        self.assertEqual(3, len(RenoiseInstrument(os.path.join(self.output_dir, '0_instrument 0.xrni')).sample_data))
+        self.assertEqual(1, cache.statistics()['sf2']['hits'])
+        self.assertEqual(3, cache.statistics()['template']['hits'])
+
+    def test_tag(self):
+        corpus.write_xrni(os.path.join(self.output_dir, 'synthetic.xrni'), 2, frames=10)
+
+        self.assertEqual(0, self.run_job('xrnitag', '-a', 'drums', 'synthetic.xrni')[0])
+        self.assertEqual((0, 'drums\n'), self.run_job('xrnitag', 'synthetic.xrni'))
+
+    def test_errors(self):
+        self.assertEqual(2, self.run_job('unknown')[0])
+        self.assertEqual(2, self.run_job('serve')[0])
+        self.assertEqual(2, self.run_job('xrnitag', '--unknown-option')[0])
+
+        # neither requests run from a missing directory nor requests which aren't objects stop the server
+        self.assertEqual({'event': 'done', 'status': 2},
+                         list(submit(self.socket_path, 'xrnitag', cwd=os.path.join(self.output_dir, 'missing')))[-1])
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(self.socket_path)
+        with connection, connection.makefile('rwb') as stream:
+            stream.write(b'[]\n')
+            stream.flush()
+            self.assertEqual(b'{"event": "done", "status": 2}\n', stream.readlines()[-1])
+        with mock.patch.object(self.server, 'run', side_effect=RuntimeError), self.assertLogs(level='ERROR'):
+            self.assertEqual(1, self.run_job('xrnitag')[0])
+        self.assertEqual(2, self.run_job('unknown')[0])
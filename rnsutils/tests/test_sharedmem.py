@@ -0,0 +1,95 @@
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+
+from rnsutils import corpus, sharedmem
+from rnsutils.encoders import SoundFileEncoder
+from rnsutils.sharedmem import SharedMemoryPool
+from rnsutils.utils import ENCODER_COMMANDS, ENCODING_FLAC, ENCODING_NONE
+
+
+def _reverse(view):
+    return bytes(view)[::-1]
+
+
+def _fail_on_empty(view):
+    if not len(view):
+        raise ValueError("empty payload")
+    return view
+
+
+class TestSharedMem(unittest.TestCase):
+    def setUp(self):
+        self.samples = [corpus.synthetic_wav(100 * sample_idx, sample_idx) for sample_idx in range(1, 5)]
+
+        # record segments created by the parent to check they're all released
+        self.shared_buffers = []
+        share = sharedmem.share
+
+        def recording_share(content):
+            shared_buffer = share(content)
+            self.shared_buffers.append(shared_buffer)
+            return shared_buffer
+
+        patcher = mock.patch.object(sharedmem, 'share', recording_share)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertReleased(self, shared_buffers=()):
+        self.assertTrue(self.shared_buffers)
+        for shared_buffer in self.shared_buffers + list(shared_buffers):
+            if shared_buffer.name is not None:
+                with self.assertRaises(FileNotFoundError):
+                    sharedmem._attach(shared_buffer.name)
+
+    def test_map(self):
+        with SharedMemoryPool(processes=2) as pool:
+            self.assertEqual([sample[::-1] for sample in self.samples], pool.map(_reverse, self.samples))
+        self.assertReleased()
+
+    def test_map_failure(self):
+        with SharedMemoryPool(processes=2) as pool:
+            with self.assertRaises(ValueError):
+                pool.map(_fail_on_empty, self.samples[:2] + [b''] + self.samples[2:])
+        self.assertReleased()
+
+    def test_map_interrupt(self):
+        futures = []
+
+        with SharedMemoryPool(processes=2) as pool:
+            submit = pool.executor.submit
+
+            def interrupted_submit(*args):
+                future = submit(*args)
+                futures.append(future)
+                if len(futures) == 2:
+                    # interrupted while waiting for the second result, which arrives nonetheless
+                    def result(timeout=None):
+                        # once only, later calls reaching Future.result
+                        del future.result
+                        Future.result(future)
+                        raise KeyboardInterrupt()
+                    future.result = result
+                return future
+
+            with mock.patch.object(pool.executor, 'submit', interrupted_submit), \
+                    self.assertRaises(KeyboardInterrupt):
+                pool.map(_reverse, self.samples)
+
+        # segments of results created by workers included
+        self.assertReleased(Future.result(future) for future in futures if not future.cancelled())
+
+    def test_encode(self):
+        with SharedMemoryPool(processes=2) as pool:
+            self.assertEqual(self.samples, pool.encode(self.samples, ENCODING_NONE))
+
+            # stand in for flac, which may not be installed, workers being forked with the patched command
+            with mock.patch.dict(ENCODER_COMMANDS, {ENCODING_FLAC: lambda in_filename, out_filename: [
+                    'cp', in_filename, out_filename]}), \
+                    mock.patch.object(SoundFileEncoder, 'available', return_value=False):
+                self.assertEqual(self.samples, pool.encode(self.samples, ENCODING_FLAC))
+        self.assertReleased()
+
+
+if __name__ == '__main__':
+    unittest.main()
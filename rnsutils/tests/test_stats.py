@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+from rnsutils import corpus, sf2toxrni, stats
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def parse_options(self, argv):
+        parser = argparse.ArgumentParser()
+        stats.add_arguments(parser)
+        return parser.parse_args(argv)
+
+    def test_disabled(self):
+        self.assertIs(stats.timer('stage'), stats.timer('other stage'))
+        stats.count('counter')
+
+        with stats.session(self.parse_options([])) as collector:
+            self.assertIsNone(collector)
+
+    def test_per_file(self):
+        with stats.session(self.parse_options(['--stats-json', os.path.join(self.output_dir, 'stats.json')])) \
+                as collector:
+            for filename in ('a', 'b'):
+                stats.file(filename)
+                with stats.timer('stage'):
+                    stats.count('counter', 2)
+
+        self.assertEqual((2, 4), (collector.total['stages']['stage'][0], collector.total['counters']['counter']))
+        self.assertEqual(['a', 'b'], list(collector.files))
+        self.assertEqual(1, collector.files['b']['stages']['stage'][0])
+
+    def test_threads(self):
+        def account():
+            for _ in range(20000):
+                stats.count('counter')
+
+        # switch threads as often as possible for lost updates to show
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+
+        with stats.session(self.parse_options(['--stats-json', os.path.join(self.output_dir, 'stats.json')])) \
+                as collector:
+            threads = [threading.Thread(target=account) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(80000, collector.total['counters']['counter'])
+
+    def test_convert(self):
+        sf2_filename = os.path.join(self.output_dir, 'synthetic.sf2')
+        stats_filename = os.path.join(self.output_dir, 'stats.json')
+        corpus.write_sf2(sf2_filename, bags=3, instruments=2)
+
+        sf2toxrni.main(['-q', '--no-unused', '-e', 'none', '-o', self.output_dir, '--stats-json', stats_filename,
+                        sf2_filename])
+
+        with open(stats_filename) as stats_file:
+            result = json.load(stats_file)
+
+        file_stats = result['files'][sf2_filename]
+        self.assertEqual(6, file_stats['counters']['samples'])
+        for stage in ('sf2.parse', 'template.deepcopy', 'convert.bag', 'cleanup', 'xml.serialize', 'zip.write'):
+            self.assertIn(stage, file_stats['stages'])
+        self.assertEqual(2, file_stats['stages']['save']['calls'])
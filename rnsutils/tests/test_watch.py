@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from rnsutils import corpus, sfztoxrni, watch
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.inbox_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.inbox_dir)
+
+    def test_watcher(self):
+        sfz_filename = corpus.write_sfz(os.path.join(self.inbox_dir, 'strings'), regions=2, frames=100)
+        watcher = watch.Watcher(self.inbox_dir, ('.sfz',), dependencies=sfztoxrni.sfz_sources, settle=2)
+
+        # files are left alone until they settle
+        self.assertEqual(([], 2), watcher.scan(now=0))
+        ready, next_scan = watcher.scan(now=2)
+        self.assertEqual([sfz_filename], [filename for filename, _ in ready])
+        self.assertIsNone(next_scan)
+
+        watcher.done(*ready[0])
+        self.assertEqual(([], None), watcher.scan(now=3))
+
+        # a referenced sample changing triggers a new conversion once settled
+        sample_filename = os.path.join(os.path.dirname(sfz_filename), 'Samples', corpus.sfz_sample_filename(1))
+        with open(sample_filename, 'ab') as sample_file:
+            sample_file.write(b'\0\0')
+        self.assertEqual(([], 2), watcher.scan(now=4))
+        self.assertEqual([sfz_filename], [filename for filename, _ in watcher.scan(now=6)[0]])
+        self.assertIn(os.path.dirname(sample_filename), watcher.directories())
+
+    def test_watch(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        converted = []
+        stop = threading.Event()
+
+        def convert(filename):
+            converted.append(filename)
+            stop.set()
+
+        for polling in (False, True):
+            del converted[:]
+            stop.clear()
+            thread = threading.Thread(target=watch.watch, args=(self.inbox_dir, convert, ('.sf2',)),
+                                      kwargs={'settle': 0.1, 'interval': 0.05, 'polling': polling, 'stop': stop})
+            thread.start()
+            sf2_filename = os.path.join(self.inbox_dir, 'dropped{}.sf2'.format(int(polling)))
+            corpus.write_sf2(sf2_filename, bags=1)
+            thread.join(10)
+
+            self.assertFalse(thread.is_alive())
+            self.assertEqual([sf2_filename], converted)
+            os.remove(sf2_filename)
+
+    def test_sfztoxrni(self):
+        sfz_filename = corpus.write_sfz(self.inbox_dir, regions=2, frames=100)
+        output_filename = os.path.join(self.inbox_dir, 'synthetic.xrni')
+        stop = threading.Event()
+
+        thread = threading.Thread(target=watch.watch,
+                                  args=(self.inbox_dir, lambda filename: sfztoxrni.main(['-q', '-e', 'none',
+                                                                                         filename])),
+                                  kwargs={'extensions': ('.sfz',), 'settle': 0.1, 'interval': 0.05, 'stop': stop})
+        thread.start()
+        try:
+            deadline = time.time() + 10
+            while not os.path.isfile(output_filename) and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            stop.set()
+            thread.join(10)
+
+        self.assertTrue(os.path.isfile(output_filename))
+        self.assertTrue(os.path.isfile(sfz_filename))
+
+
+if __name__ == '__main__':
+    unittest.main()
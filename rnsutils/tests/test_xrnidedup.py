@@ -0,0 +1,70 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from rnsutils import corpus, xrnidedup
+from rnsutils.instrument import RenoiseInstrument
+
+
+class TestXrniDedup(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.library_dir = os.path.join(self.output_dir, 'library')
+        os.makedirs(os.path.join(self.library_dir, 'strings'))
+
+        # the first two instruments share their samples, the third one is different
+        self.filenames = [os.path.join(self.library_dir, 'piano.xrni'),
+                          os.path.join(self.library_dir, 'strings', 'piano copy.xrni'),
+                          os.path.join(self.library_dir, 'strings', 'violin.xrni')]
+        for filename, seed in zip(self.filenames, (0, 0, 100)):
+            corpus.write_xrni(filename, samples=3, frames=100, seed=seed)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_find_duplicates(self):
+        filenames = [filename for filename, _ in xrnidedup.find_xrni([self.library_dir], recursive=True)]
+        self.assertEqual(sorted(self.filenames), sorted(filenames))
+
+        sample_entries = xrnidedup.scan(filenames)
+        # the two files holding candidates are opened once each
+        with mock.patch('zipfile.ZipFile', wraps=zipfile.ZipFile) as zip_file:
+            duplicates = xrnidedup.find_duplicates(sample_entries, threads=2)
+        self.assertEqual(2, zip_file.call_count)
+
+        self.assertEqual(9, len(sample_entries))
+        self.assertEqual(3, len(duplicates))
+        for group in duplicates.values():
+            self.assertEqual(sorted(self.filenames[:2]), sorted(sample_entry.filename for sample_entry in group))
+        self.assertEqual(sum(sample_entry.compressed_size for sample_entry in xrnidedup.scan_file(self.filenames[0])),
+                         xrnidedup.reclaimable_bytes(duplicates))
+
+    def test_store_and_restore(self):
+        store_dir = os.path.join(self.output_dir, 'store')
+        stripped_dir = os.path.join(self.output_dir, 'stripped')
+        restored_dir = os.path.join(self.output_dir, 'restored')
+        report_filename = os.path.join(self.output_dir, 'report.json')
+
+        self.assertEqual(0, xrnidedup.main(['-q', '-r', '--json', report_filename, '-s', store_dir, '-o', stripped_dir,
+                                            self.library_dir]))
+        with open(report_filename) as report_file:
+            self.assertEqual(3, json.load(report_file)['duplicated_samples'])
+
+        # each distinct sample is stored once, stripped instruments hold none
+        self.assertEqual(6, sum(len(filenames) for _, _, filenames in os.walk(store_dir)))
+        self.assertEqual([], xrnidedup.scan_file(os.path.join(stripped_dir, 'strings', 'violin.xrni')))
+
+        self.assertEqual(0, xrnidedup.main(['-q', '-r', '--restore', '-s', store_dir, '-o', restored_dir,
+                                            stripped_dir]))
+        for filename in self.filenames:
+            restored_filename = os.path.join(restored_dir, os.path.relpath(filename, self.library_dir))
+            self.assertEqual(RenoiseInstrument(filename).sample_data,
+                             RenoiseInstrument(restored_filename).sample_data)
+
+
+if __name__ == '__main__':
+    unittest.main()
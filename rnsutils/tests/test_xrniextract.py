@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from rnsutils import corpus, sfztoxrni, xrniextract
+from rnsutils.instrument import RenoiseInstrument
+
+
+class TestXrniExtract(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_sample_entries(self):
+        self.assertEqual({0: 'SampleData/Sample00 a.flac', 100: 'SampleData/Sample100 b.wav'},
+                         xrniextract.sample_entries(['Instrument.xml', 'SampleData/Sample100 b.wav',
+                                                     'SampleData/Sample00 a.flac']))
+        self.assertEqual({0: 'SampleData/a.wav', 1: 'SampleData/b.wav'},
+                         xrniextract.sample_entries(['SampleData/b.wav', 'SampleData/a.wav']))
+        self.assertEqual('a_b_ c', xrniextract.safe_filename('a/b: c.', 'default'))
+
+    def test_extract(self):
+        xrni_filename = os.path.join(self.output_dir, 'synthetic.xrni')
+        instrument = corpus.synthetic_instrument(3, frames=1000)
+        # same name twice
+        instrument.root.SampleGenerator.Samples.Sample[2].Name = 'synthetic 1'
+        instrument.save(xrni_filename, cleanup=False)
+
+        output_base = os.path.join(self.output_dir, 'extracted', 'piano')
+        sample_filenames = xrniextract.extract_file(xrni_filename, output_base, threads=2)
+
+        self.assertEqual(['synthetic 0.wav', 'synthetic 1.wav', 'synthetic 1 (2).wav'],
+                         [os.path.basename(sample_filename) for sample_filename in sample_filenames])
+        for sample_filename, sample_content in zip(sample_filenames, instrument.sample_data):
+            with open(sample_filename, 'rb') as sample_file:
+                self.assertEqual(sample_content, sample_file.read())
+
+        # the SFZ maps samples back as they were
+        self.assertEqual(0, sfztoxrni.main(['-q', '-e', 'none', '-o', self.output_dir, output_base + '.sfz']))
+        converted = RenoiseInstrument(os.path.join(self.output_dir, 'piano.xrni'))
+        self.assertEqual(instrument.sample_data, converted.sample_data)
+        for sample, converted_sample in zip(instrument.root.SampleGenerator.Samples.Sample,
+                                            converted.root.SampleGenerator.Samples.Sample):
+            for field in ('BaseNote', 'NoteStart', 'NoteEnd', 'VelocityStart', 'VelocityEnd'):
+                self.assertEqual(sample.Mapping[field], converted_sample.Mapping[field])
+
+    def test_main(self):
+        library_dir = os.path.join(self.output_dir, 'library')
+        os.makedirs(os.path.join(library_dir, 'strings'))
+        corpus.write_xrni(os.path.join(library_dir, 'strings', 'violin.xrni'), 2, frames=100)
+
+        self.assertEqual(0, xrniextract.main(['-q', '-r', '--no-sfz', '-o', self.output_dir, library_dir]))
+
+        self.assertEqual(['synthetic 0.wav', 'synthetic 1.wav'],
+                         sorted(os.listdir(os.path.join(self.output_dir, 'strings', 'violin'))))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'strings', 'violin.sfz')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from zipfile import ZipFile
+
+from rnsutils import corpus, xrniverify
+
+
+class TestXrniVerify(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def write_xrni(self, name, **kwargs):
+        filename = os.path.join(self.output_dir, name)
+        instrument = corpus.synthetic_instrument(3, frames=1000)
+        for key, value in kwargs.items():
+            setattr(instrument.root.SampleGenerator.Samples.Sample[0], key, value)
+        instrument.save(filename, cleanup=False)
+        return filename
+
+    def test_verify_file(self):
+        result = xrniverify.verify_file(self.write_xrni('valid.xrni'))
+        self.assertEqual([], result['errors'])
+        self.assertTrue(result['ok'])
+        self.assertEqual((4, 3), (result['entries'], result['samples']))
+
+        result = xrniverify.verify_file(self.write_xrni('modulation.xrni', ModulationSetIndex=3))
+        self.assertEqual(["sample 0 modulation set index 3 out of range (3 modulation sets)"], result['errors'])
+
+        self.assertEqual([], xrniverify.verify_file(self.write_xrni('none.xrni', ModulationSetIndex=-1))['errors'])
+
+    def test_corruption(self):
+        filename = self.write_xrni('corrupted.xrni')
+        with ZipFile(filename) as z:
+            info = z.getinfo(z.namelist()[-1])
+        with open(filename, 'r+b') as xrni_file:
+            # flip a byte in the middle of the last sample data
+            xrni_file.seek(info.header_offset + 30 + len(info.filename) + info.compress_size // 2)
+            byte = xrni_file.read(1)
+            xrni_file.seek(-1, os.SEEK_CUR)
+            xrni_file.write(bytes([byte[0] ^ 0xff]))
+
+        result = xrniverify.verify_file(filename)
+        self.assertFalse(result['ok'])
+        self.assertTrue(result['errors'][0].startswith(info.filename))
+
+        # a sample entry without its sample
+        missing_filename = os.path.join(self.output_dir, 'missing.xrni')
+        with ZipFile(self.write_xrni('valid.xrni')) as z, ZipFile(missing_filename, 'w') as missing:
+            for name in z.namelist()[:-1]:
+                missing.writestr(name, z.read(name))
+        self.assertEqual(["3 samples for 2 SampleData/ entries"], xrniverify.verify_file(missing_filename)['errors'])
+
+        not_zip_filename = os.path.join(self.output_dir, 'truncated.xrni')
+        with open(not_zip_filename, 'wb') as not_zip:
+            not_zip.write(b'PK\3\4')
+        self.assertFalse(xrniverify.verify_file(not_zip_filename)['ok'])
+
+    def test_main(self):
+        self.write_xrni('valid.xrni')
+        self.write_xrni('modulation.xrni', ModulationSetIndex=10)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(1, xrniverify.main(['-r', '-j', '2', '--json', '-', self.output_dir]))
+
+        report = json.loads(output.getvalue())
+        self.assertEqual((2, 1), (report['files'], report['corrupted']))
+        self.assertEqual([False, True], [result['ok'] for result in report['results']])
+
+        os.remove(os.path.join(self.output_dir, 'modulation.xrni'))
+        self.assertEqual(0, xrniverify.main(['-q', '-r', '-j', '1', self.output_dir]))
+
+
+if __name__ == '__main__':
+    unittest.main()
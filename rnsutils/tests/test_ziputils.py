@@ -0,0 +1,62 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from zipfile import ZipFile
+
+from rnsutils.instrument import RenoiseInstrument
+from rnsutils.ziputils import ZipWriter, read_entries
+
+ENTRIES = [('Instrument.xml', b'<RenoiseInstrument/>'),
+           ('SampleData/Sample00 a.wav', os.urandom(100000)),
+           ('SampleData/Sample01 été.wav', b'\0' * 200000),
+           ('SampleData/Sample02 empty.wav', b'')]
+
+
+def write_archive(threads):
+    output = io.BytesIO()
+    with ZipWriter(output, date_time=(2017, 2, 8, 12, 0, 0), threads=threads) as z:
+        z.writestr(*ENTRIES[0])
+        z.write_entries(ENTRIES[1:])
+    return output.getvalue()
+
+
+class TestZipUtils(unittest.TestCase):
+    def test_standard_archive(self):
+        with ZipFile(io.BytesIO(write_archive(threads=4))) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual([name for name, _ in ENTRIES], z.namelist())
+            self.assertEqual([data for _, data in ENTRIES], read_entries(z, z.namelist(), threads=4))
+            self.assertEqual((2017, 2, 8, 12, 0, 0), z.infolist()[0].date_time)
+
+    def test_reproducible_archive(self):
+        self.assertEqual(write_archive(threads=1), write_archive(threads=4))
+
+    def test_streamed_entry(self):
+        output = io.BytesIO()
+        with ZipWriter(output, threads=2) as z:
+            with z.open(ENTRIES[0][0]) as entry:
+                for offset in range(0, len(ENTRIES[0][1]), 3):
+                    entry.write(ENTRIES[0][1][offset:offset + 3])
+            z.write_entries(ENTRIES[1:])
+
+        with ZipFile(io.BytesIO(output.getvalue())) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual([data for _, data in ENTRIES], read_entries(z, z.namelist()))
+
+    def test_instrument_round_trip(self):
+        instrument = RenoiseInstrument()
+        instrument.root.SampleGenerator.Samples.append(instrument.sample_template)
+        instrument.root.SampleGenerator.ModulationSets.append(instrument.modulation_set_template)
+        instrument.sample_data.append(os.urandom(50000))
+
+        output_dir = tempfile.mkdtemp()
+        try:
+            output_filename = os.path.join(output_dir, 'round trip.xrni')
+            instrument.save(output_filename, threads=2)
+
+            loaded = RenoiseInstrument(output_filename, threads=2)
+            self.assertEqual(instrument.sample_data, loaded.sample_data)
+        finally:
+            shutil.rmtree(output_dir)
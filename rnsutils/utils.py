@@ -1,17 +1,17 @@
 """project wide utilities, notably audio format guessing and encoding"""
 
 import logging
-import subprocess
 
 import os
-import tempfile
+
+from . import budget, cache, progress, stats
 
 
 def guesstimate_audio_extension(data):
     """:arg data audio file content
     :return file format extension guessed from file content"""
 
-    if len(data) > 8 and data[0:8] == b'fLaC\0\0\0\x22':
+    if len(data) > 4 and data[0:4] == b'fLaC':
         return "flac"
     if len(data) > 3 and data[0:3] == b'Ogg':
         return "ogg"
@@ -21,57 +21,100 @@ def guesstimate_audio_extension(data):
 ENCODING_NONE = "none"
 ENCODING_FLAC = "flac"
 ENCODING_OGG = "ogg"
+ENCODINGS = [ENCODING_NONE, ENCODING_FLAC, ENCODING_OGG]
 
-
-def _call_encoder(func):
-    """decorator for creating a temporary file, calling an encoder and cleaning temporary files"""
-
-    def inner(sample_content):
-        """actual wrapping function to create and clean temporary files around audio encoding"""
-        out_format = guesstimate_audio_extension(sample_content)
-        in_filename = tempfile.NamedTemporaryFile(suffix='.wav', delete=False).name
-        out_filename = tempfile.NamedTemporaryFile(suffix='.{}'.format(out_format), delete=False).name
-        try:
-            with open(in_filename, "wb") as infile:
-                infile.write(sample_content)
-
-            func(in_filename, out_filename).communicate()
-
-            with open(out_filename, "rb") as outfile:
-                return outfile.read()
-        except:
-            logging.exception("Error while converting to %s", out_format)
-        finally:
-            os.remove(in_filename)
-            os.remove(out_filename)
-
-    return inner
-
-
-@_call_encoder
-def _encode_flac(in_filename, out_filename):
-    """encode :arg in_filename into :arg out_filename using flac"""
-    return subprocess.Popen(["flac", in_filename, "-f", "-o", out_filename], stderr=subprocess.STDOUT,
-                            stdout=subprocess.PIPE)
-
-
-@_call_encoder
-def _encode_ogg(in_filename, out_filename):
-    """encode :arg in_filename into :arg out_filename using ogg vorbis"""
-    return subprocess.Popen(["oggenc", in_filename, "-o", out_filename], stderr=subprocess.STDOUT,
-                            stdout=subprocess.PIPE)
+# external encoder command lines, given input and output filenames (see :class rnsutils.encoders.ExternalEncoder)
+ENCODER_COMMANDS = {
+    ENCODING_FLAC: lambda in_filename, out_filename: ["flac", in_filename, "-f", "-o", out_filename],
+    ENCODING_OGG: lambda in_filename, out_filename: ["oggenc", in_filename, "-o", out_filename],
+}
 
 
 def encode_audio_file(sample_content, encoding):
-    """encode :arg sample_content as audio file content into :arg encoding format"""
-    if encoding == ENCODING_FLAC:
-        return _encode_flac(sample_content)
-    elif encoding == ENCODING_OGG:
-        return _encode_ogg(sample_content)
-
-    return sample_content
-
-
+    """encode :arg sample_content as audio file content into :arg encoding format, with its preferred backend (see
+    :mod rnsutils.encoders)"""
+    stats.count('samples')
+    stats.count('sample_bytes', len(sample_content))
+
+    if encoding == ENCODING_NONE:
+        progress.advance(samples=1, bytes=len(sample_content))
+        return sample_content
+
+    from .encoders import backend
+    encoder = backend(encoding)
+
+    def encode():
+        with budget.reserve(budget.encode_cost(len(sample_content))), stats.timer('encode.{}'.format(encoding)):
+            return encoder.encode(sample_content)
+
+    if cache.enabled('encode'):
+        import hashlib
+        encoded = cache.cached('encode', (encoding, hashlib.sha1(sample_content).digest()), encode)
+    else:
+        encoded = encode()
+
+    progress.advance(samples=1, bytes=len(sample_content))
+    return encoded
+
+
+def encoding_list(value):
+    """argparse type of comma separated encodings, eg 'flac,ogg'
+    :return list of encodings"""
+    import argparse
+
+    encodings = []
+    for encoding in value.split(','):
+        if encoding not in ENCODINGS:
+            raise argparse.ArgumentTypeError("invalid encoding '{}' (choose from {})".format(encoding,
+                                                                                          ", ".join(ENCODINGS)))
+        if encoding not in encodings:
+            encodings.append(encoding)
+    return encodings
+
+
+def encode_samples(samples, encodings, threads=None):
+    """encode :arg samples into every format of :arg encodings, running encoders concurrently on :arg threads threads
+    [default: all cores]
+    :return {encoding: encoded samples}"""
+    from .ziputils import _map
+
+    jobs = [(sample, encoding) for encoding in encodings for sample in samples]
+    encoded_samples = iter(_map(lambda job: encode_audio_file(*job), jobs, threads))
+    return {encoding: [next(encoded_samples) for _ in samples] for encoding in encodings}
+
+
+def save_encoded(renoise_instrument, outputs, overwrite=False, threads=None, if_changed=False):
+    """save :arg renoise_instrument, whose samples are not encoded yet, once per (encoding, filename, fingerprint) of
+    :arg outputs, cleaning it up once and encoding its samples into all formats concurrently (see
+    :func encode_samples)
+    :return whether each output was written (see :meth rnsutils.instrument.RenoiseInstrument.save)"""
+    renoise_instrument.cleanup()
+    encoded_samples = encode_samples(renoise_instrument.sample_data, [encoding for encoding, _, _ in outputs], threads)
+
+    written = []
+    for encoding, filename, fingerprint in outputs:
+        renoise_instrument.sample_data = encoded_samples[encoding]
+        renoise_instrument.fingerprint = fingerprint
+        written.append(renoise_instrument.save(filename, overwrite=overwrite, cleanup=False, if_changed=if_changed))
+    return written
+
+
+def encoding_passes(encoding_count):
+    """:return times each sample goes through :func encode_audio_file when converting into :arg encoding_count
+    formats: encoded right away into a single one, else kept as is then encoded into each (see :func save_encoded)"""
+    return encoding_count + 1 if encoding_count > 1 else encoding_count
+
+
+def encoded_filename(filename, encoding, encodings):
+    """:return :arg filename of the output encoded into :arg encoding, suffixed by the encoding, as in
+    instrument.flac.xrni, when several :arg encodings are written"""
+    if len(encodings) == 1:
+        return filename
+    filename_without_extension, extension = os.path.splitext(filename)
+    return '{}.{}{}'.format(filename_without_extension, encoding, extension)
+
+
+@stats.timed('expand_keymap')
 def expand_keymap(instrument):
     """expand zones 'horizontally', ie keyranges, to cover as much as possible the whole key mapping"""
     for velocity in range(0, 256):
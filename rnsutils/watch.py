@@ -0,0 +1,227 @@
+"""watch mode of the converters, converting source files dropped into a directory as they appear or change.
+
+The directory tree is rescanned whenever inotify (linux, used through ctypes) reports a change in it, or every polling
+interval where inotify isn't available. A source file is converted once it and its dependencies (eg samples referenced
+by a SFZ file) have kept the same size and modification time for a settle delay, so that files still being copied are
+left alone, then again only when one of them changes. Conversions run on a bounded pool of worker threads, and a file
+changing while being converted is converted again once done."""
+
+import logging
+import os
+import sys
+import time
+
+from .fingerprint import file_signature
+
+DEFAULT_SETTLE = 2.
+DEFAULT_INTERVAL = 1.
+
+# IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_INOTIFY_MASK = 0x002 | 0x004 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200 | 0x400
+
+
+class _Inotify(object):
+    """wake up on changes in watched directories, through the linux inotify API. Events are not decoded, any of them
+    only triggers a rescan"""
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        libc_name = ctypes.util.find_library('c')
+        if not sys.platform.startswith('linux') or libc_name is None:
+            raise OSError("inotify is not available")
+
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        # IN_NONBLOCK and IN_CLOEXEC share their values with O_NONBLOCK and O_CLOEXEC
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add(self, directory):
+        """watch :arg directory, watching it again being harmless"""
+        if self._libc.inotify_add_watch(self.fd, os.fsencode(directory), _INOTIFY_MASK) < 0:
+            logging.debug("Can't watch %s", directory)
+
+    def wait(self, timeout):
+        """wait for changes at most :arg timeout seconds, None to wait until a change"""
+        import select
+
+        if select.select([self.fd], [], [], timeout)[0]:
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Poller(object):
+    """inotify fallback, waking up every :arg interval seconds"""
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    def add(self, directory):
+        pass
+
+    def wait(self, timeout):
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+
+    def close(self):
+        pass
+
+
+def notifier(interval=DEFAULT_INTERVAL, polling=False):
+    """:return inotify based notifier, or one polling every :arg interval seconds if inotify is not available or
+    :arg polling"""
+    if not polling:
+        try:
+            return _Inotify()
+        except (OSError, AttributeError):
+            logging.debug("inotify not available, polling every %s seconds", interval)
+    return _Poller(interval)
+
+
+class Watcher(object):
+    """track source files with :arg extensions under :arg directory, telling which are ready to be converted.
+    :arg dependencies callable returning files a source file conversion reads, starting with itself [default: itself]
+    :arg settle seconds a source and its dependencies must stay unchanged before being converted"""
+
+    def __init__(self, directory, extensions, dependencies=None, settle=DEFAULT_SETTLE):
+        self.directory = directory
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.dependencies = dependencies or (lambda filename: [filename])
+        self.settle = settle
+        # filename -> (state, time state was first seen)
+        self.seen = {}
+        # filename -> state when last converted
+        self.converted = {}
+        # filename -> (signature, dependencies), sources only being parsed again when they change
+        self._dependencies = {}
+
+    def sources(self):
+        """:return sorted filenames of source files found under the watched directory"""
+        sources = []
+        for directory, subdirectories, filenames in os.walk(self.directory):
+            subdirectories.sort()
+            sources.extend(os.path.join(directory, filename) for filename in sorted(filenames)
+                           if filename.lower().endswith(self.extensions))
+        return sources
+
+    def directories(self):
+        """:return directories to watch for changes, the watched tree and those holding dependencies"""
+        directories = set(directory for directory, _, _ in os.walk(self.directory))
+        directories.update(os.path.dirname(dependency) or '.' for _, dependencies in self._dependencies.values()
+                           for dependency in dependencies)
+        return sorted(directory for directory in directories if os.path.isdir(directory))
+
+    def _state(self, filename):
+        signature = file_signature(filename)
+        cached = self._dependencies.get(filename)
+        if cached is None or cached[0] != signature:
+            # noinspection PyBroadException
+            try:
+                dependencies = self.dependencies(filename)
+            except Exception:
+                logging.debug("Can't list dependencies of %s", filename, exc_info=True)
+                dependencies = [filename]
+            cached = self._dependencies[filename] = (signature, dependencies)
+
+        return tuple((dependency, file_signature(dependency)) for dependency in cached[1])
+
+    def scan(self, now=None):
+        """:return ([(filename, state), ...] of source files ready to be converted, seconds until some file may get
+        ready or None). Pass the state to :meth done once converted"""
+        now = time.monotonic() if now is None else now
+        ready = []
+        next_scan = None
+
+        sources = self.sources()
+        for filename in set(self.seen) - set(sources):
+            # removed sources are converted again if they come back
+            del self.seen[filename]
+            self.converted.pop(filename, None)
+            self._dependencies.pop(filename, None)
+
+        for filename in sources:
+            state = self._state(filename)
+            if state[0][1] is None:
+                continue
+
+            if filename not in self.seen or self.seen[filename][0] != state:
+                self.seen[filename] = (state, now)
+
+            waited = now - self.seen[filename][1]
+            if waited < self.settle:
+                next_scan = min(next_scan, self.settle - waited) if next_scan is not None else self.settle - waited
+            elif self.converted.get(filename) != state:
+                ready.append((filename, state))
+
+        return ready, next_scan
+
+    def done(self, filename, state):
+        """record :arg filename as converted from :arg state"""
+        self.converted[filename] = state
+
+
+def _convert(convert, filename):
+    # noinspection PyBroadException
+    try:
+        convert(filename)
+    except Exception:
+        logging.exception("Failed to convert %s", filename)
+
+
+def watch(directory, convert, extensions, dependencies=None, settle=DEFAULT_SETTLE, interval=DEFAULT_INTERVAL,
+          workers=1, polling=False, stop=None):
+    """call :arg convert on files with :arg extensions under :arg directory as they are added or changed, on at most
+    :arg workers threads, until interrupted or :arg stop (threading.Event) is set. When given a stop event, it is
+    checked at least every :arg interval seconds. See :class Watcher for :arg dependencies and :arg settle"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    watcher = Watcher(directory, extensions, dependencies, settle)
+    changes = notifier(interval, polling)
+    # filename -> future of conversions in progress
+    running = {}
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while stop is None or not stop.is_set():
+                for watched_directory in watcher.directories():
+                    changes.add(watched_directory)
+
+                for filename, future in list(running.items()):
+                    if future.done():
+                        del running[filename]
+
+                ready, timeout = watcher.scan()
+                for filename, state in ready:
+                    if filename not in running:
+                        watcher.done(filename, state)
+                        running[filename] = executor.submit(_convert, convert, filename)
+
+                if running or stop is not None:
+                    # conversions finishing don't wake us up
+                    timeout = min(timeout, interval) if timeout is not None else interval
+                changes.wait(timeout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        changes.close()
+
+
+def add_arguments(parser):
+    """add --watch, --watch-jobs, --watch-settle and --watch-interval options to argparse :arg parser"""
+    parser.add_argument("--watch", dest="watch", metavar="DIR",
+                        help="convert files added or changed in DIR until interrupted")
+    parser.add_argument("--watch-jobs", dest="watch_jobs", metavar="N", type=int, default=1,
+                        help="convert up to N files at once when watching [default: %(default)s]")
+    parser.add_argument("--watch-settle", dest="watch_settle", metavar="SECONDS", type=float, default=DEFAULT_SETTLE,
+                        help="wait for files to stay unchanged for SECONDS before converting them "
+                             "[default: %(default)s]")
+    parser.add_argument("--watch-interval", dest="watch_interval", metavar="SECONDS", type=float,
+                        default=DEFAULT_INTERVAL,
+                        help="polling interval where inotify is not available [default: %(default)s]")
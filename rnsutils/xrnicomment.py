@@ -22,7 +22,7 @@ import sys
 
 import os
 
-from rnsutils.instrument import RenoiseInstrument
+from rnsutils import stats
 
 __date__ = '2016-02-02'
 __updated__ = '2016-02-02'
@@ -61,6 +61,7 @@ def main(argv=None):
         parser.add_argument("-r", "--remove", dest="action", action="store_const", const=ACTION_DELETE,
                             help="remove comment")
         parser.add_argument("-v", "--version", action="version", version=program_version_string)
+        stats.add_arguments(parser)
 
         parser.add_argument("xrni_filename", help="input file in XRNI format", nargs="+")
 
@@ -78,23 +79,27 @@ def main(argv=None):
     else:
         logging.root.setLevel(logging.INFO)
 
+    from rnsutils.instrument import RenoiseInstrument
+
     if opts.action in (ACTION_EDIT, ACTION_APPEND) and opts.message is None:
         opts.message = sys.stdin.read()
 
-    for xrni_filename in opts.xrni_filename:
-        renoise_instrument = RenoiseInstrument(xrni_filename)
-
-        if opts.action == ACTION_DELETE:
-            del renoise_instrument.comment
-            renoise_instrument.save(xrni_filename, overwrite=True)
-        elif opts.action == ACTION_EDIT:
-            renoise_instrument.comment = opts.message
-            renoise_instrument.save(xrni_filename, overwrite=True)
-        elif opts.action == ACTION_APPEND:
-            renoise_instrument.comment += '\n' + opts.message
-            renoise_instrument.save(xrni_filename, overwrite=True)
-        else:
-            print(renoise_instrument.comment)
+    with stats.session(opts):
+        for xrni_filename in opts.xrni_filename:
+            stats.file(xrni_filename)
+            renoise_instrument = RenoiseInstrument(xrni_filename)
+
+            if opts.action == ACTION_DELETE:
+                del renoise_instrument.comment
+                renoise_instrument.save(xrni_filename, overwrite=True, if_changed=True)
+            elif opts.action == ACTION_EDIT:
+                renoise_instrument.comment = opts.message
+                renoise_instrument.save(xrni_filename, overwrite=True, if_changed=True)
+            elif opts.action == ACTION_APPEND:
+                renoise_instrument.comment += '\n' + opts.message
+                renoise_instrument.save(xrni_filename, overwrite=True, if_changed=True)
+            else:
+                print(renoise_instrument.comment)
 
     return 0
 
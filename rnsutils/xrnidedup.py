@@ -0,0 +1,311 @@
+# xrnidedup. find and deduplicate samples shared among XRNI files
+# Copyright (C) 2017  Olivier Jolly
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""CLI for finding samples duplicated among XRNI files and storing them once.
+
+Samples are first compared by the CRC and size recorded in the zip central directory, which costs no decompression,
+then only those sharing both are inflated by chunks and hashed to confirm they are identical, each file being opened
+once for all its candidates.
+
+Instruments can be rewritten in a deduplicated layout: a sample store holding every distinct sample once, as
+``<sha1[:2]>/<sha1>.<extension>``, and stripped instruments where samples are replaced by references into the store,
+listed in their SampleStore.json entry. Stripped instruments are for our own tooling, renoise can't load them until
+restored."""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import sys
+from collections import namedtuple, OrderedDict
+
+import os
+
+from rnsutils import stats
+
+__date__ = '2017-03-08'
+__updated__ = '2017-03-08'
+__author__ = 'olivier@pcedev.com'
+
+SAMPLE_ENTRY_PREFIX = 'SampleData/'
+STORE_MANIFEST = 'SampleStore.json'
+
+# sample :arg name entry of :arg filename, with its :arg crc, :arg size and :arg compressed_size from the central
+# directory
+SampleEntry = namedtuple('SampleEntry', ['filename', 'name', 'crc', 'size', 'compressed_size'])
+
+
+def find_xrni(paths, recursive=False):
+    """:return iterator over (filename, name relative to the directory it was found in) of XRNI files among
+    :arg paths, looking into directories if :arg recursive"""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path, os.path.basename(path)
+        elif recursive:
+            for directory, subdirectories, filenames in os.walk(path):
+                subdirectories.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith('.xrni'):
+                        yield os.path.join(directory, filename), os.path.relpath(os.path.join(directory, filename),
+                                                                                 path)
+
+
+def _output_filename(output_dir, relative_name):
+    output_filename = os.path.join(output_dir, relative_name)
+    if not os.path.isdir(os.path.dirname(output_filename)):
+        os.makedirs(os.path.dirname(output_filename))
+    return output_filename
+
+
+def scan_file(filename):
+    """:return SampleEntry of every sample in :arg filename, read from the zip central directory only"""
+    from zipfile import ZipFile
+
+    with ZipFile(filename) as z:
+        return [SampleEntry(filename, info.filename, info.CRC, info.file_size, info.compress_size)
+                for info in z.infolist() if info.filename.startswith(SAMPLE_ENTRY_PREFIX)]
+
+
+def _scan_file(filename):
+    try:
+        return scan_file(filename)
+    except Exception:
+        logging.exception("Failed to scan %s", filename)
+        return []
+
+
+def content_hashes(sample_entries):
+    """:return sha1 hex digests of the contents of :arg sample_entries, all entries of the same file, inflated by
+    chunks"""
+    from zipfile import ZipFile
+    from rnsutils.compare import entry_digest
+
+    with ZipFile(sample_entries[0].filename) as z:
+        return [entry_digest(z, sample_entry.name) for sample_entry in sample_entries]
+
+
+def scan(filenames, threads=None):
+    """:return SampleEntry of every sample in :arg filenames, scanned on :arg threads threads [default: all cores]"""
+    from rnsutils.ziputils import _map
+
+    with stats.timer('dedup.scan'):
+        return [sample_entry for sample_entries in _map(_scan_file, filenames, threads)
+                for sample_entry in sample_entries]
+
+
+def find_duplicates(sample_entries, threads=None):
+    """:return {sha1: [SampleEntry, ...]} of samples found more than once among :arg sample_entries. Only samples
+    sharing their CRC and size are hashed, on :arg threads threads [default: all cores]"""
+    from rnsutils.ziputils import _map
+
+    candidates = OrderedDict()
+    for sample_entry in sample_entries:
+        candidates.setdefault((sample_entry.crc, sample_entry.size), []).append(sample_entry)
+    # each file is opened once, to hash all its candidates
+    candidates_by_file = OrderedDict()
+    for sample_entry in (sample_entry for group in candidates.values() if len(group) > 1 for sample_entry in group):
+        candidates_by_file.setdefault(sample_entry.filename, []).append(sample_entry)
+    candidates_by_file = list(candidates_by_file.values())
+
+    duplicates = OrderedDict()
+    with stats.timer('dedup.hash'):
+        for sample_entries, sha1s in zip(candidates_by_file, _map(content_hashes, candidates_by_file, threads)):
+            for sample_entry, sha1 in zip(sample_entries, sha1s):
+                duplicates.setdefault(sha1, []).append(sample_entry)
+
+    return OrderedDict((sha1, group) for sha1, group in duplicates.items() if len(group) > 1)
+
+
+def reclaimable_bytes(duplicates):
+    """:return archive bytes saved by storing once each sample of :arg duplicates (see :func find_duplicates)"""
+    return sum(sample_entry.compressed_size for group in duplicates.values() for sample_entry in group[1:])
+
+
+def report(sample_entries, duplicates):
+    """:return json serializable duplicate report"""
+    return {'samples': len(sample_entries),
+            'sample_bytes': sum(sample_entry.compressed_size for sample_entry in sample_entries),
+            'duplicated_samples': len(duplicates),
+            'reclaimable_bytes': reclaimable_bytes(duplicates),
+            'duplicates': [{'sha1': sha1, 'size': group[0].size,
+                            'entries': [[sample_entry.filename, sample_entry.name] for sample_entry in group]}
+                           for sha1, group in duplicates.items()]}
+
+
+def store_instrument(filename, store_dir, output_filename):
+    """write into :arg output_filename the instrument :arg filename stripped of its samples, which are written into
+    :arg store_dir unless already there
+    :return bytes written into the store"""
+    import hashlib
+    import json
+    from zipfile import ZipFile
+
+    from rnsutils.utils import guesstimate_audio_extension
+    from rnsutils.ziputils import ZipWriter
+
+    written_bytes = 0
+    manifest = []
+    with ZipFile(filename) as z, ZipWriter(output_filename + '.part') as stripped:
+        stripped.comment = z.comment
+        for info in z.infolist():
+            content = z.read(info)
+            if not info.filename.startswith(SAMPLE_ENTRY_PREFIX):
+                stripped.writestr(info.filename, content)
+                manifest.append({'name': info.filename})
+                continue
+
+            sha1 = hashlib.sha1(content).hexdigest()
+            sample_filename = '{}/{}.{}'.format(sha1[:2], sha1, guesstimate_audio_extension(content) or 'wav')
+            manifest.append({'name': info.filename, 'sample': sample_filename})
+
+            store_filename = os.path.join(store_dir, sample_filename)
+            if not os.path.isfile(store_filename):
+                if not os.path.isdir(os.path.dirname(store_filename)):
+                    os.makedirs(os.path.dirname(store_filename))
+                with open(store_filename + '.part', 'wb') as store_file:
+                    store_file.write(content)
+                os.rename(store_filename + '.part', store_filename)
+                written_bytes += len(content)
+
+        stripped.writestr(STORE_MANIFEST, json.dumps(manifest, indent=1).encode('utf-8'))
+
+    os.rename(output_filename + '.part', output_filename)
+    return written_bytes
+
+
+def restore_instrument(filename, store_dir, output_filename):
+    """write into :arg output_filename the instrument :arg filename, stripped by :func store_instrument, with its
+    samples read back from :arg store_dir"""
+    import json
+    from zipfile import ZipFile
+
+    from rnsutils.ziputils import ZipWriter
+
+    with ZipFile(filename) as z, ZipWriter(output_filename + '.part') as restored:
+        restored.comment = z.comment
+        for entry in json.loads(z.read(STORE_MANIFEST).decode('utf-8')):
+            if 'sample' not in entry:
+                restored.writestr(entry['name'], z.read(entry['name']))
+                continue
+            with open(os.path.join(store_dir, entry['sample']), 'rb') as sample_file:
+                restored.writestr(entry['name'], sample_file.read())
+
+    os.rename(output_filename + '.part', output_filename)
+
+
+def main(argv=None):
+    program_name = os.path.basename(sys.argv[0])
+    program_version = "v0.9"
+    program_build_date = "%s" % __updated__
+
+    program_version_string = 'xrnidedup %s (%s)' % (program_version, program_build_date)
+    program_longdesc = '''Find samples duplicated among XRNI files and store them once'''
+    program_license = "GPL v3+ 2017 Olivier Jolly"
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    try:
+        parser = argparse.ArgumentParser(epilog=program_longdesc,
+                                         description=program_license)
+        parser.add_argument("-d", "--debug", dest="debug", action="store_true",
+                            default=False,
+                            help="debug parsing [default: %(default)s]")
+        parser.add_argument("--json", dest="json", metavar="FILE", help="write the duplicate report into FILE")
+        parser.add_argument("-o", "--ouput-dir", dest="output_dir",
+                            help="output directory of stripped or restored instruments")
+        parser.add_argument("-q", "--quiet", dest="quiet", action="store_true", default=False,
+                            help="quiet operation [default: %(default)s]")
+        parser.add_argument("-r", "--recursive", dest="recurse_dir", action="store_true", default=False,
+                            help="recursively parse directories [default: %(default)s]")
+        parser.add_argument("--restore", dest="restore", action="store_true", default=False,
+                            help="restore stripped instruments from the sample store [default: %(default)s]")
+        parser.add_argument("-s", "--store", dest="store_dir",
+                            help="sample store directory, instruments are stripped into the output directory")
+        parser.add_argument("-t", "--threads", dest="threads", type=int,
+                            help="threads scanning and hashing samples [default: all cores]")
+        parser.add_argument("-v", "--version", action="version", version=program_version_string)
+        stats.add_arguments(parser)
+
+        parser.add_argument("xrni_filename", help="input file in XRNI format or directory", nargs="+")
+
+        # process options
+        opts = parser.parse_args(argv)
+
+        if opts.store_dir and not opts.output_dir:
+            parser.error("an output directory is needed along with a sample store")
+        if opts.restore and not opts.store_dir:
+            parser.error("restoring needs the sample store")
+
+    except Exception as e:
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help")
+        return 2
+
+    if opts.debug:
+        logging.root.setLevel(logging.DEBUG)
+    else:
+        logging.root.setLevel(logging.INFO)
+
+    with stats.session(opts):
+        xrni_files = list(find_xrni(opts.xrni_filename, opts.recurse_dir))
+        xrni_filenames = [xrni_filename for xrni_filename, _ in xrni_files]
+
+        if opts.restore:
+            for xrni_filename, relative_name in xrni_files:
+                stats.file(xrni_filename)
+                output_filename = _output_filename(opts.output_dir, relative_name)
+                restore_instrument(xrni_filename, opts.store_dir, output_filename)
+                if not opts.quiet:
+                    print("Restored {}".format(output_filename))
+            return 0
+
+        sample_entries = scan(xrni_filenames, opts.threads)
+        duplicates = find_duplicates(sample_entries, opts.threads)
+        duplicate_report = report(sample_entries, duplicates)
+
+        if not opts.quiet:
+            for duplicate in duplicate_report['duplicates']:
+                print("{} ({} bytes) found {} times:".format(duplicate['sha1'], duplicate['size'],
+                                                              len(duplicate['entries'])))
+                for filename, name in duplicate['entries']:
+                    print("  {}:{}".format(filename, name))
+            print("{} samples in {} files, {} duplicated, {} bytes reclaimable".format(
+                duplicate_report['samples'], len(xrni_filenames), duplicate_report['duplicated_samples'],
+                duplicate_report['reclaimable_bytes']))
+
+        if opts.json:
+            import io
+            import json
+
+            with io.open(opts.json, 'w') as report_file:
+                report_file.write(json.dumps(duplicate_report, indent=2))
+
+        if opts.store_dir:
+            stored_bytes = 0
+            for xrni_filename, relative_name in xrni_files:
+                stats.file(xrni_filename)
+                output_filename = _output_filename(opts.output_dir, relative_name)
+                stored_bytes += store_instrument(xrni_filename, opts.store_dir, output_filename)
+            if not opts.quiet:
+                print("Stored {} bytes of samples into {}".format(stored_bytes, opts.store_dir))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
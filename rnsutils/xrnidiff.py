@@ -0,0 +1,116 @@
+# xrnidiff. report differences between XRNI files
+# Copyright (C) 2017  Olivier Jolly
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""CLI reporting which samples, sample mappings or metadata differ between two XRNI files.
+
+Instruments are compared structurally (see :mod rnsutils.compare): Instrument.xml trees element by element, whatever
+their formatting, and samples by their sha1, computed while inflating them by chunks, so that memory use doesn't
+depend on sample sizes."""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import sys
+
+import os
+
+from rnsutils import stats
+
+__date__ = '2017-03-24'
+__updated__ = '2017-03-24'
+__author__ = 'olivier@pcedev.com'
+
+
+def main(argv=None):
+    program_name = os.path.basename(sys.argv[0])
+    program_version = "v0.9"
+    program_build_date = "%s" % __updated__
+
+    program_version_string = 'xrnidiff %s (%s)' % (program_version, program_build_date)
+    program_longdesc = '''Report differences between XRNI files, exiting with status 1 if they differ'''
+    program_license = "GPL v3+ 2017 Olivier Jolly"
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    try:
+        parser = argparse.ArgumentParser(epilog=program_longdesc,
+                                         description=program_license)
+        parser.add_argument("-d", "--debug", dest="debug", action="store_true",
+                            default=False,
+                            help="debug parsing [default: %(default)s]")
+        parser.add_argument("--ignore-fingerprint", dest="ignore_fingerprint", action="store_true", default=False,
+                            help="don't report differing conversion fingerprints [default: %(default)s]")
+        parser.add_argument("--json", dest="json", metavar="FILE",
+                            help="write the differences into FILE, - for standard output")
+        parser.add_argument("-q", "--quiet", dest="quiet", action="store_true", default=False,
+                            help="quiet operation [default: %(default)s]")
+        parser.add_argument("-v", "--version", action="version", version=program_version_string)
+        stats.add_arguments(parser)
+
+        parser.add_argument("first_filename", help="first file in XRNI format")
+        parser.add_argument("second_filename", help="second file in XRNI format")
+
+        # process options
+        opts = parser.parse_args(argv)
+
+    except Exception as e:
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help")
+        return 2
+
+    if opts.debug:
+        logging.root.setLevel(logging.DEBUG)
+    else:
+        logging.root.setLevel(logging.INFO)
+
+    from rnsutils.compare import describe_file, differences, format_difference
+
+    with stats.session(opts):
+        # noinspection PyBroadException
+        try:
+            with stats.timer('describe'):
+                descriptions = [describe_file(filename) for filename in (opts.first_filename, opts.second_filename)]
+        except Exception:
+            logging.exception("Failed to read instruments")
+            return 2
+
+        with stats.timer('compare'):
+            found = [difference for difference in differences(*descriptions) if
+                     not (opts.ignore_fingerprint and difference.path == 'fingerprint' and difference.sample is None)]
+
+        if not opts.quiet and opts.json != '-':
+            for difference in found:
+                print(format_difference(difference))
+
+        if opts.json:
+            import io
+            import json
+
+            report = json.dumps([difference._asdict() for difference in found], indent=2)
+            if opts.json == '-':
+                print(report)
+            else:
+                with io.open(opts.json, 'w') as report_file:
+                    report_file.write(report)
+
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# xrniextract. extract samples of XRNI files along with a SFZ mapping
+# Copyright (C) 2017  Olivier Jolly
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""CLI extracting samples of XRNI files into a directory tree, along with a SFZ file mapping them as the instrument
+does.
+
+Samples are inflated straight to disk by chunks, on several threads, without loading the instrument: memory use
+doesn't depend on sample sizes. An instrument ``piano.xrni`` is extracted as ``piano.sfz`` and a ``piano/`` directory
+holding its samples, named after the instrument sample names."""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import re
+import sys
+
+import os
+
+from rnsutils import stats
+from rnsutils.xrnidedup import SAMPLE_ENTRY_PREFIX, find_xrni
+
+__date__ = '2017-03-22'
+__updated__ = '2017-03-22'
+__author__ = 'olivier@pcedev.com'
+
+# characters not allowed in sample filenames on common filesystems
+_UNSAFE_CHARACTERS = re.compile(r'[\x00-\x1f<>:"/\\|?*]')
+
+_SAMPLE_INDEX = re.compile(r'^{}Sample(\d+)'.format(SAMPLE_ENTRY_PREFIX))
+
+
+def safe_filename(name, default):
+    """:return :arg name usable as a filename, :arg default if nothing is left of it"""
+    return _UNSAFE_CHARACTERS.sub('_', name).strip(' .') or default
+
+
+def sample_entries(names):
+    """:return {sample index: entry name} of sample entries among zip entry :arg names. Entries are indexed by the
+    number in their name, those without being indexed by their rank as instrument loading does"""
+    entries = sorted(name for name in names if name.startswith(SAMPLE_ENTRY_PREFIX))
+    indexes = [_SAMPLE_INDEX.match(name) for name in entries]
+    if all(indexes) and len(set(int(index.group(1)) for index in indexes)) == len(entries):
+        return {int(index.group(1)): name for index, name in zip(indexes, entries)}
+    return dict(enumerate(entries))
+
+
+def _text(element, path, default):
+    text = element.findtext(path)
+    return default if text is None or not text.strip() else text.strip()
+
+
+def sfz_region(sample, sample_path):
+    """:return SFZ lines of the region playing :arg sample_path as :arg sample, an Instrument.xml Sample element"""
+    import math
+
+    lines = ['<region>', 'sample={}'.format(sample_path),
+             'lokey={}'.format(_text(sample, 'Mapping/NoteStart', 0)),
+             'hikey={}'.format(_text(sample, 'Mapping/NoteEnd', 119)),
+             'pitch_keycenter={}'.format(_text(sample, 'Mapping/BaseNote', 48)),
+             'lovel={}'.format(_text(sample, 'Mapping/VelocityStart', 0)),
+             'hivel={}'.format(_text(sample, 'Mapping/VelocityEnd', 127))]
+
+    if _text(sample, 'Mapping/MapKeyToPitch', 'true') == 'false':
+        lines.append('pitch_keytrack=0')
+    if _text(sample, 'Mapping/Layer', '') == 'Note-Off Layer':
+        lines.append('trigger=release')
+
+    if int(_text(sample, 'Transpose', 0)):
+        lines.append('transpose={}'.format(_text(sample, 'Transpose', 0)))
+    if int(_text(sample, 'Finetune', 0)):
+        lines.append('tune={}'.format(int(round(int(_text(sample, 'Finetune', 0)) * 100 / 128.))))
+    volume = float(_text(sample, 'Volume', 1))
+    if volume != 1:
+        lines.append('volume={:.2f}'.format(8.68 * math.log(volume) if volume > 0 else -144))
+    panning = float(_text(sample, 'Panning', .5))
+    if panning != .5:
+        lines.append('pan={:.1f}'.format((panning - .5) * 200))
+
+    if _text(sample, 'LoopMode', 'Off') != 'Off' and sample.findtext('LoopStart') is not None:
+        lines += ['loop_mode=loop_continuous', 'loop_start={}'.format(_text(sample, 'LoopStart', 0)),
+                  'loop_end={}'.format(_text(sample, 'LoopEnd', 0))]
+
+    return lines
+
+
+def _extract_entry(task):
+    import shutil
+    from zipfile import ZipFile
+
+    from rnsutils.ziputils import CHUNK_SIZE
+
+    filename, name, destination = task
+    # each task reads through its own ZipFile so that entries are inflated concurrently
+    with ZipFile(filename) as z, z.open(name) as entry, open(destination + '.part', 'wb') as sample_file:
+        shutil.copyfileobj(entry, sample_file, CHUNK_SIZE)
+    os.replace(destination + '.part', destination)
+    return os.path.getsize(destination)
+
+
+def extract_file(filename, output_base, sfz=True, threads=None):
+    """extract samples of :arg filename into :arg output_base directory, and write the :arg output_base.sfz file
+    mapping them unless not :arg sfz. Samples are extracted on :arg threads threads [default: all cores]
+    :return list of extracted sample filenames"""
+    from zipfile import ZipFile
+
+    from lxml import etree
+
+    from rnsutils.ziputils import _map
+
+    with ZipFile(filename) as z:
+        with stats.timer('xml.parse'):
+            root = etree.fromstring(z.read('Instrument.xml'))
+        entries = sample_entries(z.namelist())
+
+    samples = root.findall('SampleGenerator/Samples/Sample')
+    tasks = []
+    regions = []
+    used_filenames = set()
+    for sample_idx, sample in enumerate(samples):
+        name = entries.get(sample_idx)
+        if name is None:
+            logging.info("no sample data for sample %d of %s", sample_idx, filename)
+            continue
+
+        stem = safe_filename(_text(sample, 'Name', ''), 'Sample{:02}'.format(sample_idx))
+        extension = os.path.splitext(name)[1].lower() or '.wav'
+        sample_filename = stem + extension
+        duplicate_idx = 1
+        while sample_filename.lower() in used_filenames:
+            duplicate_idx += 1
+            sample_filename = '{} ({}){}'.format(stem, duplicate_idx, extension)
+        used_filenames.add(sample_filename.lower())
+
+        tasks.append((filename, name, os.path.join(output_base, sample_filename)))
+        regions += sfz_region(sample, '{}/{}'.format(os.path.basename(output_base), sample_filename))
+
+    if not os.path.isdir(output_base):
+        os.makedirs(output_base)
+
+    with stats.timer('extract.samples'):
+        stats.count('extract.bytes', sum(_map(_extract_entry, tasks, threads)))
+
+    if sfz:
+        import io
+
+        with io.open(output_base + '.sfz', 'w', encoding='utf-8') as sfz_file:
+            sfz_file.writelines(line + '\n' for line in ['// extracted from {} by xrniextract'.format(
+                os.path.basename(filename))] + regions)
+
+    return [destination for _, _, destination in tasks]
+
+
+def main(argv=None):
+    program_name = os.path.basename(sys.argv[0])
+    program_version = "v0.9"
+    program_build_date = "%s" % __updated__
+
+    program_version_string = 'xrniextract %s (%s)' % (program_version, program_build_date)
+    program_longdesc = '''Extract samples of XRNI files along with SFZ files mapping them'''
+    program_license = "GPL v3+ 2017 Olivier Jolly"
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    try:
+        parser = argparse.ArgumentParser(epilog=program_longdesc,
+                                         description=program_license)
+        parser.add_argument("-d", "--debug", dest="debug", action="store_true",
+                            default=False,
+                            help="debug parsing [default: %(default)s]")
+        parser.add_argument("--no-sfz", dest="sfz", action="store_false", default=True,
+                            help="only extract samples, without SFZ mapping [default: %(default)s]")
+        parser.add_argument("-o", "--ouput-dir", dest="output_dir", default=".",
+                            help="output directory [default: %(default)s]")
+        parser.add_argument("-q", "--quiet", dest="quiet", action="store_true", default=False,
+                            help="quiet operation [default: %(default)s]")
+        parser.add_argument("-r", "--recursive", dest="recurse_dir", action="store_true", default=False,
+                            help="recursively parse directories [default: %(default)s]")
+        parser.add_argument("-t", "--threads", dest="threads", type=int,
+                            help="threads extracting samples [default: all cores]")
+        parser.add_argument("-v", "--version", action="version", version=program_version_string)
+        stats.add_arguments(parser)
+
+        parser.add_argument("xrni_filename", help="input file in XRNI format or directory", nargs="+")
+
+        # process options
+        opts = parser.parse_args(argv)
+
+    except Exception as e:
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help")
+        return 2
+
+    if opts.debug:
+        logging.root.setLevel(logging.DEBUG)
+    else:
+        logging.root.setLevel(logging.INFO)
+
+    with stats.session(opts):
+        for xrni_filename, relative_name in find_xrni(opts.xrni_filename, opts.recurse_dir):
+            stats.file(xrni_filename)
+            output_base = os.path.join(opts.output_dir, os.path.splitext(relative_name)[0])
+            if not opts.quiet:
+                print("Extracting '{}'".format(xrni_filename))
+
+            try:
+                extract_file(xrni_filename, output_base, opts.sfz, opts.threads)
+            except Exception:
+                logging.exception("Failed to extract %s", xrni_filename)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,7 +22,7 @@ import sys
 
 import os
 
-from rnsutils.instrument import RenoiseInstrument
+from rnsutils import stats
 
 __date__ = '2016-02-02'
 __updated__ = '2016-02-02'
@@ -82,6 +82,7 @@ def main(argv=None):
                             help="recursively parse directories [default: %(default)s]")
         parser.add_argument("-o", "--ouput-dir", dest="output_dir", help="output directory", required=True)
         parser.add_argument("-v", "--version", action="version", version=program_version_string)
+        stats.add_arguments(parser)
 
         parser.add_argument("xrni_filename", help="input file in XRNI format", nargs="+")
 
@@ -99,19 +100,22 @@ def main(argv=None):
     else:
         logging.root.setLevel(logging.INFO)
 
-    if opts.clean:
-        if opts.dry_run:
-            print("I would clean {}".format(opts.output_dir))
-        else:
-            clean_directory(opts.output_dir)
+    with stats.session(opts):
+        if opts.clean:
+            if opts.dry_run:
+                print("I would clean {}".format(opts.output_dir))
+            else:
+                clean_directory(opts.output_dir)
 
-    for xrni_filename in opts.xrni_filename:
-        organise_file(opts, xrni_filename)
+        for xrni_filename in opts.xrni_filename:
+            organise_file(opts, xrni_filename)
 
     return 0
 
 
 def organise_file(opts, filename):
+    from rnsutils.instrument import RenoiseInstrument
+
     full_filename = os.path.realpath(filename)
 
     # recursively parse directory if told to
@@ -121,6 +125,7 @@ def organise_file(opts, filename):
                 organise_file(opts, os.path.join(full_filename, file))
         return
 
+    stats.file(full_filename)
     renoise_instrument = RenoiseInstrument(full_filename)
     tags = renoise_instrument.tags
     destination_directories = get_destination_directories(tags, opts)
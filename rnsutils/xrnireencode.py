@@ -21,10 +21,11 @@ from __future__ import print_function
 import argparse
 import logging
 import sys
+from contextlib import nullcontext
 
 import os
 
-from rnsutils.instrument import RenoiseInstrument
+from rnsutils import analysis, budget, encoders, progress, resample, stats
 from rnsutils.utils import ENCODING_FLAC, ENCODING_OGG, encode_audio_file
 
 __date__ = '2016-01-31'
@@ -32,6 +33,36 @@ __updated__ = '2016-01-31'
 __author__ = 'olivier@pcedev.com'
 
 
+def encode_samples(samples, encoding, pool=None):
+    """:return :arg samples encoded into :arg encoding format, on :arg pool processes if given (see
+    :mod rnsutils.sharedmem)"""
+    if pool is None:
+        return [encode_audio_file(sample, encoding) for sample in samples]
+    return pool.encode(samples, encoding)
+
+
+def file_work(xrni_filename, samples_index=None):
+    """:return work (see :mod rnsutils.progress) of reencoding :arg xrni_filename, or only its :arg samples_index
+    samples, read from the zip central directory"""
+    from zipfile import ZipFile
+
+    work = {'files': 1, 'instruments': 1, 'samples': 0, 'bytes': 0}
+    # noinspection PyBroadException
+    try:
+        with ZipFile(xrni_filename) as z:
+            sample_sizes = [info.file_size for info in sorted(z.infolist(), key=lambda info: info.filename)
+                            if info.filename.startswith('SampleData')]
+    except Exception:
+        logging.debug("Can't estimate the work of reencoding %s", xrni_filename, exc_info=True)
+        return work
+
+    if samples_index:
+        sample_sizes = [sample_sizes[sample_index] for sample_index in set(samples_index)
+                        if -len(sample_sizes) <= sample_index < len(sample_sizes)]
+    work.update(samples=len(sample_sizes), bytes=sum(sample_sizes))
+    return work
+
+
 def main(argv=None):
     """CLI entry point for reencoding XRNI files"""
     program_name = os.path.basename(sys.argv[0])
@@ -48,11 +79,19 @@ def main(argv=None):
     try:
         parser = argparse.ArgumentParser(epilog=program_longdesc,
                                          description=program_license)
+        parser.add_argument("--compact-xml", dest="compact_xml", action="store_true", default=False,
+                            help="save Instrument.xml without indentation [default: %(default)s]")
         parser.add_argument("-d", "--debug", dest="debug", action="store_true",
                             default=False,
                             help="debug parsing [default: %(default)s]")
+        parser.add_argument("--deterministic", dest="deterministic", action="store_true", default=False,
+                            help="save byte reproducible instruments, with fixed timestamps and canonical "
+                                 "Instrument.xml [default: %(default)s]")
         parser.add_argument("-e", "--encode", dest="encoding", choices=[ENCODING_FLAC, ENCODING_OGG],
                             default=ENCODING_FLAC, help="encode samples into given format [default: %(default)s]")
+        parser.add_argument("-j", "--jobs", dest="jobs", type=int, default=0,
+                            help="encode samples on JOBS processes, passing them through shared memory "
+                                 "[default: in process]")
         parser.add_argument("-q", "--quiet", dest="quiet", action="store_true", default=False,
                             help="quiet operation [default: %(default)s]")
         parser.add_argument("-o", "--ouput-dir", dest="output_dir",
@@ -60,6 +99,10 @@ def main(argv=None):
         parser.add_argument("-s", "--sample", dest="samples_index", action="append", type=int,
                             help="sample index to reencode [default: all]")
         parser.add_argument("-v", "--version", action="version", version=program_version_string)
+        resample.add_arguments(parser)
+        budget.add_arguments(parser)
+        progress.add_arguments(parser)
+        stats.add_arguments(parser)
 
         parser.add_argument("xrni_filename", help="input file in XRNI format", nargs="+")
 
@@ -77,39 +120,76 @@ def main(argv=None):
     else:
         logging.root.setLevel(logging.INFO)
 
-    for xrni_filename in opts.xrni_filename:
-
-        if not opts.quiet:
-            print("Reencoding samples from '{}'".format(xrni_filename))
-
-        # noinspection PyBroadException
-        try:
-            renoise_instrument = RenoiseInstrument(xrni_filename)
-
-            # reencode all samples
-            if opts.samples_index:
-                for sample_index in opts.samples_index:
-                    try:
-                        renoise_instrument.sample_data[sample_index] = encode_audio_file(
-                            renoise_instrument.sample_data[sample_index], opts.encoding)
-                    except IndexError:
-                        logging.error("Failed to convert sample %d", sample_index)
-            else:
-                renoise_instrument.sample_data = [encode_audio_file(sample, opts.encoding) for sample in
-                                                  renoise_instrument.sample_data]
-
-            # save the output file
-            filename_without_extension, _ = os.path.splitext(os.path.basename(xrni_filename))
-            output_filename = os.path.join(opts.output_dir or os.path.dirname(xrni_filename),
-                                           '{}.{}.xrni'.format(filename_without_extension, opts.encoding))
-            renoise_instrument.save(output_filename)
+    if (opts.sample_rate or opts.bit_depth) and not analysis.available():
+        sys.stderr.write(program_name + ": reducing samples needs numpy\n")
+        return 2
+
+    encoding_error = encoders.check([opts.encoding])
+    if encoding_error:
+        sys.stderr.write(program_name + ": " + encoding_error + "\n")
+        return 2
+
+    from rnsutils.instrument import RenoiseInstrument
+    from rnsutils.sharedmem import SharedMemoryPool
+
+    with stats.session(opts), budget.session(opts), progress.session(opts), \
+            (SharedMemoryPool(opts.jobs) if opts.jobs else nullcontext()) as pool:
+        if progress.enabled():
+            for xrni_filename in opts.xrni_filename:
+                progress.add_total(**file_work(xrni_filename, opts.samples_index))
+
+        for xrni_filename in opts.xrni_filename:
+            stats.file(xrni_filename)
 
             if not opts.quiet:
-                print("Saved {}".format(output_filename))
-        except Exception:  # pylint: disable=broad-except
-            if not opts.quiet:
-                print("FAILED")
-            logging.exception("Failed to reencode instrument")
+                print("Reencoding samples from '{}'".format(xrni_filename))
+
+            # noinspection PyBroadException
+            try:
+                renoise_instrument = RenoiseInstrument(xrni_filename)
+                renoise_instrument.compact = opts.compact_xml
+                renoise_instrument.deterministic = opts.deterministic
+
+                # reduce samples before encoding them
+                if opts.sample_rate or opts.bit_depth:
+                    for sample_index, renoise_sample in enumerate(renoise_instrument.samples):
+                        if opts.samples_index and sample_index not in opts.samples_index:
+                            continue
+                        renoise_instrument.sample_data[sample_index] = resample.reduce_wav(
+                            renoise_instrument.sample_data[sample_index], renoise_sample, opts.sample_rate,
+                            opts.bit_depth)
+
+                # reencode all samples
+                if opts.samples_index:
+                    samples_index = []
+                    for sample_index in opts.samples_index:
+                        if -len(renoise_instrument.sample_data) <= sample_index < len(renoise_instrument.sample_data):
+                            samples_index.append(sample_index)
+                        else:
+                            logging.error("Failed to convert sample %d", sample_index)
+
+                    for sample_index, sample in zip(samples_index, encode_samples(
+                            [renoise_instrument.sample_data[sample_index] for sample_index in samples_index],
+                            opts.encoding, pool)):
+                        renoise_instrument.sample_data[sample_index] = sample
+                else:
+                    renoise_instrument.sample_data = encode_samples(renoise_instrument.sample_data, opts.encoding,
+                                                                    pool)
+
+                # save the output file
+                filename_without_extension, _ = os.path.splitext(os.path.basename(xrni_filename))
+                output_filename = os.path.join(opts.output_dir or os.path.dirname(xrni_filename),
+                                               '{}.{}.xrni'.format(filename_without_extension, opts.encoding))
+                renoise_instrument.save(output_filename)
+
+                if not opts.quiet:
+                    print("Saved {}".format(output_filename))
+            except Exception:  # pylint: disable=broad-except
+                if not opts.quiet:
+                    print("FAILED")
+                logging.exception("Failed to reencode instrument")
+            finally:
+                progress.advance(files=1, instruments=1)
 
     return 0
 
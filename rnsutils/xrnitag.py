@@ -22,7 +22,7 @@ import sys
 
 import os
 
-from rnsutils.instrument import RenoiseInstrument
+from rnsutils import stats
 
 __date__ = '2016-02-02'
 __updated__ = '2016-02-02'
@@ -58,6 +58,7 @@ def main(argv=None):
                             default=ACTION_VIEW, help="clear all tags")
         parser.add_argument("-r", "--remove", dest="tags_to_remove", action="append", help="remove a tag")
         parser.add_argument("-v", "--version", action="version", version=program_version_string)
+        stats.add_arguments(parser)
 
         parser.add_argument("xrni_filename", help="input file in XRNI format", nargs="+")
 
@@ -75,25 +76,29 @@ def main(argv=None):
     else:
         logging.root.setLevel(logging.INFO)
 
-    for xrni_filename in opts.xrni_filename:
-        renoise_instrument = RenoiseInstrument(xrni_filename)
-
-        if opts.action == ACTION_CLEAR:
-            del renoise_instrument.tags
-            renoise_instrument.save(xrni_filename, overwrite=True)
-
-        if opts.tags_to_add or opts.tags_to_remove:
-            for tag in opts.tags_to_remove or []:
-                renoise_instrument.remove_tag(tag)
-            for tag in opts.tags_to_add or []:
-                renoise_instrument.append_tag(tag)
-            renoise_instrument.save(xrni_filename, overwrite=True)
-        else:
-            tags = renoise_instrument.tags
-            if tags:
-                print("\n".join([str(tag) for tag in tags]))
+    from rnsutils.instrument import RenoiseInstrument
+
+    with stats.session(opts):
+        for xrni_filename in opts.xrni_filename:
+            stats.file(xrni_filename)
+            renoise_instrument = RenoiseInstrument(xrni_filename)
+
+            if opts.action == ACTION_CLEAR:
+                del renoise_instrument.tags
+                renoise_instrument.save(xrni_filename, overwrite=True, if_changed=True)
+
+            if opts.tags_to_add or opts.tags_to_remove:
+                for tag in opts.tags_to_remove or []:
+                    renoise_instrument.remove_tag(tag)
+                for tag in opts.tags_to_add or []:
+                    renoise_instrument.append_tag(tag)
+                renoise_instrument.save(xrni_filename, overwrite=True, if_changed=True)
             else:
-                print("<no tag found>")
+                tags = renoise_instrument.tags
+                if tags:
+                    print("\n".join([str(tag) for tag in tags]))
+                else:
+                    print("<no tag found>")
 
     return 0
 
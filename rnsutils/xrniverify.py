@@ -0,0 +1,222 @@
+# xrniverify. check XRNI files integrity
+# Copyright (C) 2017  Olivier Jolly
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""CLI checking the integrity of XRNI files without loading them as instruments.
+
+Every zip entry is inflated by chunks, its CRC being checked on the fly, so that memory use doesn't depend on sample
+sizes. Instrument.xml is parsed from the same chunks, then checked for having as many samples as SampleData entries
+and for sample modulation set indexes pointing to existing modulation sets. Files are checked on a pool of worker
+processes."""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import sys
+
+import os
+
+from rnsutils import stats
+from rnsutils.xrnidedup import SAMPLE_ENTRY_PREFIX, find_xrni
+
+__date__ = '2017-03-20'
+__updated__ = '2017-03-20'
+__author__ = 'olivier@pcedev.com'
+
+INSTRUMENT_ENTRY = 'Instrument.xml'
+
+# files handed to a worker process at once
+_FILES_PER_TASK = 16
+
+
+def _read_entry(zip_file, info, parser=None):
+    """inflate :arg info entry of :arg zip_file by chunks, feeding them to :arg parser if given. zipfile checks the
+    CRC once the entry is read
+    :return uncompressed size"""
+    from rnsutils.ziputils import CHUNK_SIZE
+
+    size = 0
+    with zip_file.open(info) as entry:
+        for chunk in iter(lambda: entry.read(CHUNK_SIZE), b''):
+            size += len(chunk)
+            if parser is not None:
+                parser.feed(chunk)
+    return size
+
+
+def _check_instrument(root, sample_entries):
+    """:return errors found in :arg root of Instrument.xml, for an archive holding :arg sample_entries samples"""
+    errors = []
+
+    samples = root.findall('SampleGenerator/Samples/Sample')
+    if len(samples) != sample_entries:
+        errors.append("{} samples for {} {} entries".format(len(samples), sample_entries, SAMPLE_ENTRY_PREFIX))
+
+    modulation_sets = len(root.findall('SampleGenerator/ModulationSets/ModulationSet'))
+    for sample_idx, sample in enumerate(samples):
+        modulation_set_index = sample.findtext('ModulationSetIndex')
+        if modulation_set_index is None:
+            continue
+        try:
+            # -1 stands for no modulation set
+            valid = -1 <= int(modulation_set_index) < modulation_sets
+        except ValueError:
+            valid = False
+        if not valid:
+            errors.append("sample {} modulation set index {} out of range ({} modulation sets)".format(
+                sample_idx, modulation_set_index.strip(), modulation_sets))
+
+    return errors
+
+
+def verify_file(filename):
+    """:return json serializable report of :arg filename integrity: filename, ok, entries, samples, bytes (inflated)
+    and errors"""
+    import zlib
+    from zipfile import BadZipFile, ZipFile
+
+    from lxml import etree
+
+    result = {'filename': filename, 'ok': False, 'entries': 0, 'samples': 0, 'bytes': 0, 'errors': []}
+    errors = result['errors']
+
+    try:
+        with ZipFile(filename) as z:
+            root = None
+            for info in z.infolist():
+                result['entries'] += 1
+                is_instrument = info.filename == INSTRUMENT_ENTRY
+                parser = etree.XMLParser() if is_instrument else None
+                try:
+                    result['bytes'] += _read_entry(z, info, parser)
+                    if is_instrument:
+                        root = parser.close()
+                except (BadZipFile, zlib.error, EOFError, NotImplementedError) as e:
+                    errors.append("{}: {}".format(info.filename, e))
+                except etree.XMLSyntaxError as e:
+                    errors.append("{}: invalid xml: {}".format(info.filename, e))
+
+                if info.filename.startswith(SAMPLE_ENTRY_PREFIX):
+                    result['samples'] += 1
+
+            if root is not None:
+                errors.extend(_check_instrument(root, result['samples']))
+            elif INSTRUMENT_ENTRY not in z.namelist():
+                errors.append("no {} entry".format(INSTRUMENT_ENTRY))
+    except (BadZipFile, OSError) as e:
+        errors.append(str(e))
+
+    result['ok'] = not errors
+    return result
+
+
+def verify(filenames, jobs=None):
+    """:return iterator over :func verify_file reports of :arg filenames, in order, checked on :arg jobs processes
+    [default: all cores], in this process if 1"""
+    if jobs == 1:
+        for filename in filenames:
+            yield verify_file(filename)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    from rnsutils.ziputils import default_thread_count
+
+    with ProcessPoolExecutor(max_workers=jobs or default_thread_count()) as executor:
+        for result in executor.map(verify_file, filenames, chunksize=_FILES_PER_TASK):
+            yield result
+
+
+def main(argv=None):
+    program_name = os.path.basename(sys.argv[0])
+    program_version = "v0.9"
+    program_build_date = "%s" % __updated__
+
+    program_version_string = 'xrniverify %s (%s)' % (program_version, program_build_date)
+    program_longdesc = '''Check XRNI files integrity, exiting with status 1 if any is corrupted'''
+    program_license = "GPL v3+ 2017 Olivier Jolly"
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    try:
+        parser = argparse.ArgumentParser(epilog=program_longdesc,
+                                         description=program_license)
+        parser.add_argument("-d", "--debug", dest="debug", action="store_true",
+                            default=False,
+                            help="debug parsing [default: %(default)s]")
+        parser.add_argument("-j", "--jobs", dest="jobs", type=int,
+                            help="worker processes checking files [default: all cores]")
+        parser.add_argument("--json", dest="json", metavar="FILE",
+                            help="write the report into FILE, - for standard output")
+        parser.add_argument("-q", "--quiet", dest="quiet", action="store_true", default=False,
+                            help="quiet operation [default: %(default)s]")
+        parser.add_argument("-r", "--recursive", dest="recurse_dir", action="store_true", default=False,
+                            help="recursively parse directories [default: %(default)s]")
+        parser.add_argument("-v", "--version", action="version", version=program_version_string)
+        stats.add_arguments(parser)
+
+        parser.add_argument("xrni_filename", help="input file in XRNI format or directory", nargs="+")
+
+        # process options
+        opts = parser.parse_args(argv)
+
+    except Exception as e:
+        indent = len(program_name) * " "
+        sys.stderr.write(program_name + ": " + repr(e) + "\n")
+        sys.stderr.write(indent + "  for help use --help")
+        return 2
+
+    if opts.debug:
+        logging.root.setLevel(logging.DEBUG)
+    else:
+        logging.root.setLevel(logging.INFO)
+
+    with stats.session(opts):
+        xrni_filenames = [xrni_filename for xrni_filename, _ in find_xrni(opts.xrni_filename, opts.recurse_dir)]
+        # keep standard output to the report when it is written there
+        verbose = not opts.quiet and opts.json != '-'
+
+        results = []
+        with stats.timer('verify'):
+            for result in verify(xrni_filenames, opts.jobs):
+                stats.file(result['filename'])
+                stats.count('verify.bytes', result['bytes'])
+                results.append(result)
+                if verbose:
+                    for error in result['errors']:
+                        print("{}: {}".format(result['filename'], error))
+
+        corrupted = sum(1 for result in results if not result['ok'])
+        if verbose:
+            print("{} files verified, {} corrupted".format(len(results), corrupted))
+
+        if opts.json:
+            import io
+            import json
+
+            report = json.dumps({'files': len(results), 'corrupted': corrupted, 'results': results}, indent=2)
+            if opts.json == '-':
+                print(report)
+            else:
+                with io.open(opts.json, 'w') as report_file:
+                    report_file.write(report)
+
+    return 1 if corrupted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""zip archive helpers, notably threaded entry inflating and a deflate-then-assemble archive writer"""
+
+import os
+import struct
+import threading
+import time
+import zlib
+from zipfile import ZIP_DEFLATED
+
+DEFAULT_COMPRESSION_LEVEL = zlib.Z_DEFAULT_COMPRESSION
+# explicit level of reproducible archives, whatever zlib takes as default
+REPRODUCIBLE_COMPRESSION_LEVEL = 6
+# earliest timestamp zip entries can hold
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+# bytes inflated at once when streaming entries
+CHUNK_SIZE = 1 << 20
+
+_LOCAL_FILE_HEADER = struct.Struct('<4sHHHHHLLLHH')
+_CENTRAL_DIRECTORY_HEADER = struct.Struct('<4sHHHHHHLLLHHHHHLL')
+_END_OF_CENTRAL_DIRECTORY = struct.Struct('<4sHHHHLLH')
+_DATA_DESCRIPTOR = struct.Struct('<4sLLL')
+_ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct('<4sQHHLLQQQQ')
+_ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR = struct.Struct('<4sLQL')
+
+_ZIP64_EXTRA_ID = 0x0001
+_ZIP32_LIMIT = 0xffffffff
+_ZIP32_COUNT_LIMIT = 0xffff
+
+_VERSION_DEFAULT = 20
+_VERSION_ZIP64 = 45
+_CREATE_SYSTEM_UNIX = 3
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_EXTERNAL_ATTR = 0o600 << 16
+
+
+def default_thread_count():
+    """:return number of threads used to (de)compress entries when none is given"""
+    return os.cpu_count() or 1
+
+
+_pools = {}
+# instruments may be loaded and saved from several threads (eg watch mode, asyncio executors)
+_pools_lock = threading.Lock()
+
+
+def _pool(threads):
+    """:return pool of :arg threads threads, created on first use and kept for all later (de)compressions"""
+    with _pools_lock:
+        pool = _pools.get(threads)
+        if pool is None:
+            # imported on first use, it weighs more than everything else needed to start a command
+            from concurrent.futures import ThreadPoolExecutor
+            pool = _pools[threads] = ThreadPoolExecutor(max_workers=threads)
+        return pool
+
+
+def _map(func, iterable, threads):
+    """ordered map of :arg func over :arg iterable, spread over :arg threads threads when more than one"""
+    threads = threads or default_thread_count()
+    if threads <= 1:
+        return map(func, iterable)
+
+    # consume results right away so that errors are raised here
+    return iter(list(_pool(threads).map(func, iterable)))
+
+
+def read_entries(zip_file, names, threads=None):
+    """read and inflate :arg names entries from opened :arg zip_file
+
+    zlib releases the GIL while inflating and ZipFile serialises accesses to the underlying file, so entries are
+    inflated concurrently on :arg threads threads (all cores by default)
+    :return list of entries content, in :arg names order"""
+    return list(_map(zip_file.read, names, threads))
+
+
+def reproducible_date_time():
+    """:return timestamp tuple of entries of reproducible archives: SOURCE_DATE_EPOCH, as set by reproducible builds,
+    if defined, else the earliest one zip allows"""
+    source_date_epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if not source_date_epoch:
+        return ZIP_EPOCH
+    return max(ZIP_EPOCH, time.gmtime(int(source_date_epoch))[:6])
+
+
+def _dos_date_time(date_time):
+    year, month, day, hour, minute, second = date_time[:6]
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+def _encode_name(name):
+    try:
+        return name.encode('ascii'), 0
+    except UnicodeEncodeError:
+        return name.encode('utf-8'), _FLAG_UTF8
+
+
+class _EntryWriter(object):
+    """entry of a ZipWriter being written, see :meth ZipWriter.open"""
+
+    def __init__(self, zip_writer, name):
+        self.zip_writer = zip_writer
+        self.encoded_name, flags = _encode_name(name)
+        self.flags = flags | _FLAG_DATA_DESCRIPTOR
+        self.header_offset = zip_writer._offset
+        self.crc = 0
+        self.file_size = 0
+        self.compress_size = 0
+        self._compressor = zlib.compressobj(zip_writer.compresslevel, zlib.DEFLATED, -15)
+
+        zip_writer._write_local_header(self.encoded_name, self.flags, 0, 0, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_deflated(self, deflated):
+        self.zip_writer._write(deflated)
+        self.compress_size += len(deflated)
+
+    def write(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+        self.file_size += len(data)
+        self._write_deflated(self._compressor.compress(data))
+        return len(data)
+
+    def close(self):
+        if self._compressor is None:
+            return
+
+        self._write_deflated(self._compressor.flush())
+        self._compressor = None
+        if self.file_size >= _ZIP32_LIMIT or self.compress_size >= _ZIP32_LIMIT:
+            raise ValueError("streamed zip entries are limited to 4GiB")
+
+        self.crc &= 0xffffffff
+        self.zip_writer._write(_DATA_DESCRIPTOR.pack(b'PK\x07\x08', self.crc, self.compress_size, self.file_size))
+        self.zip_writer._add_central_directory_entry(self.encoded_name, self.flags, self.crc, self.compress_size,
+                                                     self.file_size, self.header_offset)
+
+
+class ZipWriter(object):
+    """minimal zip writer deflating entries ahead of time, possibly in parallel, then assembling the archive
+
+    Entries are written in the order they are given and their sizes and checksums are known before their header
+    is written, or follow their data for entries streamed with :meth open, so the destination never needs to be
+    seekable and the archive bytes only depend on the entries names, contents and timestamp, whatever the number of
+    threads used to deflate them."""
+
+    def __init__(self, fileobj, compresslevel=DEFAULT_COMPRESSION_LEVEL, date_time=None, threads=None):
+        """:arg fileobj filename or writable file object to write the archive to
+        :arg compresslevel zlib compression level used for all entries
+        :arg date_time timestamp tuple of all entries [default: now]
+        :arg threads number of threads used to deflate entries given together [default: all cores]"""
+        if hasattr(fileobj, 'write'):
+            self.fp = fileobj
+            self._own_fp = False
+        else:
+            self.fp = open(fileobj, 'wb')
+            self._own_fp = True
+
+        self.compresslevel = compresslevel
+        self.date_time = date_time or time.localtime(time.time())[:6]
+        self.threads = threads
+        self.comment = b''
+
+        self._offset = 0
+        self._central_directory = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _deflate(self, data):
+        compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15)
+        return zlib.crc32(data) & 0xffffffff, len(data), compressor.compress(data) + compressor.flush()
+
+    def _write(self, data):
+        self.fp.write(data)
+        self._offset += len(data)
+
+    def _write_local_header(self, encoded_name, flags, crc, file_size, compress_size):
+        """:return zip version needed by the entry"""
+        zip64 = file_size >= _ZIP32_LIMIT or compress_size >= _ZIP32_LIMIT
+        version = _VERSION_ZIP64 if zip64 else _VERSION_DEFAULT
+        extra = struct.pack('<HHQQ', _ZIP64_EXTRA_ID, 16, file_size, compress_size) if zip64 else b''
+        dos_time, dos_date = _dos_date_time(self.date_time)
+
+        self._write(_LOCAL_FILE_HEADER.pack(b'PK\x03\x04', version, flags, ZIP_DEFLATED, dos_time, dos_date, crc,
+                                            _ZIP32_LIMIT if zip64 else compress_size,
+                                            _ZIP32_LIMIT if zip64 else file_size, len(encoded_name), len(extra)))
+        self._write(encoded_name)
+        self._write(extra)
+
+    def _add_central_directory_entry(self, encoded_name, flags, crc, compress_size, file_size, header_offset):
+        dos_time, dos_date = _dos_date_time(self.date_time)
+        self._central_directory.append((encoded_name, flags, dos_time, dos_date, crc, compress_size, file_size,
+                                        header_offset))
+
+    def _write_deflated(self, name, crc, file_size, deflated):
+        encoded_name, flags = _encode_name(name)
+        header_offset = self._offset
+
+        self._write_local_header(encoded_name, flags, crc, file_size, len(deflated))
+        self._write(deflated)
+
+        self._add_central_directory_entry(encoded_name, flags, crc, len(deflated), file_size, header_offset)
+
+    def open(self, name):
+        """:return writable file object deflating entry :arg name as it is written, to be closed before writing
+        anything else. Its size and checksum follow the entry data, so it is never held whole in memory"""
+        return _EntryWriter(self, name)
+
+    def writestr(self, name, data):
+        """deflate and append :arg data as entry :arg name"""
+        self._write_deflated(name, *self._deflate(data))
+
+    def write_entries(self, entries):
+        """deflate :arg entries, an iterable of (name, data), on the writer threads and append them in order"""
+        entries = list(entries)
+        for (name, _), deflated in zip(entries, _map(self._deflate, [data for _, data in entries], self.threads)):
+            self._write_deflated(name, *deflated)
+
+    def _write_central_directory(self):
+        for encoded_name, flags, dos_time, dos_date, crc, compress_size, file_size, header_offset in \
+                self._central_directory:
+
+            zip64_fields = [value for value in (file_size, compress_size, header_offset) if value >= _ZIP32_LIMIT]
+            extra = struct.pack('<HH{}Q'.format(len(zip64_fields)), _ZIP64_EXTRA_ID, 8 * len(zip64_fields),
+                                *zip64_fields) if zip64_fields else b''
+            version = _VERSION_ZIP64 if zip64_fields else _VERSION_DEFAULT
+
+            self._write(_CENTRAL_DIRECTORY_HEADER.pack(b'PK\x01\x02', (_CREATE_SYSTEM_UNIX << 8) | version, version,
+                                                       flags, ZIP_DEFLATED, dos_time, dos_date, crc,
+                                                       min(compress_size, _ZIP32_LIMIT),
+                                                       min(file_size, _ZIP32_LIMIT), len(encoded_name), len(extra), 0,
+                                                       0, 0, _EXTERNAL_ATTR, min(header_offset, _ZIP32_LIMIT)))
+            self._write(encoded_name)
+            self._write(extra)
+
+    def _write_end_of_central_directory(self, central_directory_offset):
+        count = len(self._central_directory)
+        central_directory_size = self._offset - central_directory_offset
+
+        if count > _ZIP32_COUNT_LIMIT or central_directory_offset >= _ZIP32_LIMIT or \
+                central_directory_size >= _ZIP32_LIMIT:
+            zip64_end_offset = self._offset
+            self._write(_ZIP64_END_OF_CENTRAL_DIRECTORY.pack(
+                b'PK\x06\x06', _ZIP64_END_OF_CENTRAL_DIRECTORY.size - 12, (_CREATE_SYSTEM_UNIX << 8) | _VERSION_ZIP64,
+                _VERSION_ZIP64, 0, 0, count, count, central_directory_size, central_directory_offset))
+            self._write(_ZIP64_END_OF_CENTRAL_DIRECTORY_LOCATOR.pack(b'PK\x06\x07', 0, zip64_end_offset, 1))
+
+        self._write(_END_OF_CENTRAL_DIRECTORY.pack(b'PK\x05\x06', 0, 0, min(count, _ZIP32_COUNT_LIMIT),
+                                                   min(count, _ZIP32_COUNT_LIMIT),
+                                                   min(central_directory_size, _ZIP32_LIMIT),
+                                                   min(central_directory_offset, _ZIP32_LIMIT), len(self.comment)))
+        self._write(self.comment)
+
+    def close(self):
+        """write the central directory and release the destination file if opened by the writer"""
+        if self.fp is None:
+            return
+
+        try:
+            central_directory_offset = self._offset
+            self._write_central_directory()
+            self._write_end_of_central_directory(central_directory_offset)
+        finally:
+            if self._own_fp:
+                self.fp.close()
+            self.fp = None
@@ -38,6 +38,9 @@ setup(
     # Choose your license
     license='GPLv3+',
 
+    # asyncio, keyword only arguments and multiprocessing.shared_memory
+    python_requires='>=3.8',
+
     # See https://pypi.python.org/pypi?%3Aaction=list_classifiers
     classifiers=[
         # How mature is this project? Common values are
@@ -60,13 +63,12 @@ setup(
 
         # Specify the Python versions you support here. In particular, ensure
         # that you indicate whether you support Python 2, Python 3 or both.
-        'Programming Language :: Python :: 2',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.2',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
 
         'Operating System :: OS Independent',
 
@@ -96,6 +98,8 @@ setup(
     extras_require={
         'dev': ['check-manifest', 'pylint'],
         'test': ['nose2'],
+        'analysis': ['numpy'],
+        'soundfile': ['soundfile'],
     },
 
     # If there are data files included in your packages that need to be
@@ -116,11 +120,16 @@ setup(
     # pip to create the appropriate form of executable for the target platform.
     entry_points={
         'console_scripts': [
+            'rnsutils=rnsutils.cli:main',
             'sf2toxrni=rnsutils.sf2toxrni:main',
             'sfztoxrni=rnsutils.sfztoxrni:main',
             'xrnireencode=rnsutils.xrnireencode:main',
             'xrnicomment=rnsutils.xrnicomment:main',
+            'xrnidedup=rnsutils.xrnidedup:main',
+            'xrnidiff=rnsutils.xrnidiff:main',
+            'xrniextract=rnsutils.xrniextract:main',
             'xrnitag=rnsutils.xrnitag:main',
+            'xrniverify=rnsutils.xrniverify:main',
             'xrniorganise=rnsutils.xrniorganise:main',
         ],
     },